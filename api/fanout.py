@@ -0,0 +1,171 @@
+"""Рассылка событий комнат по всем воркерам.
+
+SocketIO доставляет emit только клиентам, подключённым к своему процессу.
+RoomFanout публикует события комнат в общую шину, а каждый воркер,
+получив сообщение, отдаёт его своим клиентам через socketio.emit.
+
+События копятся коротким окном (max_wait) и уходят одним сообщением,
+сгруппированные по комнатам; порядок событий внутри комнаты сохраняется.
+Так ход с последующим game_finished - одна публикация, а не две.
+
+Шины: LocalBus - в памяти процесса (один воркер и тесты), RedisBus -
+канал Redis pub/sub, общий для всех воркеров и узлов.
+"""
+import json
+import sys
+import time
+from typing import Callable, Optional
+
+from game_logic.workers import BackgroundWorker, BatchedWriter
+
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(',', ':'), default=str).encode()
+
+
+class LocalBus:
+    """Шина в памяти процесса: сообщение сразу получают все подписчики"""
+
+    def __init__(self):
+        self._subscribers = []
+
+    def subscribe(self, callback: Callable[[bytes], None]):
+        self._subscribers.append(callback)
+
+    def publish(self, message: bytes):
+        for callback in list(self._subscribers):
+            callback(message)
+
+    def start(self):
+        pass
+
+    def stats(self) -> dict:
+        return {'bus': 'local', 'subscribers': len(self._subscribers)}
+
+
+class RedisBus:
+    """Шина поверх Redis pub/sub: каждый воркер слушает общий канал"""
+
+    def __init__(self, client, channel: str = 'battleship:fanout'):
+        self.client = client
+        self.channel = channel
+        self._subscribers = []
+        self._listener = BackgroundWorker(self._listen_loop, 'fanout-listener')
+
+    def subscribe(self, callback: Callable[[bytes], None]):
+        self._subscribers.append(callback)
+
+    def publish(self, message: bytes):
+        self.client.publish(self.channel, message)
+
+    def start(self):
+        """Запустить поток чтения канала (идемпотентно)"""
+        self._listener.start()
+
+    def _listen_loop(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for item in pubsub.listen():
+                    if item.get('type') != 'message':
+                        continue
+                    for callback in list(self._subscribers):
+                        callback(item['data'])
+            except Exception as e:
+                print(f"[Fanout] Ошибка подписки на {self.channel}: {e}")
+                time.sleep(1)
+
+    def stats(self) -> dict:
+        return {'bus': 'redis', 'channel': self.channel}
+
+
+class RoomFanout:
+    """Пакетная рассылка событий комнат через шину"""
+
+    def __init__(self, bus, max_wait: float = 0.005):
+        self.bus = bus
+        self.max_wait = max_wait
+        self._deliver = None
+        self._close = None
+        # Пачка уходит через max_wait после первого события, без ограничения размера
+        self._queue = BatchedWriter(self._publish_events, 'room-fanout',
+                                    batch_size=sys.maxsize, max_wait=max_wait)
+        self.events = 0
+        self.published = 0
+        self.delivered = 0
+        bus.subscribe(self._receive)
+
+    def attach(self, deliver: Callable, close: Optional[Callable] = None):
+        """Задать доставку локальным клиентам: deliver(room, event, data, skip_sid), close(room)"""
+        self._deliver = deliver
+        self._close = close
+        self.bus.start()
+
+    # ---------- отправка ----------
+
+    def emit(self, room: str, event: str, data, skip_sid: Optional[str] = None):
+        """Поставить событие комнаты в очередь на публикацию"""
+        self.events += 1
+        self._queue.add((room, [event, data, skip_sid]))
+
+    def close_room(self, room: str):
+        """Закрыть комнату во всех воркерах после уже поставленных событий"""
+        self._queue.add((room, [None, None, None]))
+
+    def flush(self):
+        """Сразу опубликовать всё накопленное"""
+        self._queue.flush()
+
+    def _publish_events(self, events: list):
+        # Группируем по комнатам, сохраняя порядок событий внутри комнаты
+        batch = {}
+        for room, event in events:
+            batch.setdefault(room, []).append(event)
+        self._publish(batch)
+
+    def _publish(self, batch: dict):
+        try:
+            self.bus.publish(_dumps(batch))
+            self.published += 1
+        except Exception as e:
+            print(f"[Fanout] Не удалось опубликовать события: {e}")
+
+    # ---------- приём ----------
+
+    def _receive(self, message):
+        try:
+            batch = json.loads(message)
+        except ValueError as e:
+            print(f"[Fanout] Повреждённое сообщение: {e}")
+            return
+        for room, events in batch.items():
+            for event, data, skip_sid in events:
+                try:
+                    if event is None:
+                        if self._close:
+                            self._close(room)
+                    elif self._deliver:
+                        self._deliver(room, event, data, skip_sid)
+                        self.delivered += 1
+                except Exception as e:
+                    print(f"[Fanout] Ошибка доставки {event} в комнату {room}: {e}")
+
+    def stats(self) -> dict:
+        """Счётчики рассылки для мониторинга"""
+        return dict(self.bus.stats(),
+                    pending=self._queue.pending,
+                    events=self.events,
+                    published=self.published,
+                    delivered=self.delivered)
+
+
+def create_fanout(name: str = 'local', redis_url: Optional[str] = None,
+                  channel: str = 'battleship:fanout', max_wait: float = 0.005) -> RoomFanout:
+    """Рассылка по имени шины из конфигурации: local или redis"""
+    if name == 'local':
+        return RoomFanout(LocalBus(), max_wait)
+    if name == 'redis':
+        import redis
+        return RoomFanout(RedisBus(redis.Redis.from_url(redis_url), channel), max_wait)
+    raise ValueError(f"Неизвестная шина событий: {name}")
@@ -1,14 +1,17 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Literal, Optional
 
 class AttackRequest(BaseModel):
     x: int = Field(ge=0, le=9, description="Координата X (0-9)")
     y: int = Field(ge=0, le=9, description="Координата Y (0-9)")
     game_id: str = Field(min_length=8, max_length=64)
+    # Клиент слушает Socket.IO: выстрелы ИИ придут событием ai_shots
+    async_ai: bool = False
 
 class CreateGameRequest(BaseModel):
     player_id: str = Field(min_length=3, max_length=50)
     vs_ai: bool = False
+    difficulty: Literal['normal', 'hard'] = 'normal'
 
 class JoinGameRequest(BaseModel):
     game_id: str = Field(min_length=8, max_length=64)
@@ -1,18 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
 from flask_wtf.csrf import CSRFProtect, generate_csrf
+import functools
 import uuid
 import json
 import random
 import time
+import zlib
 
 from config import Config
-from game_logic.core import Game, Board, Ship, GameManager, GameRoom, game_manager
-from game_logic.ai import BattleshipAI
+from game_logic.core import Game, Board, Ship, GameManager, GameRoom, RoomLocks, game_manager
+from game_logic.ai_turns import AITurnPool
+from game_logic.ai import BattleshipAI, create_ai
+from game_logic.placement import FLEET
+from game_logic.layout_pool import FleetLayoutPool
+from game_logic.movelog import MoveArchive
+from game_logic.moves import MoveError, apply_move, play_ai_turns
+from game_logic.history import MatchHistory
+from game_logic.rating import RatingService
+from game_logic.batch_ai import batch_engine
+from game_logic.solver import solver_cache
+from game_logic.store import GameStore
+from game_logic.storage import create_backend
 from security.rate_limiter import limiter
 from security.validation import validate_game_input
+from api.websocket import broadcast_move, broadcast_room_state, push_ai_shots
 from api.models import (
     AttackRequest, CreateGameRequest, JoinGameRequest,
     CreateRoomRequest, JoinRoomRequest, LeaveRoomRequest,
@@ -23,9 +37,111 @@ api_bp = Blueprint('api', __name__)
 CORS(api_bp, supports_credentials=True)
 csrf = CSRFProtect()
 
-# хранилище игр
-active_games = {}
-ai_players = {}
+# где лежит состояние игр и комнат: в памяти процесса или в общем хранилище
+state_backend = create_backend(Config.STATE_BACKEND, Config.REDIS_URL)
+
+# Журналы ходов законченных игр дописываются в файл пачками
+move_archive = (MoveArchive(Config.MOVE_LOG_PATH, Config.MOVE_LOG_BATCH_SIZE,
+                            Config.MOVE_LOG_FLUSH_SECONDS)
+                if Config.MOVE_LOG_PATH else None)
+
+# История матчей: законченные игры пишутся в SQLite фоновым потоком
+match_history = (MatchHistory(Config.HISTORY_DB_PATH, Config.HISTORY_BATCH_SIZE,
+                              Config.HISTORY_FLUSH_SECONDS)
+                 if Config.HISTORY_DB_PATH else None)
+
+# Рейтинги игроков мультиплеера и таблица лидеров
+rating_service = RatingService(Config.RATING_DB_PATH, k=Config.RATING_K,
+                               initial=Config.RATING_INITIAL,
+                               batch_size=Config.RATING_BATCH_SIZE,
+                               max_wait=Config.RATING_FLUSH_SECONDS)
+
+# хранилище одиночных игр: игра и её ИИ вытесняются вместе
+game_store = GameStore(max_games=Config.GAME_STORE_MAX_GAMES,
+                       ttl_seconds=Config.GAME_STORE_TTL_SECONDS,
+                       max_memory_bytes=Config.GAME_STORE_MAX_MEMORY_MB * 1024 * 1024,
+                       backend=state_backend,
+                       archive=move_archive,
+                       history=match_history)
+
+# готовые расстановки для ИИ и кнопки "Авторасстановка"
+fleet_pool = FleetLayoutPool(size=Config.FLEET_POOL_SIZE,
+                             low_water=Config.FLEET_POOL_LOW_WATER)
+
+# Блокировки одиночных игр: ход игрока и фоновый ход ИИ не пересекаются
+game_locks = RoomLocks()
+
+def serialized(locks, arg):
+    """Выполнять обработчик под блокировкой комнаты или игры из параметра URL arg"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            with locks.hold(kwargs[arg]):
+                return view(**kwargs)
+        return wrapper
+    return decorator
+
+class GameLocks:
+    """Блокировки по ID игры: комнатные игры (multi_<код>_...) делят блокировку
+    с командами своей комнаты, одиночные - берут из game_locks"""
+
+    def hold(self, game_id):
+        if game_id.startswith('multi_'):
+            return game_manager.room_locks.hold(game_id[6:].partition('_')[0])
+        return game_locks.hold(game_id)
+
+serialized_room = serialized(game_manager.room_locks, 'room_code')
+serialized_game = serialized(GameLocks(), 'game_id')
+
+def run_ai_turn(game_id):
+    """Ход ИИ из фонового пула: выстрелы до промаха, результат - событием ai_shots"""
+    with game_locks.hold(game_id):
+        game = game_store.get_game(game_id)
+        if not game or game.status != 'active' or game.current_turn != 'player2':
+            return
+        moves = play_ai_turns(game, game_store.get_ai(game_id),
+                              record=functools.partial(game_store.record_attack, game_id, game),
+                              timestamp=time.time(), think=ai_turn_pool.think)
+    push_ai_shots(game_id, {
+        'game_id': game_id,
+        'ai_shots': [move.shot() for move in moves],
+        'game_over': game.status == 'finished',
+        'winner': game.winner,
+        'next_turn': game.current_turn if game.status == 'active' else None,
+        # Клиент отбрасывает ai_shots не новее уже показанных ходов
+        'version': game.version
+    })
+
+# ходы ИИ, посчитанные вне обработчика атаки
+ai_turn_pool = AITurnPool(run_ai_turn, Config.AI_TURN_WORKERS)
+
+def find_game(game_id):
+    """Найти игру по ID: одиночную или мультиплеерную (формат multi_<код комнаты>_<суффикс>).
+
+    Возвращает (game, room); room равен None для одиночных игр.
+    """
+    game = game_store.get_game(game_id)
+    if game:
+        return game, None
+    if game_id.startswith('multi_'):
+        room = game_manager.get_room(game_id[6:].partition('_')[0])
+        # ID прошлой партии комнаты текущую игру не находит
+        if room and room.game and room.game.id == game_id:
+            return room.game, room
+    return None, None
+
+def get_player_role(game, room, player_id):
+    """Роль игрока: для комнат - из индекса менеджера, для одиночных игр - по списку игроков"""
+    if room:
+        return game_manager.get_player_role(room.room_code, player_id)
+    return game.get_player_role(player_id)
+
+def save_game_state(game_id, game, room):
+    """Сохранить изменения игры в хранилище комнат или одиночных игр"""
+    if room:
+        game_manager.save_room(room)
+    else:
+        game_store.save(game_id, game)
 
 @api_bp.route('/api/csrf-token', methods=['GET'])
 def get_csrf_token():
@@ -41,19 +157,21 @@ def create_game():
         game_id = str(uuid.uuid4())[:8]
         
         new_game = Game(game_id=game_id, player1_id=data.player_id)
+        ai = None
                 
         # Если игра против ИИ, создаем бота и расставляем ему корабли
         if data.vs_ai:
             new_game.players['player2'] = 'AI_BOT'
-            new_game.boards['player2'].auto_place_all_ships()
-            ai_players[game_id] = BattleshipAI()
+            new_game.boards['player2'].place_fleet(fleet_pool.take())
+            ai = create_ai(data.difficulty, batched=Config.AI_BATCH_ENABLED)
         
-        active_games[game_id] = new_game
+        game_store.add(game_id, new_game, ai)
         
         return jsonify({
             'game_id': game_id,
             'status': new_game.status,
-            'player': 'player1'
+            'player': 'player1',
+            'difficulty': data.difficulty if data.vs_ai else None
         }), 201
         
     except Exception as e:
@@ -85,6 +203,7 @@ def create_multiplayer_room():
 
 @api_bp.route('/api/multiplayer/room/<room_code>/join', methods=['POST'])
 @limiter.limit("10 per minute")
+@serialized_room
 def join_multiplayer_room(room_code):
     """Присоединение к комнате мультиплеера"""
     try:
@@ -94,11 +213,15 @@ def join_multiplayer_room(room_code):
         if not room:
             return jsonify({'error': 'Комната не найдена'}), 404
         
-        success = room.join(data.player_id)
+        success = game_manager.join_room(room_code, data.player_id)
         if not success:
             return jsonify({'error': 'Не удалось присоединиться к комнате'}), 400
         
-        room.update_activity()
+        room = game_manager.get_room(room_code)
+        broadcast_room_state(room_code, 'player_joined', {
+            'player_id': data.player_id,
+            'timestamp': time.time()
+        }, room=room)
         
         return jsonify({
             'success': True,
@@ -111,6 +234,7 @@ def join_multiplayer_room(room_code):
         return jsonify({'error': str(e)}), 400
 
 @api_bp.route('/api/multiplayer/room/<room_code>/leave', methods=['POST'])
+@serialized_room
 def leave_multiplayer_room(room_code):
     """Покинуть комнату"""
     try:
@@ -123,6 +247,10 @@ def leave_multiplayer_room(room_code):
         player_left_message = f"Игрок {data.player_id} покинул комнату"
         
         game_manager.leave_room(room_code, data.player_id)
+        broadcast_room_state(room_code, 'player_left', {
+            'player_id': data.player_id,
+            'timestamp': time.time()
+        })
         
         return jsonify({
             'success': True,
@@ -135,6 +263,7 @@ def leave_multiplayer_room(room_code):
 
 @api_bp.route('/api/multiplayer/room/<room_code>/ready', methods=['POST'])
 @limiter.limit("30 per minute")
+@serialized_room
 def multiplayer_player_ready(room_code):
     """Игрок готов к игре в мультиплеере"""
     try:
@@ -144,32 +273,45 @@ def multiplayer_player_ready(room_code):
         if not room:
             return jsonify({'error': 'Комната не найдена'}), 404
         
-        if data.player_id not in [room.player1_id, room.player2_id]:
+        if not game_manager.get_player_role(room_code, data.player_id):
             return jsonify({'error': 'Вы не в этой комнате'}), 403
         
         print(f"Игрок {data.player_id} готов в комнате {room_code}")
         print(f"Статус комнаты до: {room.status}")
         print(f"Игроки: {room.player1_id} (готов: {room.player1_ready}), {room.player2_id} (готов: {room.player2_ready})")
         
+        was_waiting = room.status == 'waiting'
         room.set_player_ready(data.player_id)
         room.update_activity()
+        game_manager.save_room(room)
         
         print(f"Статус комнаты после: {room.status}")
         print(f"Игра создана: {room.game is not None}")
         
+        if was_waiting:
+            # Готовность в лобби; если игра только что создана - начинается расстановка
+            if room.status == 'placement':
+                broadcast_room_state(room_code, 'placement_started', {
+                    'room': room.to_dict(),
+                    'message': 'Начинаем расстановку кораблей!',
+                    'timestamp': time.time()
+                }, room=room)
+            else:
+                broadcast_room_state(room_code, 'player_ready_update', {
+                    'player_id': data.player_id,
+                    'room': room.to_dict(),
+                    'timestamp': time.time()
+                }, room=room)
+        
         # Если игра создана, проверяем, все ли корабли расставлены
         if room.game:
             game = room.game
             
-            player_role = None
-            if data.player_id == game.players['player1']:
-                player_role = 'player1'
-            elif data.player_id == game.players['player2']:
-                player_role = 'player2'
+            player_role = game_manager.get_player_role(room_code, data.player_id)
             
             if player_role:
                 ships_count = len(game.boards[player_role].ships)
-                required_ships = 7
+                required_ships = len(FLEET)
                 
                 if ships_count != required_ships:
                     return jsonify({
@@ -186,6 +328,26 @@ def multiplayer_player_ready(room_code):
                     game.current_turn = 'player1'
                     room.status = 'active'
                     print(f"Игра {room_code} началась! Все игроки готовы.")
+                game_manager.save_room(room)
+                
+                if room.status == 'active':
+                    broadcast_room_state(room_code, 'battle_started', {
+                        'room': room.to_dict(),
+                        'game': {
+                            'game_id': game.id,
+                            'status': game.status,
+                            'current_turn': game.current_turn,
+                            'players': game.players
+                        },
+                        'timestamp': time.time()
+                    }, room=room)
+                else:
+                    broadcast_room_state(room_code, 'player_placement_complete', {
+                        'player_id': data.player_id,
+                        'ready_players': list(game.ready_players),
+                        'ships_count': ships_count,
+                        'timestamp': time.time()
+                    }, room=room)
         
         return jsonify({
             'success': True,
@@ -207,73 +369,91 @@ def get_limiter():
 @api_bp.route('/api/multiplayer/room/<room_code>/state', methods=['GET'])
 @limiter.limit("100 per minute, 5 per second")
 def get_multiplayer_room_state(room_code):
-    """Получить состояние комнаты"""
+    """Получить состояние комнаты.
+
+    С параметром since_version в my_board_hits / opponent_board_hits
+    попадают только выстрелы после этой версии игры. Ответ помечается
+    ETag; при совпадении If-None-Match возвращается 304 без тела.
+    """
     room = game_manager.get_room(room_code)
     if not room:
         return jsonify({'error': 'Комната не найдена'}), 404
     
-    room.update_activity()
+    game_manager.touch_room(room)
+    
+    player_id = request.args.get('player_id')
+    since_version = request.args.get('since_version', type=int)
+    game = room.game
+    player_role = game_manager.get_player_role(room_code, player_id) if game and player_id else None
     
+    etag = room_state_etag(room, player_role, since_version)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_room_state(room, player_role, since_version))
+    response.set_etag(etag)
+    # Браузер переспрашивает сервер при каждом опросе и получает 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def room_state_etag(room, player_role, since_version):
+    """ETag состояния комнаты: меняется вместе с любым полем ответа"""
+    game = room.game
+    key = (room.room_code, room.player1_id, room.player2_id, room.status,
+           room.player1_ready, room.player2_ready, player_role, since_version)
+    if game:
+        key += (game.id, game.version, game.status, game.current_turn, game.winner,
+                tuple(sorted(game.ready_players)))
+        # Расстановка кораблей не меняет версию игры, но меняет счётчики кораблей
+        key += tuple((len(board.ships), board.ships_remaining) for _, board in sorted(game.boards.items()))
+    return f'{zlib.crc32(repr(key).encode()):08x}'
+
+def build_room_state(room, player_role, since_version):
+    """Тело ответа состояния комнаты для игрока с ролью player_role"""
     response = {
         'room': room.to_dict()
     }
+    game = room.game
+    if not game or not player_role:
+        return response
     
-    # Если игра уже началась, добавляем информацию об игре
-    if room.game:
-        game = room.game
-        
-        # Определяем, какой игрок делает запрос
-        player_id = request.args.get('player_id')
-        if player_id:
-            player_role = None
-            if player_id == game.players['player1']:
-                player_role = 'player1'
-            elif player_id == game.players['player2']:
-                player_role = 'player2'
-            
-            if player_role:
-                opponent_role = 'player2' if player_role == 'player1' else 'player1'
-                
-                my_board = game.boards[player_role]
-                opponent_board = game.boards[opponent_role]
-                
-                # Собираем полную информацию о попаданиях
-                my_hits = []
-                opponent_hits = []
-                
-                # Собираем информацию о попаданиях на моей доске
-                for y in range(10):
-                    for x in range(10):
-                        cell = my_board.grid[y][x]
-                        if cell == 'X':  # Попадание по моему кораблю
-                            my_hits.append({'x': x, 'y': y, 'type': 'hit'})
-                        elif cell == 'O':  # Промах по моей доске
-                            my_hits.append({'x': x, 'y': y, 'type': 'miss'})
-                
-                # Собираем информацию о попаданиях на доске противника
-                for y in range(10):
-                    for x in range(10):
-                        cell = opponent_board.grid[y][x]
-                        if cell == 'X':  # Мое попадание
-                            opponent_hits.append({'x': x, 'y': y, 'type': 'hit'})
-                        elif cell == 'O':  # Мой промах
-                            opponent_hits.append({'x': x, 'y': y, 'type': 'miss'})
-                
-                response['game'] = {
-                    'game_id': game.id,
-                    'status': game.status,
-                    'current_turn': game.current_turn,
-                    'winner': game.winner,
-                    'player_role': player_role,
-                    'my_board_hits': my_hits,
-                    'opponent_board_hits': opponent_hits,
-                    'my_ships_remaining': len([s for s in my_board.ships if not s.is_sunk()]),
-                    'opponent_ships_remaining': len([s for s in opponent_board.ships if not s.is_sunk()])
-                }
+    opponent_role = 'player2' if player_role == 'player1' else 'player1'
+    my_board = game.boards[player_role]
+    opponent_board = game.boards[opponent_role]
     
-    return jsonify(response)
+    # Дельта возможна, только если версия клиента не опережает игру
+    # (иначе это уже другая игра в той же комнате)
+    full = since_version is None or since_version > game.version
+    if full:
+        my_hits = board_shots(my_board)
+        opponent_hits = board_shots(opponent_board)
+    else:
+        my_hits, opponent_hits = [], []
+        for target_role, x, y, result in game.moves_since(since_version):
+            hits = my_hits if target_role == player_role else opponent_hits
+            hits.append({'x': x, 'y': y, 'type': result})
+    
+    response['game'] = {
+        'game_id': game.id,
+        'status': game.status,
+        'current_turn': game.current_turn,
+        'winner': game.winner,
+        'player_role': player_role,
+        'version': game.version,
+        'full': full,
+        'my_board_hits': my_hits,
+        'opponent_board_hits': opponent_hits,
+        'my_ships_remaining': my_board.ships_remaining,
+        'opponent_ships_remaining': opponent_board.ships_remaining
+    }
+    return response
+
+def board_shots(board):
+    """Все выстрелы по полю в виде списка клеток с типом hit / miss"""
+    return [{'x': x, 'y': y, 'type': kind} for x, y, kind in board.shots()]
 
 @api_bp.route('/api/multiplayer/room/<room_code>/place_ship', methods=['POST'])
+@serialized_room
 def multiplayer_place_ship(room_code):
     """Размещение корабля в мультиплеерной игре"""
     try:
@@ -287,11 +467,7 @@ def multiplayer_place_ship(room_code):
         
         game = room.game
         
-        player_role = None
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+        player_role = game_manager.get_player_role(room_code, player_id)
         
         if not player_role:
             return jsonify({'error': 'Player not found in game'}), 404
@@ -309,6 +485,7 @@ def multiplayer_place_ship(room_code):
         success, message = game.boards[player_role].place_ship_manual(formatted_positions)
         
         if success:
+            game_manager.save_room(room)
             return jsonify({
                 'success': True,
                 'message': message,
@@ -321,6 +498,7 @@ def multiplayer_place_ship(room_code):
         return jsonify({'error': str(e)}), 400
 
 @api_bp.route('/api/multiplayer/room/<room_code>/auto_place', methods=['POST'])
+@serialized_room
 def multiplayer_auto_place(room_code):
     """Автоматическая расстановка всех кораблей в мультиплеерной игре"""
     try:
@@ -333,17 +511,14 @@ def multiplayer_auto_place(room_code):
         
         game = room.game
         
-        player_role = None
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+        player_role = game_manager.get_player_role(room_code, player_id)
         
         if not player_role:
             return jsonify({'error': 'Player not found in game'}), 404
         
-        # Автоматическая расстановка
-        game.boards[player_role].auto_place_all_ships()
+        # Автоматическая расстановка из пула готовых вариантов
+        game.boards[player_role].place_fleet(fleet_pool.take())
+        game_manager.save_room(room)
         
         # Получаем позиции всех кораблей для отображения
         all_ship_positions = []
@@ -363,6 +538,7 @@ def multiplayer_auto_place(room_code):
 
 @api_bp.route('/api/multiplayer/room/<room_code>/attack', methods=['POST'])
 @limiter.limit("30 per minute")
+@serialized_room
 def multiplayer_attack(room_code):
     """Ход в мультиплеерной игре"""
     try:
@@ -389,72 +565,18 @@ def multiplayer_attack(room_code):
             return jsonify({'error': 'Игра еще не началась'}), 400
         
         # Определяем, какой игрок атакует
-        attacker_role = None
-        if data.player_id == game.players['player1']:
-            attacker_role = 'player1'
-        elif data.player_id == game.players['player2']:
-            attacker_role = 'player2'
+        attacker_role = game_manager.get_player_role(room_code, data.player_id)
         
         if not attacker_role:
             return jsonify({'error': 'Вы не участвуете в этой игре'}), 403
         
-        # Проверяем, чей сейчас ход
-        if game.current_turn != attacker_role:
-            return jsonify({'error': 'Сейчас не ваш ход'}), 403
-        
-        # Определяем цель атаки
-        target_role = 'player2' if attacker_role == 'player1' else 'player1'
-        target_board = game.boards[target_role]
-        
-        # Выполняем атаку
-        result = target_board.receive_attack(data.x, data.y)
-        
-        # Если попадание, находим корабль и добавляем позиции если потоплен
-        if result['result'] == 'hit':
-            ship_index = result.get('ship_id')
-            if ship_index is not None:
-                ship = target_board.ships[ship_index]
-                
-                # Если корабль потоплен - добавляем его позиции в ответ
-                if result.get('sunk'):
-                    result['sunk_positions'] = list(ship.positions)
-        
-        if result.get('game_over'):
-            game.status = 'finished'
-            game.winner = attacker_role
-            result['winner'] = attacker_role
-            result['next_turn'] = None
-            
-            # Обновляем статус комнаты
-            room.status = 'finished'
-        else:
-            # Передаем ход другому игроку
-            if result['result'] == 'hit':
-                # Попал - ходит снова
-                game.current_turn = attacker_role
-                result['next_turn'] = attacker_role
-            else:
-                # Промахнулся - передаем ход
-                game.current_turn = target_role
-                result['next_turn'] = target_role
-        
-        room.update_activity()
-        
-        response_data = {
-            'result': result['result'],
-            'sunk': result.get('sunk', False),
-            'sunk_positions': result.get('sunk_positions', []),
-            'game_over': result.get('game_over', False),
-            'next_turn': result.get('next_turn', target_role),
-            'attacker': attacker_role,
-            'x': data.x,
-            'y': data.y
-        }
-        
-        # Добавляем победителя если игра завершена
-        if result.get('game_over'):
-            response_data['winner'] = attacker_role
+        try:
+            move, room = game_manager.apply_move(room, attacker_role, data.x, data.y)
+        except MoveError as e:
+            return jsonify({'error': str(e)}), 403 if e.reason == 'not_your_turn' else 400
         
+        response_data = move.to_dict()
+        broadcast_move(room, data.player_id, attacker_role, data.x, data.y, response_data)
         return jsonify(response_data)
         
     except Exception as e:
@@ -466,6 +588,7 @@ def multiplayer_attack(room_code):
 # ==============================
 
 @api_bp.route('/api/game/<game_id>/place_ship', methods=['POST'])
+@serialized_game
 def place_ship(game_id):
     """Размещение корабля игроком (работает для обеих игр)"""
     try:
@@ -474,25 +597,13 @@ def place_ship(game_id):
         positions = data.get('positions')
         
         # Определяем, это игра с ИИ или мультиплеер
-        game = active_games.get(game_id)
-        if not game:
-            # Может быть мультиплеерная игра
-            # Ищем комнату по ID игры (формат multi_XXXXXX)
-            if game_id.startswith('multi_'):
-                room_code = game_id[6:]  # Убираем 'multi_'
-                room = game_manager.get_room(room_code)
-                if room and room.game:
-                    game = room.game
+        game, room = find_game(game_id)
         
         if not game:
             return jsonify({'error': 'Game not found'}), 404
         
         # Определяем доску игрока
-        player_role = None
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+        player_role = get_player_role(game, room, player_id)
         
         if not player_role:
             return jsonify({'error': 'Player not found in game'}), 404
@@ -511,6 +622,7 @@ def place_ship(game_id):
         success, message = game.boards[player_role].place_ship_manual(formatted_positions)
         
         if success:
+            save_game_state(game_id, game, room)
             return jsonify({
                 'success': True,
                 'message': message,
@@ -523,34 +635,26 @@ def place_ship(game_id):
         return jsonify({'error': str(e)}), 400
 
 @api_bp.route('/api/game/<game_id>/auto_place', methods=['POST'])
+@serialized_game
 def auto_place_ships(game_id):
     """Автоматическая расстановка всех кораблей (работает для обеих игр)"""
     try:
         data = request.get_json()
         player_id = data.get('player_id')
         
-        game = active_games.get(game_id)
-        if not game:
-            if game_id.startswith('multi_'):
-                room_code = game_id[6:]
-                room = game_manager.get_room(room_code)
-                if room and room.game:
-                    game = room.game
+        game, room = find_game(game_id)
         
         if not game:
             return jsonify({'error': 'Game not found'}), 404
         
-        player_role = None
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+        player_role = get_player_role(game, room, player_id)
         
         if not player_role:
             return jsonify({'error': 'Player not found in game'}), 404
         
-        # Автоматическая расстановка
-        game.boards[player_role].auto_place_all_ships()
+        # Автоматическая расстановка из пула готовых вариантов
+        game.boards[player_role].place_fleet(fleet_pool.take())
+        save_game_state(game_id, game, room)
         
         # Получаем позиции всех кораблей для отображения
         all_ship_positions = []
@@ -568,37 +672,26 @@ def auto_place_ships(game_id):
         return jsonify({'error': str(e)}), 400
 
 @api_bp.route('/api/game/<game_id>/ready', methods=['POST'])
+@serialized_game
 def player_ready(game_id):
     """Игрок готов начать (завершил расстановку) - работает для обеих игр"""
     try:
         data = request.get_json()
         player_id = data.get('player_id')
         
-        game = active_games.get(game_id)
-        room = None
-        
-        if not game:
-            if game_id.startswith('multi_'):
-                room_code = game_id[6:]
-                room = game_manager.get_room(room_code)
-                if room and room.game:
-                    game = room.game
+        game, room = find_game(game_id)
         
         if not game:
             return jsonify({'error': 'Game not found'}), 404
         
         # Определяем, какой это игрок
-        player_role = None
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+        player_role = get_player_role(game, room, player_id)
         
         if not player_role:
             return jsonify({'error': 'Player not found in game'}), 404
         
         ships_count = len(game.boards[player_role].ships)
-        required_ships = 7  # 1x4, 2x3, 2x2, 2x1
+        required_ships = len(FLEET)
         
         if ships_count != required_ships:
             return jsonify({
@@ -618,7 +711,9 @@ def player_ready(game_id):
             
             if room:
                 room.status = 'active'
-                print(f"Мультиплеерная игра {room_code} началась!")
+                print(f"Мультиплеерная игра {room.room_code} началась!")
+        
+        save_game_state(game_id, game, room)
         
         return jsonify({
             'success': True,
@@ -631,6 +726,7 @@ def player_ready(game_id):
         return jsonify({'error': str(e)}), 400
 
 @api_bp.route('/api/multiplayer/room/<room_code>/surrender', methods=['POST'])
+@serialized_room
 def multiplayer_surrender(room_code):
     """Игрок сдался"""
     try:
@@ -644,19 +740,21 @@ def multiplayer_surrender(room_code):
         game = room.game
         
         # Определяем, кто сдался
-        surrender_role = None
-        winner_role = None
-        if player_id == game.players['player1']:
-            surrender_role = 'player1'
-            winner_role = 'player2'
-        elif player_id == game.players['player2']:
-            surrender_role = 'player2'
-            winner_role = 'player1'
+        surrender_role = game_manager.get_player_role(room_code, player_id)
         
         if surrender_role:
+            winner_role = 'player2' if surrender_role == 'player1' else 'player1'
             game.status = 'finished'
             game.winner = winner_role
             room.status = 'finished'
+            game_manager.save_room(room)
+            broadcast_room_state(room_code, 'game_finished', {
+                'winner': winner_role,
+                'winner_id': game.players[winner_role],
+                'room': room.to_dict(),
+                'surrender': True,
+                'timestamp': time.time()
+            }, room=room)
             
             return jsonify({
                 'success': True,
@@ -673,27 +771,13 @@ def multiplayer_surrender(room_code):
 @api_bp.route('/api/game/<game_id>/state', methods=['GET'])
 def get_game_state(game_id):
     """Получение текущего состояния игры (работает для обеих игр)"""
-    game = active_games.get(game_id)
-    room = None
-    
-    if not game:
-        if game_id.startswith('multi_'):
-            room_code = game_id[6:]
-            room = game_manager.get_room(room_code)
-            if room and room.game:
-                game = room.game
+    game, room = find_game(game_id)
     
     if not game:
         return jsonify({'error': 'Game not found'}), 404
     
     # Определяем, какой игрок делает запрос
-    player_id = request.args.get('player_id')
-    player_role = None
-    if player_id:
-        if player_id == game.players['player1']:
-            player_role = 'player1'
-        elif player_id == game.players['player2']:
-            player_role = 'player2'
+    player_role = get_player_role(game, room, request.args.get('player_id'))
     
     player1_ships = len(game.boards['player1'].ships)
     player2_ships = len(game.boards['player2'].ships)
@@ -716,6 +800,7 @@ def get_game_state(game_id):
 
 @api_bp.route('/api/game/<game_id>/attack', methods=['POST'])
 @limiter.limit("30 per minute")
+@serialized_game
 def attack(game_id):
     """Выполнение хода в игре с поддержкой ИИ"""
     try:
@@ -725,7 +810,7 @@ def attack(game_id):
         if not validate_game_input(data.x, data.y):
             return jsonify({'error': 'Invalid coordinates'}), 400
         
-        game = active_games.get(game_id)
+        game = game_store.get_game(game_id)
         if not game:
             return jsonify({'error': 'Game not found'}), 404
         
@@ -735,77 +820,31 @@ def attack(game_id):
         if game.current_turn != 'player1':
             return jsonify({'error': 'Not your turn'}), 403
         
-        # Ход игрока: атакуем поле ИИ (player2)
-        target_board = game.boards['player2']
-        result = target_board.receive_attack(data.x, data.y)
-        
-        # Если попадание, находим корабль и добавляем позиции если потоплен
-        if result['result'] == 'hit':
-            ship_index = result.get('ship_id')
-            if ship_index is not None:
-                ship = target_board.ships[ship_index]
-                
-                # Если корабль потоплен - добавляем его позиции в ответ
-                if result.get('sunk'):
-                    result['sunk_positions'] = list(ship.positions)
-                
-                # Если это ход ИИ и корабль потоплен - передаем позиции в ИИ
-                if game.players['player2'] == 'AI_BOT' and result.get('sunk'):
-                    ai = ai_players[game_id]
-                    ai.record_shot(data.x, data.y, 'hit', list(ship.positions))
-        
-        # Записываем выстрел в историю ИИ (даже если промах)
-        if game.players['player2'] == 'AI_BOT':
-            ai = ai_players[game_id]
-            sunk_positions = result.get('sunk_positions')
-            ai.record_shot(data.x, data.y, result['result'], sunk_positions)
-        
-        if result.get('game_over'):
-            game.status = 'finished'
-            game.winner = 'player1'
-            result['winner'] = 'player1'
-            return jsonify(result)
-        
-        # Если игра против ИИ - делаем ответный ход
-        if game.players['player2'] == 'AI_BOT' and not result.get('game_over'):
-            ai_shots = []
-            ai = ai_players[game_id]
-            
-            while True:
-                # Генерируем ход ИИ
-                ai_x, ai_y = ai.generate_shot()
-                
-                player_board = game.boards['player1']
-                ai_result = player_board.receive_attack(ai_x, ai_y)
-                
-                if ai_result.get('sunk'):
-                    ship_index = ai_result.get('ship_id')
-                    if ship_index is not None:
-                        ship = player_board.ships[ship_index]
-                        ai_result['sunk_positions'] = list(ship.positions)
-                
-                ai.record_shot(ai_x, ai_y, ai_result['result'], 
-                              ai_result.get('sunk_positions'))
-                
-                ai_shots.append({
-                    'x': ai_x,
-                    'y': ai_y,
-                    'result': ai_result['result'],
-                    'sunk': ai_result.get('sunk', False),
-                    'sunk_positions': ai_result.get('sunk_positions')
-                })
-                
-                if ai_result.get('game_over'):
-                    game.status = 'finished'
-                    game.winner = 'player2'
-                    result['game_over'] = True
-                    result['winner'] = 'player2'
-                    break
-                
-                if ai_result['result'] != 'hit':
-                    break
-            
-            result['ai_shots'] = ai_shots
+        record = functools.partial(game_store.record_attack, game_id, game)
+        
+        # Ход игрока: атакуем поле соперника (player2)
+        try:
+            move = apply_move(game, 'player1', data.x, data.y, record, time.time())
+        except MoveError as e:
+            return jsonify({'error': str(e)}), 400
+        result = move.to_dict()
+        
+        # Ход ИИ в фоне: игрок получает свой результат, не дожидаясь серии ИИ
+        if (data.async_ai and Config.AI_ASYNC_ENABLED and game.players['player2'] == 'AI_BOT'
+                and game.current_turn == 'player2'):
+            ai_turn_pool.submit(game_id)
+            result['ai_pending'] = True
+        
+        # Иначе делаем ответный ход сразу, пока ИИ попадает
+        elif game.players['player2'] == 'AI_BOT' and not move.game_over:
+            ai_moves = play_ai_turns(game, game_store.get_ai(game_id), record=record,
+                                     timestamp=time.time())
+            result['ai_shots'] = [ai_move.shot() for ai_move in ai_moves]
+            if game.status == 'finished':
+                result['game_over'] = True
+                result['winner'] = game.winner
+            result['next_turn'] = game.current_turn if game.status == 'active' else None
+        result['version'] = game.version
         
         return jsonify(result)
         
@@ -813,10 +852,11 @@ def attack(game_id):
         return jsonify({'error': str(e)}), 400
     
 @api_bp.route('/api/game/<game_id>/ai-turn', methods=['POST'])
+@serialized_game
 def ai_turn(game_id):
     """Отдельный endpoint для хода ИИ"""
     try:
-        game = active_games.get(game_id)
+        game = game_store.get_game(game_id)
         if not game:
             return jsonify({'error': 'Game not found'}), 404
         
@@ -826,53 +866,53 @@ def ai_turn(game_id):
         if game.current_turn != 'player2':
             return jsonify({'error': 'Not AI turn'}), 400
         
-        ai = ai_players.get(game_id)
+        ai = game_store.get_ai(game_id)
         if not ai:
             return jsonify({'error': 'AI not initialized'}), 400
         
         # ИИ делает один выстрел
         ai_x, ai_y = ai.generate_shot()
-        player_board = game.boards['player1']
-        ai_result = player_board.receive_attack(ai_x, ai_y)
-        
-        # Если ИИ попал и потопил корабль, находим позиции
-        if ai_result.get('sunk'):
-            ship_index = ai_result.get('ship_id')
-            if ship_index is not None:
-                ship = player_board.ships[ship_index]
-                ai_result['sunk_positions'] = list(ship.positions)
+        move = apply_move(game, 'player2', ai_x, ai_y,
+                          functools.partial(game_store.record_attack, game_id, game), time.time())
+        ai.record_shot(ai_x, ai_y, move.result, move.sunk_positions)
         
-        # Записываем результат выстрела ИИ
-        ai.record_shot(ai_x, ai_y, ai_result['result'], 
-                      ai_result.get('sunk_positions'))
-        
-        if ai_result.get('game_over'):
-            game.status = 'finished'
-            game.winner = 'player2'
-            ai_result['game_over'] = True
-            ai_result['winner'] = 'player2'
-            ai_result['next_turn'] = None
-        
-        elif ai_result['result'] == 'hit':
-            game.current_turn = 'player2'
-            ai_result['next_turn'] = 'ai'
-        else:
-            game.current_turn = 'player1'
-            ai_result['next_turn'] = 'player'
-        
-        ai_result['ai_shots'] = [{
-            'x': ai_x,
-            'y': ai_y,
-            'result': ai_result['result'],
-            'sunk': ai_result.get('sunk', False),
-            'sunk_positions': ai_result.get('sunk_positions')
-        }]
+        ai_result = move.to_dict()
+        if not move.game_over:
+            ai_result['next_turn'] = 'ai' if move.hit else 'player'
+        ai_result['ai_shots'] = [move.shot()]
+        ai_result['version'] = game.version
         
         return jsonify(ai_result)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+# ==============================
+# ИСТОРИЯ МАТЧЕЙ
+# ==============================
+
+@api_bp.route('/api/players/<player_id>/history', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_player_history(player_id):
+    """История матчей игрока по страницам: ?limit=N&before=<next_before>"""
+    if match_history is None:
+        return jsonify({'error': 'История матчей отключена'}), 404
+    limit = min(max(request.args.get('limit', Config.HISTORY_PAGE_SIZE, type=int), 1), 100)
+    before = request.args.get('before', type=int)
+    page = match_history.player_matches(player_id, limit, before)
+    return jsonify(dict(page, player_id=player_id))
+
+@api_bp.route('/api/history/<int:match_id>', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_match(match_id):
+    """Законченный матч вместе с журналом ходов"""
+    if match_history is None:
+        return jsonify({'error': 'История матчей отключена'}), 404
+    match = match_history.get_match(match_id)
+    if match is None:
+        return jsonify({'error': 'Матч не найден'}), 404
+    return jsonify(match)
+
 # ==============================
 # УТИЛИТЫ ДЛЯ МУЛЬТИПЛЕЕРА
 # ==============================
@@ -895,5 +935,41 @@ def get_multiplayer_stats():
     """Получить статистику по мультиплееру"""
     return jsonify({
         'active_rooms': len(game_manager.rooms),
-        'total_codes': len(game_manager.room_codes)
-    })
\ No newline at end of file
+        'total_codes': len(game_manager.room_codes),
+        'expired_rooms': game_manager.expired_rooms
+    })
+
+@api_bp.route('/api/multiplayer/leaderboard', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_leaderboard():
+    """Таблица лидеров по страницам: ?limit=N&offset=M"""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify(dict(rating_service.top(limit, offset), limit=limit, offset=offset))
+
+@api_bp.route('/api/multiplayer/rating/<player_id>', methods=['GET'])
+@limiter.limit("60 per minute")
+def get_player_rating(player_id):
+    """Рейтинг и место игрока"""
+    rating = rating_service.get(player_id)
+    if rating is None:
+        return jsonify({'error': 'Игрок ещё не играл рейтинговых игр'}), 404
+    return jsonify(rating)
+
+@api_bp.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Внутренние счётчики сервера для мониторинга"""
+    from api import websocket
+    return jsonify({
+        'fleet_pool': fleet_pool.stats(),
+        'game_store': game_store.stats(),
+        'batch_ai': batch_engine.stats(),
+        'ai_solver': solver_cache.stats(),
+        'fanout': websocket.fanout.stats() if websocket.fanout else None,
+        'move_archive': move_archive.stats() if move_archive else None,
+        'match_history': match_history.stats() if match_history else None,
+        'ratings': rating_service.stats(),
+        'room_locks': game_manager.room_locks.stats(),
+        'game_locks': game_locks.stats(),
+        'ai_turns': ai_turn_pool.stats()
+    })
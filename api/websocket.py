@@ -1,23 +1,46 @@
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask import request
+import functools
 import json
 import time
 from datetime import datetime
+from config import Config
 from game_logic.core import game_manager
+from game_logic.moves import MoveError
+from game_logic.placement import FLEET
+from api.fanout import create_fanout
 
 # Инициализация SocketIO
 socketio = None
 
+# Рассылка событий комнат клиентам всех воркеров
+fanout = None
+
+def serialized_room(handler):
+    """Выполнять обработчик под блокировкой комнаты из data['room_code']"""
+    @functools.wraps(handler)
+    def wrapper(data):
+        room_code = data.get('room_code') if isinstance(data, dict) else None
+        if not room_code:
+            return handler(data)
+        with game_manager.room_locks.hold(room_code):
+            return handler(data)
+    return wrapper
+
 def init_socketio(app):
     """Инициализация SocketIO с приложением"""
-    global socketio
+    global socketio, fanout
     socketio = SocketIO(app, 
                        cors_allowed_origins="*",
-                       async_mode='threading',  # ← МЕНЯЕМ на 'threading'
+                       async_mode=Config.ASYNC_MODE,
                        ping_timeout=60,
                        ping_interval=25,
-                       logger=True,
+                       logger=Config.DEBUG,
                        engineio_logger=False)
+    fanout = create_fanout(Config.FANOUT_BUS, Config.REDIS_URL,
+                           Config.FANOUT_CHANNEL, Config.FANOUT_BATCH_MS / 1000)
+    fanout.attach(deliver_to_room, socketio.close_room)
+    game_manager.add_expiry_listener(notify_room_expired)
     return socketio
 
 # Словарь для связи player_id и socket_id
@@ -38,11 +61,107 @@ def get_players_in_room(room_code):
     return players
 
 def broadcast_to_room(room_code, event, data, exclude_sid=None):
-    """Отправить событие всем в комнате"""
-    if socketio:
-        socketio.emit(event, data, room=room_code, skip_sid=exclude_sid)
+    """Отправить событие всем в комнате, на каком бы воркере ни были клиенты"""
+    if fanout:
+        fanout.emit(room_code, event, data, exclude_sid)
         print(f"[WebSocket] Broadcast {event} to room {room_code}")
 
+def deliver_to_room(room_code, event, data, skip_sid=None):
+    """Доставить событие из шины клиентам этого воркера"""
+    socketio.emit(event, data, room=room_code, skip_sid=skip_sid)
+
+def room_state(room, since_version=None):
+    """Состояние комнаты для клиентов: комната, игра и выстрелы после since_version.
+
+    Поля описаны по ролям игроков, а не "моё / чужое", поэтому одно
+    сообщение годится обоим. Без since_version или если клиент опережает
+    игру (новая игра в той же комнате) передаётся весь журнал ходов.
+    """
+    state = {'room': room.to_dict(), 'game': None}
+    game = room.game
+    if not game:
+        return state
+    
+    full = since_version is None or since_version > game.version
+    since_version = 0 if full else since_version
+    state['game'] = {
+        'game_id': game.id,
+        'status': game.status,
+        'current_turn': game.current_turn,
+        'winner': game.winner,
+        'ready_players': sorted(game.ready_players),
+        'version': game.version,
+        'since_version': since_version,
+        'full': full,
+        'moves': [{'target': target, 'x': x, 'y': y, 'result': result}
+                  for target, x, y, result in game.moves_since(since_version)],
+        'ships_remaining': {role: board.ships_remaining for role, board in game.boards.items()},
+        'sunk': {role: [list(ship.positions) for ship in board.ships if ship.is_sunk()]
+                 for role, board in game.boards.items()}
+    }
+    return state
+
+def broadcast_room_state(room_code, event, data, room=None, since_version=None, exclude_sid=None):
+    """Разослать событие комнаты вместе с изменением её состояния (поле state).
+
+    По умолчанию изменение не содержит выстрелов - только текущие статусы;
+    для хода передаётся версия до него.
+    """
+    if room is None:
+        room = game_manager.get_room(room_code)
+    if room:
+        if since_version is None and room.game:
+            since_version = room.game.version
+        data['state'] = room_state(room, since_version)
+    broadcast_to_room(room_code, event, data, exclude_sid)
+
+def broadcast_move(room, player_id, player_role, x, y, result):
+    """Разослать результат хода (и конец игры) всем в комнате"""
+    game = room.game
+    broadcast_room_state(room.room_code, 'move_result', {
+        'move': {
+            'player_id': player_id,
+            'player_role': player_role,
+            'x': x,
+            'y': y,
+            'result': result['result'],
+            'sunk': result.get('sunk', False),
+            'sunk_positions': result.get('sunk_positions', []),
+            'timestamp': time.time()
+        },
+        'game_state': {
+            'status': game.status,
+            'current_turn': game.current_turn,
+            'winner': game.winner if game.status == 'finished' else None
+        }
+    }, room=room, since_version=game.version - 1)
+    
+    if game.status == 'finished':
+        broadcast_room_state(room.room_code, 'game_finished', {
+            'winner': game.winner,
+            'winner_id': game.players[game.winner],
+            'room': room.to_dict(),
+            'timestamp': time.time()
+        }, room=room)
+
+def game_channel(game_id):
+    """Комната Socket.IO одиночной игры"""
+    return f'game:{game_id}'
+
+def push_ai_shots(game_id, data):
+    """Отправить игроку выстрелы ИИ, посчитанные в фоне"""
+    broadcast_to_room(game_channel(game_id), 'ai_shots', data)
+
+def notify_room_expired(room_code, room):
+    """Сообщить клиентам, что комната удалена по неактивности, и закрыть её"""
+    broadcast_to_room(room_code, 'room_expired', {
+        'room_code': room_code,
+        'message': 'Комната закрыта из-за неактивности',
+        'timestamp': time.time()
+    })
+    if fanout:
+        fanout.close_room(room_code)
+
 def register_socketio_handlers():
     """Регистрация всех обработчиков WebSocket"""
     
@@ -76,7 +195,7 @@ def register_socketio_handlers():
                 emit('error', {'message': 'Room not found'})
                 return
             
-            if player_id not in [room.player1_id, room.player2_id]:
+            if not game_manager.get_player_role(room_code, player_id):
                 emit('error', {'message': 'Player not in room'})
                 return
             
@@ -94,17 +213,22 @@ def register_socketio_handlers():
                 'timestamp': time.time()
             })
             
+            # Клиент мог переподключиться: досылаем ходы после последнего увиденного
+            last_seq = data.get('last_seq', data.get('since_version'))
+            emit('room_state', dict(room_state(room, last_seq), reason='resync'))
+            
             # Уведомляем других игроков в комнате
-            broadcast_to_room(room_code, 'player_joined', {
+            broadcast_room_state(room_code, 'player_joined', {
                 'player_id': player_id,
                 'timestamp': time.time()
-            }, exclude_sid=request.sid)
+            }, room=room, exclude_sid=request.sid)
             
         except Exception as e:
             print(f"[WebSocket] Error in join_room: {e}")
             emit('error', {'message': str(e)})
     
     @socketio.on('leave_room')
+    @serialized_room
     def handle_leave_room(data):
         """Покинуть комнату"""
         try:
@@ -121,7 +245,7 @@ def register_socketio_handlers():
                 
                 # Уведомляем комнату, что игрок вышел
                 if room_code:
-                    broadcast_to_room(room_code, 'player_left', {
+                    broadcast_room_state(room_code, 'player_left', {
                         'player_id': player_id,
                         'timestamp': time.time()
                     })
@@ -132,6 +256,7 @@ def register_socketio_handlers():
             print(f"[WebSocket] Error in leave_room: {e}")
     
     @socketio.on('placement_complete')
+    @serialized_room
     def handle_placement_complete(data):
         """Игрок завершил расстановку кораблей"""
         try:
@@ -149,11 +274,7 @@ def register_socketio_handlers():
             
             game = room.game
             
-            player_role = None
-            if player_id == game.players['player1']:
-                player_role = 'player1'
-            elif player_id == game.players['player2']:
-                player_role = 'player2'
+            player_role = game_manager.get_player_role(room_code, player_id)
             
             if not player_role:
                 emit('error', {'message': 'Player not in game'})
@@ -163,7 +284,7 @@ def register_socketio_handlers():
             
             # Проверяем, сколько кораблей расставлено у игрока
             ships_count = len(game.boards[player_role].ships)
-            required_ships = 7  # 1x4, 2x3, 2x2, 2x1
+            required_ships = len(FLEET)
             
             if ships_count < required_ships:
                 emit('placement_error', {
@@ -177,11 +298,14 @@ def register_socketio_handlers():
                 game.status = 'active'
                 game.current_turn = 'player1'
                 room.status = 'active'
+            game_manager.save_room(room)
+            
+            if room.status == 'active':
                 
                 print(f"[WebSocket] Оба игрока готовы! Начинаем битву в комнате {room_code}")
                 
                 # Отправляем событие начала битвы всем игрокам
-                broadcast_to_room(room_code, 'battle_started', {
+                broadcast_room_state(room_code, 'battle_started', {
                     'room': room.to_dict(),
                     'game': {
                         'game_id': game.id,
@@ -190,15 +314,15 @@ def register_socketio_handlers():
                         'players': game.players
                     },
                     'timestamp': time.time()
-                })
+                }, room=room)
             else:
                 # Еще не все готовы - отправляем обновление
-                broadcast_to_room(room_code, 'player_placement_complete', {
+                broadcast_room_state(room_code, 'player_placement_complete', {
                     'player_id': player_id,
                     'ready_players': list(game.ready_players),
                     'ships_count': ships_count,
                     'timestamp': time.time()
-                })
+                }, room=room)
             
         except Exception as e:
             print(f"[WebSocket] Ошибка в placement_complete: {e}")
@@ -206,6 +330,7 @@ def register_socketio_handlers():
 
 
     @socketio.on('player_ready')
+    @serialized_room
     def handle_player_ready(data):
         """Игрок готов к игре в мультиплеере"""
         try:
@@ -243,28 +368,31 @@ def register_socketio_handlers():
                     room.start_game()
                 
                 room.status = 'placement'
+                game_manager.save_room(room)
                 
                 # Отправляем событие начала расстановки всем игрокам
-                broadcast_to_room(room_code, 'placement_started', {
+                broadcast_room_state(room_code, 'placement_started', {
                     'room': room.to_dict(),
                     'message': 'Начинаем расстановку кораблей!',
                     'timestamp': time.time()
-                })
+                }, room=room)
                 
                 print(f"[WebSocket] Отправлено событие placement_started в комнату {room_code}")
             else:
+                game_manager.save_room(room)
                 # Отправляем обновление о готовности
-                broadcast_to_room(room_code, 'player_ready_update', {
+                broadcast_room_state(room_code, 'player_ready_update', {
                     'player_id': player_id,
                     'room': room.to_dict(),
                     'timestamp': time.time()
-                })
+                }, room=room)
             
         except Exception as e:
             print(f"[WebSocket] Ошибка в player_ready: {e}")
             emit('error', {'message': str(e)})
 
     @socketio.on('make_move')
+    @serialized_room
     def handle_make_move(data):
         """Игрок делает ход"""
         try:
@@ -290,105 +418,37 @@ def register_socketio_handlers():
             game = room.game
             
             # Определяем роль игрока
-            player_role = None
-            if player_id == game.players['player1']:
-                player_role = 'player1'
-            elif player_id == game.players['player2']:
-                player_role = 'player2'
+            player_role = game_manager.get_player_role(room_code, player_id)
             
             if not player_role:
                 emit('error', {'message': 'Player not in game'})
                 return
             
-            # Проверяем, чей ход
-            if game.current_turn != player_role:
-                emit('move_rejected', {
-                    'message': 'Not your turn',
-                    'current_turn': game.current_turn
-                })
-                return
-            
-            # Выполняем атаку
-            target_role = 'player2' if player_role == 'player1' else 'player1'
-            target_board = game.boards[target_role]
-            
-            # Проверяем, не стреляли ли уже сюда
-            if target_board.grid[y][x] in ['X', 'O']:
-                emit('move_rejected', {
-                    'message': 'Already attacked this cell',
-                    'x': x,
-                    'y': y
-                })
-                return
-            
-            result = target_board.receive_attack(x, y)
-            
-            # Если корабль потоплен, добавляем позиции
-            if result['result'] == 'hit' and result.get('sunk'):
-                ship_index = result.get('ship_id')
-                if ship_index is not None:
-                    ship = target_board.ships[ship_index]
-                    result['sunk_positions'] = list(ship.positions)
-            
-            # Обновляем состояние игры
-            game.last_move = {
-                'player': player_role,
-                'x': x,
-                'y': y,
-                'result': result['result'],
-                'timestamp': time.time()
-            }
-            
-            # Проверяем окончание игры
-            if result.get('game_over'):
-                game.status = 'finished'
-                game.winner = player_role
-                room.status = 'finished'
-                result['winner'] = player_role
-                result['next_turn'] = None
-            else:
-                if result['result'] == 'hit':
-                    # Попал - ходит снова
-                    game.current_turn = player_role
-                    result['next_turn'] = player_role
+            try:
+                move, room = game_manager.apply_move(room, player_role, x, y)
+            except MoveError as e:
+                if e.reason == 'not_your_turn':
+                    emit('move_rejected', {
+                        'message': 'Not your turn',
+                        'current_turn': game.current_turn
+                    })
+                elif e.reason == 'already_attacked':
+                    emit('move_rejected', {
+                        'message': 'Already attacked this cell',
+                        'x': x,
+                        'y': y
+                    })
                 else:
-                    # Промах - передаем ход
-                    game.current_turn = target_role
-                    result['next_turn'] = target_role
-            
-            room.update_activity()
+                    emit('error', {'message': str(e)})
+                return
             
-            response_data = {
-                'move': {
-                    'player_id': player_id,
-                    'player_role': player_role,
-                    'x': x,
-                    'y': y,
-                    'result': result['result'],
-                    'sunk': result.get('sunk', False),
-                    'sunk_positions': result.get('sunk_positions', []),
-                    'timestamp': time.time()
-                },
-                'game_state': {
-                    'status': game.status,
-                    'current_turn': game.current_turn,
-                    'winner': game.winner if game.status == 'finished' else None
-                }
-            }
+            result = move.to_dict()
             
             # Отправляем результат хода ВСЕМ в комнате
-            broadcast_to_room(room_code, 'move_result', response_data)
+            broadcast_move(room, player_id, player_role, x, y, result)
             
             print(f"[WebSocket] Move in room {room_code}: {player_id} attacked ({x},{y}) = {result['result']}")
             
-            if result.get('game_over'):
-                broadcast_to_room(room_code, 'game_finished', {
-                    'winner': player_role,
-                    'winner_id': player_id,
-                    'room': room.to_dict(),
-                    'timestamp': time.time()
-                })
-            
         except Exception as e:
             print(f"[WebSocket] Error in make_move: {e}")
             emit('error', {'message': str(e)})
@@ -412,11 +472,7 @@ def register_socketio_handlers():
             game = room.game
             
             # Определяем роль игрока
-            player_role = None
-            if player_id == game.players['player1']:
-                player_role = 'player1'
-            elif player_id == game.players['player2']:
-                player_role = 'player2'
+            player_role = game_manager.get_player_role(room_code, player_id)
             
             if not player_role:
                 emit('error', {'message': 'Player not in game'})
@@ -440,6 +496,45 @@ def register_socketio_handlers():
             print(f"[WebSocket] Error in get_game_state: {e}")
             emit('error', {'message': str(e)})
     
+    @socketio.on('watch_game')
+    def handle_watch_game(data):
+        """Подписаться на события одиночной игры (выстрелы ИИ из фона)"""
+        try:
+            from api.routes import game_store
+            game_id = data.get('game_id')
+            game = game_store.get_game(game_id) if game_id else None
+            if not game or game.players['player1'] != data.get('player_id'):
+                emit('error', {'message': 'Game not found'})
+                return
+            join_room(game_channel(game_id))
+            emit('game_watched', {'game_id': game_id})
+        except Exception as e:
+            print(f"[WebSocket] Ошибка в watch_game: {e}")
+            emit('error', {'message': str(e)})
+    
+    @socketio.on('resync')
+    def handle_resync(data):
+        """Дослать клиенту состояние комнаты после пропуска событий"""
+        try:
+            room_code = data.get('room_code')
+            player_id = data.get('player_id')
+            
+            room = game_manager.get_room(room_code) if room_code else None
+            if not room:
+                emit('error', {'message': 'Room not found'})
+                return
+            
+            if not game_manager.get_player_role(room_code, player_id):
+                emit('error', {'message': 'Player not in room'})
+                return
+            
+            last_seq = data.get('last_seq', data.get('since_version'))
+            emit('room_state', dict(room_state(room, last_seq), reason='resync'))
+            
+        except Exception as e:
+            print(f"[WebSocket] Error in resync: {e}")
+            emit('error', {'message': str(e)})
+    
     @socketio.on('ping')
     def handle_ping():
         """Пинг для поддержания соединения"""
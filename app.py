@@ -1,13 +1,23 @@
+import os
+
+# Модель конкурентности выбирается до импорта Flask и остального кода:
+# patch_all должен подменить socket, threading и time раньше, чем их
+# успеют импортировать библиотеки. Значение совпадает с Config.ASYNC_MODE.
+ASYNC_MODE = os.getenv('ASYNC_MODE', 'gevent')
+if ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
 from flask import Flask, send_from_directory, jsonify
 from flask_cors import CORS
 from config import Config
-from api.routes import api_bp, csrf
+from api.routes import api_bp, csrf, game_store, match_history, move_archive, rating_service, state_backend
 from security.rate_limiter import init_rate_limiter
-import os
-from gevent import monkey
-monkey.patch_all()
-
 from api.websocket import init_socketio, register_socketio_handlers
+from game_logic.core import game_manager
 
 def create_app():
     app = Flask(__name__, 
@@ -35,6 +45,16 @@ def create_app():
     # Регистрация WebSocket обработчиков
     register_socketio_handlers()
     
+    # Комнаты хранятся там же, где одиночные игры
+    game_manager.backend = state_backend
+    game_manager.archive = move_archive
+    game_manager.history = match_history
+    game_manager.ratings = rating_service
+    
+    # Фоновое удаление неактивных комнат и брошенных одиночных игр
+    game_manager.start_expiry(Config.ROOM_TIMEOUT_SECONDS)
+    game_store.start_sweep(Config.GAME_STORE_SWEEP_SECONDS)
+    
     # Статические маршруты
     @app.route('/')
     def index():
@@ -58,17 +78,20 @@ def create_app():
 
 
 if __name__ == '__main__':
+    # Локальный запуск; в продакшене сервер поднимает gunicorn (см. wsgi.py)
     app, socketio = create_app()
     
     port = int(os.environ.get("PORT", 5002))
     debug = os.environ.get("FLASK_DEBUG", "False").lower() == "true"
     
+    # В режиме gevent/eventlet socketio.run использует их WSGI-сервер,
+    # Werkzeug остаётся только для async_mode='threading'
     socketio.run(
         app, 
         debug=False,
         host='0.0.0.0', 
         port=port,
         use_reloader=False,
-        log_output=True,
-        allow_unsafe_werkzeug=True
+        log_output=debug,
+        allow_unsafe_werkzeug=ASYNC_MODE == 'threading'
     )
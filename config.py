@@ -23,4 +23,64 @@ class Config:
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
     
     # Отключаем сортировку JSON для удобства отладки
-    JSON_SORT_KEYS = False
\ No newline at end of file
+    JSON_SORT_KEYS = False
+    
+    # Пул готовых расстановок флота (размер и порог фонового пополнения)
+    FLEET_POOL_SIZE = int(os.getenv('FLEET_POOL_SIZE', '256'))
+    FLEET_POOL_LOW_WATER = int(os.getenv('FLEET_POOL_LOW_WATER', '64'))
+    
+    # Пакетный расчёт ходов обычного ИИ для всех игр в одном векторном проходе
+    AI_BATCH_ENABLED = os.getenv('AI_BATCH_ENABLED', 'False').lower() == 'true'
+    
+    # Ход ИИ в фоновом пуле: ответ на атаку уходит сразу, выстрелы ИИ - через
+    # Socket.IO (если клиент попросил async_ai); /ai-turn остаётся запасным путём
+    AI_ASYNC_ENABLED = os.getenv('AI_ASYNC_ENABLED', 'True').lower() == 'true'
+    AI_TURN_WORKERS = int(os.getenv('AI_TURN_WORKERS', '2'))
+    
+    # Хранилище одиночных игр: лимит числа игр, время жизни без активности и память
+    GAME_STORE_MAX_GAMES = int(os.getenv('GAME_STORE_MAX_GAMES', '10000'))
+    GAME_STORE_TTL_SECONDS = int(os.getenv('GAME_STORE_TTL_SECONDS', '1800'))
+    GAME_STORE_MAX_MEMORY_MB = int(os.getenv('GAME_STORE_MAX_MEMORY_MB', '256'))
+    # Как часто фоновый поток удаляет игры с истёкшим временем жизни
+    GAME_STORE_SWEEP_SECONDS = float(os.getenv('GAME_STORE_SWEEP_SECONDS', '60'))
+    
+    # Комнаты мультиплеера без активности удаляются фоновым таймером
+    ROOM_TIMEOUT_SECONDS = int(os.getenv('ROOM_TIMEOUT_SECONDS', '300'))
+    
+    # Хранилище состояния игр: memory (один процесс), redis (общее для всех воркеров)
+    # или local (заглушка Redis в памяти процесса, для тестов)
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    
+    # Шина событий комнат между воркерами: local (один процесс) или redis (pub/sub);
+    # события копятся FANOUT_BATCH_MS миллисекунд и уходят одним сообщением
+    FANOUT_BUS = os.getenv('FANOUT_BUS', 'local')
+    FANOUT_CHANNEL = os.getenv('FANOUT_CHANNEL', 'battleship:fanout')
+    FANOUT_BATCH_MS = float(os.getenv('FANOUT_BATCH_MS', '5'))
+    
+    # Модель конкурентности Socket.IO: gevent (по умолчанию, кооперативные
+    # соединения), eventlet или threading (поток на клиента, только для отладки).
+    # Читается и в app.py до импорта Flask, поэтому задаётся переменной окружения
+    ASYNC_MODE = os.getenv('ASYNC_MODE', 'gevent')
+    
+    # Архив журналов ходов законченных игр (пусто - не вести): записи копятся
+    # до MOVE_LOG_BATCH_SIZE игр или MOVE_LOG_FLUSH_SECONDS и пишутся одним блоком
+    MOVE_LOG_PATH = os.getenv('MOVE_LOG_PATH', '')
+    MOVE_LOG_BATCH_SIZE = int(os.getenv('MOVE_LOG_BATCH_SIZE', '64'))
+    MOVE_LOG_FLUSH_SECONDS = float(os.getenv('MOVE_LOG_FLUSH_SECONDS', '1.0'))
+    
+    # История матчей (SQLite, WAL; пусто - не вести): законченные игры пишутся
+    # фоновым потоком пачками по HISTORY_BATCH_SIZE или раз в HISTORY_FLUSH_SECONDS
+    HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', '')
+    HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', '64'))
+    HISTORY_FLUSH_SECONDS = float(os.getenv('HISTORY_FLUSH_SECONDS', '1.0'))
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '20'))
+    
+    # Рейтинг Эло мультиплеера: база SQLite, общая для воркеров машины
+    # (пустой путь - рейтинги только в памяти процесса). Законченные игры
+    # учитываются фоновым потоком пачками по RATING_BATCH_SIZE или раз в RATING_FLUSH_SECONDS
+    RATING_DB_PATH = os.getenv('RATING_DB_PATH', '')
+    RATING_BATCH_SIZE = int(os.getenv('RATING_BATCH_SIZE', '64'))
+    RATING_FLUSH_SECONDS = float(os.getenv('RATING_FLUSH_SECONDS', '1.0'))
+    RATING_K = float(os.getenv('RATING_K', '32'))
+    RATING_INITIAL = float(os.getenv('RATING_INITIAL', '1500'))
@@ -1,12 +1,18 @@
 import random
 from typing import Tuple, List, Set
 from .core import Board
+from .density_ai import DensityAI
+from .expert_ai import ExpertAI
+from .batch_ai import BatchedAI, batch_engine
+from .solver import OPENING_SHOTS, endgame_shot, opening_shot
 
 class BattleshipAI:
     """Умный ИИ с логикой добивания кораблей"""
+    difficulty = 'normal'
     
-    def __init__(self, board_size: int = 10):
+    def __init__(self, board_size: int = 10, rng=None):
         self.board_size = board_size
+        self.rng = rng or random
         self.hits = []         # Все попадания
         self.misses = set()    # Промахи
         self.last_hits = []    # Попадания в текущий корабль
@@ -18,12 +24,22 @@ class BattleshipAI:
     
     def generate_shot(self) -> Tuple[int, int]:
         """Генерация умного выстрела"""
+        # Мало свободных клеток - точный перебор оставшихся расстановок
+        shot = endgame_shot(self.shot_history, self.forbidden_cells, self.hits, self.sunk_ships, self.rng)
+        if shot is not None:
+            return shot
+        
         if self.hunting and self.last_hits:
             return self._continue_hunt()
         
         # Исключаем клетки вокруг потопленных кораблей
         excluded = self.shot_history.union(self.forbidden_cells)
         
+        if len(self.shot_history) < OPENING_SHOTS:
+            shot = opening_shot(excluded, self.rng)
+            if shot is not None:
+                return shot
+        
         candidates = []
         for x in range(self.board_size):
             for y in range(self.board_size):
@@ -31,7 +47,7 @@ class BattleshipAI:
                     candidates.append((x, y))
         
         if candidates:
-            return random.choice(candidates)
+            return self.rng.choice(candidates)
         
         # Любая свободная клетка
         for x in range(self.board_size):
@@ -39,7 +55,7 @@ class BattleshipAI:
                 if (x, y) not in excluded:
                     return (x, y)
         
-        return (random.randint(0, self.board_size-1), random.randint(0, self.board_size-1))
+        return (self.rng.randint(0, self.board_size-1), self.rng.randint(0, self.board_size-1))
     
     def _continue_hunt(self) -> Tuple[int, int]:
         """Продолжение охоты за раненым кораблем"""
@@ -47,7 +63,7 @@ class BattleshipAI:
             # Первое попадание - пробуем все 4 стороны
             last_hit = self.last_hits[0]
             directions = [(0, 1), (0, -1), (1, 0), (-1, 0)]
-            random.shuffle(directions)
+            self.rng.shuffle(directions)
             
             for dx, dy in directions:
                 x, y = last_hit[0] + dx, last_hit[1] + dy
@@ -63,7 +79,7 @@ class BattleshipAI:
                         return (x, y)
                 
                 dx, dy = self.direction
-                self.direction = (-dy, -dx) if random.choice([True, False]) else (dy, dx)
+                self.direction = (-dy, -dx) if self.rng.choice([True, False]) else (dy, dx)
                 last_hit = self.last_hits[0]
                 x, y = last_hit[0] + self.direction[0], last_hit[1] + self.direction[1]
                 if self._is_valid_target(x, y):
@@ -103,5 +119,77 @@ class BattleshipAI:
                 self.direction = None
         else:
             self.misses.add((x, y))
-            if self.hunting and len(self.last_hits) > 1:
-                self.direction = (-self.direction[0], -self.direction[1])
\ No newline at end of file
+            # Направления может не быть, если прошлый выстрел выбрал решатель эндшпиля
+            if self.hunting and len(self.last_hits) > 1 and self.direction:
+                self.direction = (-self.direction[0], -self.direction[1])
+    
+    def export_state(self) -> dict:
+        """Состояние ИИ в виде JSON-совместимого словаря"""
+        return {
+            'hits': self.hits,
+            'misses': sorted(self.misses),
+            'last_hits': self.last_hits,
+            'hunting': self.hunting,
+            'direction': self.direction,
+            'sunk_ships': self.sunk_ships,
+            'shot_history': sorted(self.shot_history),
+            'forbidden_cells': sorted(self.forbidden_cells)
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict, rng=None) -> 'BattleshipAI':
+        """Восстановить ИИ из export_state"""
+        ai = cls(rng=rng)
+        ai.hits = [tuple(p) for p in state['hits']]
+        ai.misses = {tuple(p) for p in state['misses']}
+        ai.last_hits = [tuple(p) for p in state['last_hits']]
+        ai.hunting = state['hunting']
+        ai.direction = tuple(state['direction']) if state['direction'] else None
+        ai.sunk_ships = [[tuple(p) for p in ship] for ship in state['sunk_ships']]
+        ai.shot_history = {tuple(p) for p in state['shot_history']}
+        ai.forbidden_cells = {tuple(p) for p in state['forbidden_cells']}
+        return ai
+
+
+# Уровни сложности ИИ, доступные при создании игры
+AI_DIFFICULTIES = {
+    'normal': BattleshipAI,
+    'hard': DensityAI,
+}
+
+# Экспериментальные стратегии: только для симуляций, в игре их не выбрать
+EXPERIMENTAL_AIS = {
+    'expert': ExpertAI,
+}
+
+# Всё, что можно выставить в симуляции
+STRATEGIES = sorted(AI_DIFFICULTIES) + sorted(EXPERIMENTAL_AIS)
+
+
+def create_ai(difficulty: str = 'normal', batched: bool = False, rng=None):
+    """Создать ИИ выбранного уровня сложности.
+
+    При batched=True обычный ИИ считает ходы в общем пакетном движке.
+    """
+    if difficulty not in AI_DIFFICULTIES:
+        raise ValueError(f"Неизвестный уровень сложности: {difficulty}")
+    if batched and difficulty == 'normal':
+        return BatchedAI(batch_engine, rng=rng)
+    return AI_DIFFICULTIES[difficulty](rng=rng)
+
+
+def create_strategy(name: str, rng=None):
+    """ИИ для симуляции: уровень сложности или экспериментальная стратегия"""
+    if name in EXPERIMENTAL_AIS:
+        return EXPERIMENTAL_AIS[name](rng=rng)
+    return create_ai(name, rng=rng)
+
+
+def restore_ai(difficulty: str, state: dict, rng=None):
+    """Восстановить ИИ из export_state, например прочитанного из общего хранилища"""
+    if difficulty not in AI_DIFFICULTIES:
+        raise ValueError(f"Неизвестный уровень сложности: {difficulty}")
+    if difficulty == 'normal' and 'shots' in state:
+        # Состояние сохранено пакетным ИИ
+        return BatchedAI.from_state(state, batch_engine, rng=rng)
+    return AI_DIFFICULTIES[difficulty].from_state(state, rng=rng)
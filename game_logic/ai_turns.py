@@ -0,0 +1,120 @@
+"""Пул фоновых потоков для ходов ИИ.
+
+Обработчик атаки отвечает игроку сразу и ставит ход ИИ в очередь;
+поток пула выполняет его (run(game_id)) и сам рассылает результат.
+Игра стоит в очереди не больше одного раза, поэтому повторная постановка
+до начала расчёта ничего не делает.
+
+Под gevent потоки threading - гринлеты одного потока ОС, а расчёт хода
+ИИ занимает процессор и не уступает управление. Поэтому сам выстрел
+(think) считается в пуле настоящих потоков gevent.threadpool, а гринлет
+пула с блокировкой игры только ждёт результат; сохранение хода и
+рассылка остаются в потоке хаба.
+"""
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+try:
+    from gevent import monkey as gevent_monkey
+    from gevent.threadpool import ThreadPool
+except ImportError:  # gevent не установлен - потоки и так настоящие
+    gevent_monkey = None
+    ThreadPool = None
+
+from .workers import BackgroundWorker
+
+
+class AITurnPool:
+    """Очередь ходов ИИ и потоки, которые их выполняют"""
+
+    def __init__(self, run: Callable[[str], None], workers: int = 2,
+                 os_threads: Optional[bool] = None):
+        self.run = run
+        self.workers = workers
+        # Считать выстрелы в потоках ОС; None - если gevent подменил threading
+        self.os_threads = os_threads
+        self._thinkers = None
+        # game_id -> время постановки; порядок - очередь
+        self._pending = OrderedDict()
+        self._worker = BackgroundWorker(self._worker_loop, 'ai-turns', workers)
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.running = 0
+        self.wait_seconds = 0.0
+        self.turn_seconds = 0.0
+        self.max_turn_seconds = 0.0
+
+    def submit(self, game_id: str) -> bool:
+        """Поставить ход ИИ в очередь; False - игра уже ждёт своей очереди"""
+        self.start()
+        with self._worker.wakeup:
+            if game_id in self._pending:
+                return False
+            self._pending[game_id] = time.perf_counter()
+            self.submitted += 1
+            self._worker.wakeup.notify()
+        return True
+
+    def start(self):
+        """Запустить потоки пула (идемпотентно)"""
+        self._worker.start(self._create_thinkers)
+
+    def _create_thinkers(self):
+        os_threads = self.os_threads
+        if os_threads is None:
+            os_threads = gevent_monkey is not None and gevent_monkey.is_module_patched('threading')
+        if os_threads and ThreadPool is not None:
+            self._thinkers = ThreadPool(self.workers)
+
+    def think(self, ai) -> Tuple[int, int]:
+        """Выстрел ИИ; под gevent расчёт идёт в потоке ОС, вызывающий гринлет ждёт.
+
+        BatchedAI сам ждёт общий движок, который считает ходы пачками, и
+        считается на месте.
+        """
+        from .batch_ai import BatchedAI
+        if self._thinkers is None or isinstance(ai, BatchedAI):
+            return ai.generate_shot()
+        return self._thinkers.apply(ai.generate_shot)
+
+    def _worker_loop(self):
+        wakeup = self._worker.wakeup
+        while True:
+            with wakeup:
+                while not self._pending:
+                    wakeup.wait()
+                game_id, queued_at = self._pending.popitem(last=False)
+                self.running += 1
+            started = time.perf_counter()
+            try:
+                self.run(game_id)
+                failed = False
+            except Exception as e:
+                failed = True
+                print(f"[AITurns] Ошибка хода ИИ в игре {game_id}: {e}")
+            elapsed = time.perf_counter() - started
+            with wakeup:
+                self.running -= 1
+                self.failed += failed
+                self.completed += not failed
+                self.wait_seconds += started - queued_at
+                self.turn_seconds += elapsed
+                self.max_turn_seconds = max(self.max_turn_seconds, elapsed)
+
+    def stats(self) -> dict:
+        """Счётчики пула для мониторинга"""
+        done = (self.completed + self.failed) or 1
+        return {
+            'workers': self.workers,
+            'os_threads': self._thinkers is not None,
+            'pending': len(self._pending),
+            'running': self.running,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait_ms': round(self.wait_seconds / done * 1000, 3),
+            'avg_turn_ms': round(self.turn_seconds / done * 1000, 3),
+            'max_turn_ms': round(self.max_turn_seconds * 1000, 3)
+        }
@@ -0,0 +1,291 @@
+"""Пакетный расчёт ходов ИИ для многих игр сразу.
+
+Состояние всех подключённых игр лежит в общих массивах NumPy формы
+(N, 100): сделанные выстрелы, запретные клетки вокруг потопленных
+кораблей и попадания в ещё не потопленные корабли. Ходы для пачки игр
+считаются одним векторным проходом с той же тактикой, что и у
+BattleshipAI: добивание раненого корабля вдоль найденной линии, иначе
+стрельба "в шахматном порядке".
+
+Запросы из обработчиков копятся в очереди, фоновый поток забирает их
+пачками и возвращает результат через concurrent.futures.Future.
+
+Дебют и эндшпиль BatchedAI считает сам, как BattleshipAI: первые
+выстрелы - из дебютной книги, в конце партии - решатель из solver.
+"""
+import random
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .bitboard import CELLS, FULL_MASK, SIZE, cell_bit, dilate, mask_from_positions, positions_from_mask
+from .placement import FLEET
+from .solver import ENDGAME_SHIPS, OPENING_SHOTS, exact_shot, opening_shot
+from .workers import BackgroundWorker
+
+_PARITY = np.array([(i % SIZE + i // SIZE) % 2 == 0 for i in range(CELLS)])
+
+
+def _neighbours(mask: np.ndarray, horizontal: bool, vertical: bool) -> np.ndarray:
+    """Соседи клеток маски (N, 10, 10) по выбранным направлениям"""
+    result = np.zeros_like(mask)
+    if horizontal:
+        result[:, :, 1:] |= mask[:, :, :-1]
+        result[:, :, :-1] |= mask[:, :, 1:]
+    if vertical:
+        result[:, 1:, :] |= mask[:, :-1, :]
+        result[:, :-1, :] |= mask[:, 1:, :]
+    return result
+
+
+class BatchAIEngine:
+    """Векторный движок ходов ИИ для множества игр"""
+
+    def __init__(self, capacity: int = 1024, max_batch: int = 256,
+                 max_wait: float = 0.002, seed=None):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._shots = np.zeros((capacity, CELLS), dtype=bool)
+        self._forbidden = np.zeros((capacity, CELLS), dtype=bool)
+        self._unresolved = np.zeros((capacity, CELLS), dtype=bool)
+        self._free_slots = list(range(capacity - 1, -1, -1))
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._dispatcher = BackgroundWorker(self._dispatch_loop, 'batch-ai')
+        self.batches = 0
+        self.moves = 0
+
+    # ---------- управление слотами ----------
+
+    def allocate(self) -> int:
+        """Выделить строку массивов под новую игру"""
+        with self._lock:
+            if not self._free_slots:
+                self._grow()
+            return self._free_slots.pop()
+
+    def release(self, slot: int):
+        """Освободить строку после окончания игры"""
+        with self._lock:
+            self._shots[slot] = False
+            self._forbidden[slot] = False
+            self._unresolved[slot] = False
+            self._free_slots.append(slot)
+
+    def slot_size(self) -> int:
+        """Байт на одну игру в общих массивах"""
+        return sum(array.itemsize * array.shape[1] for array in (self._shots, self._forbidden, self._unresolved))
+
+    def _grow(self):
+        capacity = len(self._shots)
+        for name in ('_shots', '_forbidden', '_unresolved'):
+            old = getattr(self, name)
+            new = np.zeros((capacity * 2, CELLS), dtype=bool)
+            new[:capacity] = old
+            setattr(self, name, new)
+        self._free_slots.extend(range(capacity * 2 - 1, capacity - 1, -1))
+
+    # ---------- обновление состояния ----------
+
+    def record_shot(self, slot: int, x: int, y: int, result: str, sunk_positions=None):
+        """Записать результат выстрела игры в её строку"""
+        idx = y * SIZE + x
+        with self._lock:
+            self._shots[slot, idx] = True
+            if result != 'hit':
+                return
+            self._unresolved[slot, idx] = True
+            if sunk_positions:
+                for sx, sy in sunk_positions:
+                    self._unresolved[slot, sy * SIZE + sx] = False
+                    for dx in (-1, 0, 1):
+                        for dy in (-1, 0, 1):
+                            nx, ny = sx + dx, sy + dy
+                            if 0 <= nx < SIZE and 0 <= ny < SIZE:
+                                self._forbidden[slot, ny * SIZE + nx] = True
+
+    # ---------- расчёт ходов ----------
+
+    def compute(self, slots: Sequence[int]) -> List[Optional[Tuple[int, int]]]:
+        """Посчитать по одному ходу для каждой игры из slots за один проход.
+
+        Если свободных клеток не осталось, ход - в запретную, но не обстрелянную
+        клетку; если обстреляно всё поле, вместо хода None.
+        """
+        rows = np.asarray(slots, dtype=np.intp)
+        with self._lock:
+            shots = self._shots[rows]
+            excluded = shots | self._forbidden[rows]
+            unresolved = self._unresolved[rows].reshape(-1, SIZE, SIZE)
+        n = len(rows)
+        free = ~excluded
+
+        # Ориентация раненого корабля: две соседние раненые клетки по линии
+        horizontal = (unresolved[:, :, 1:] & unresolved[:, :, :-1]).any(axis=(1, 2))
+        vertical = (unresolved[:, 1:, :] & unresolved[:, :-1, :]).any(axis=(1, 2))
+        along_line = np.where(
+            horizontal[:, None],
+            _neighbours(unresolved, True, False).reshape(n, CELLS),
+            _neighbours(unresolved, False, True).reshape(n, CELLS),
+        )
+        around = _neighbours(unresolved, True, True).reshape(n, CELLS)
+        target = np.where((horizontal | vertical)[:, None], along_line, around) & free
+
+        score = target * 4.0 + (_PARITY & free) * 2.0 + free * 1.0
+        score += self._rng.random((n, CELLS))
+        # Уже обстрелянные и запретные клетки не выбираются никогда
+        score = np.where(free, score, -np.inf)
+        exhausted = ~free.any(axis=1)
+        if exhausted.any():
+            # Свободных клеток нет: остаются запретные, куда ещё не стреляли
+            fallback = np.where(~shots[exhausted], self._rng.random((int(exhausted.sum()), CELLS)), -np.inf)
+            score[exhausted] = fallback
+        best = score.argmax(axis=1)
+        available = np.isfinite(score[np.arange(n), best])
+
+        self.batches += 1
+        self.moves += n
+        return [(int(i) % SIZE, int(i) // SIZE) if ok else None for i, ok in zip(best, available)]
+
+    # ---------- очередь запросов ----------
+
+    def submit(self, slot: int) -> Future:
+        """Поставить игру в очередь на расчёт хода"""
+        self.start()
+        future = Future()
+        with self._dispatcher.wakeup:
+            self._pending.append((slot, future))
+            self._dispatcher.wakeup.notify()
+        return future
+
+    def start(self):
+        """Запустить фоновый поток пакетной обработки (идемпотентно)"""
+        self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        wakeup = self._dispatcher.wakeup
+        while True:
+            with wakeup:
+                while not self._pending:
+                    wakeup.wait()
+            # Немного ждём, чтобы собрать пачку побольше
+            if len(self._pending) < self.max_batch and self.max_wait > 0:
+                time.sleep(self.max_wait)
+            with wakeup:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+            try:
+                moves = self.compute([slot for slot, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), move in zip(batch, moves):
+                future.set_result(move)
+
+    def stats(self) -> dict:
+        """Счётчики движка для мониторинга"""
+        return {
+            'games': len(self._shots) - len(self._free_slots),
+            'capacity': len(self._shots),
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'moves': self.moves
+        }
+
+
+class BatchedAI:
+    """ИИ одной игры, считающий ходы через общий BatchAIEngine.
+
+    Интерфейс совпадает с BattleshipAI, поэтому обработчики хода работают
+    с ним без изменений: generate_shot ставит игру в очередь и ждёт ответ.
+    Дебютные выстрелы и эндшпиль считаются на месте по битовым маскам игры.
+    """
+    difficulty = 'normal'
+
+    def __init__(self, engine: BatchAIEngine, timeout: float = 1.0, rng=None):
+        self.engine = engine
+        self.timeout = timeout
+        self.rng = rng or random.Random()
+        self.slot = engine.allocate()
+        self._log = []
+        # Обстрелянные клетки, ореолы потопленных, попадания в непотопленные
+        self._shots = 0
+        self._forbidden = 0
+        self._unresolved = 0
+        self._sunk = []
+
+    def generate_shot(self) -> Tuple[int, int]:
+        """Ход решателя или из книги, иначе из общей пачки (при задержке - сразу)"""
+        shot = self._local_shot()
+        if shot is not None:
+            return shot
+        future = self.engine.submit(self.slot)
+        try:
+            shot = future.result(timeout=self.timeout)
+        except Exception:
+            shot = self.engine.compute([self.slot])[0]
+        if shot is None:
+            raise ValueError("Все клетки поля уже обстреляны")
+        return shot
+
+    def _local_shot(self) -> Optional[Tuple[int, int]]:
+        """Выстрел без движка: решатель в эндшпиле или дебютная книга"""
+        if len(FLEET) - len(self._sunk) <= ENDGAME_SHIPS:
+            fleet = list(FLEET)
+            for length in self._sunk:
+                fleet.remove(length)
+            available = FULL_MASK & ~self._shots & ~self._forbidden
+            shot = exact_shot(available, self._unresolved, fleet, self.rng)
+            if shot is not None:
+                return shot
+        if not self._unresolved and len(self._log) < OPENING_SHOTS:
+            return opening_shot(set(positions_from_mask(self._shots | self._forbidden)), self.rng)
+        return None
+
+    def record_shot(self, x: int, y: int, result: str, sunk_positions=None):
+        """Запись результата выстрела"""
+        self._log.append([x, y, result, [list(p) for p in sunk_positions] if sunk_positions else None])
+        self.engine.record_shot(self.slot, x, y, result, sunk_positions)
+        self._shots |= cell_bit(x, y)
+        if result == 'hit':
+            self._unresolved |= cell_bit(x, y)
+            if sunk_positions:
+                ship = mask_from_positions(tuple(p) for p in sunk_positions)
+                self._unresolved &= ~ship
+                self._forbidden |= dilate(ship)
+                self._sunk.append(len(sunk_positions))
+
+    def memory_size(self) -> int:
+        """Память игры: сам ИИ, журнал, маски и своя строка движка (без общих массивов)"""
+        masks = (self._shots, self._forbidden, self._unresolved, self._sunk)
+        return (sys.getsizeof(self) + sys.getsizeof(self._log)
+                + sum(sys.getsizeof(shot) for shot in self._log)
+                + sum(sys.getsizeof(value) for value in masks) + self.engine.slot_size())
+
+    def export_state(self) -> dict:
+        """Состояние ИИ: журнал выстрелов, по которому заполняется строка движка"""
+        return {'shots': self._log}
+
+    @classmethod
+    def from_state(cls, state: dict, engine: BatchAIEngine, rng=None) -> 'BatchedAI':
+        """Восстановить ИИ в новом слоте движка"""
+        ai = cls(engine, rng=rng)
+        for x, y, result, sunk_positions in state['shots']:
+            ai.record_shot(x, y, result, sunk_positions)
+        return ai
+
+    def close(self):
+        """Вернуть слот движку"""
+        if self.slot is not None:
+            self.engine.release(self.slot)
+            self.slot = None
+
+
+# Общий движок процесса
+batch_engine = BatchAIEngine()
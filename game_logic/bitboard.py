@@ -0,0 +1,85 @@
+"""Битовое представление игрового поля.
+
+Клетка (x, y) поля 10x10 соответствует биту с номером y * SIZE + x,
+поэтому любое множество клеток (корабль, попадания, промахи, ореол
+вокруг кораблей) хранится одним целым числом на 100 бит.
+"""
+from typing import Iterable, Iterator, List, Tuple
+
+SIZE = 10
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1
+BITMAP_BYTES = (CELLS + 7) // 8
+
+# Маски столбцов для сдвигов влево/вправо без переноса на соседнюю строку
+_FIRST_COLUMN = sum(1 << (y * SIZE) for y in range(SIZE))
+_LAST_COLUMN = sum(1 << (y * SIZE + SIZE - 1) for y in range(SIZE))
+
+
+def cell_index(x: int, y: int) -> int:
+    """Номер бита для клетки (x, y)"""
+    return y * SIZE + x
+
+
+def cell_bit(x: int, y: int) -> int:
+    """Маска из одной клетки (x, y)"""
+    return 1 << (y * SIZE + x)
+
+
+def mask_from_positions(positions: Iterable[Tuple[int, int]]) -> int:
+    """Собрать маску из списка координат"""
+    mask = 0
+    for x, y in positions:
+        mask |= 1 << (y * SIZE + x)
+    return mask
+
+
+def iter_indices(mask: int) -> Iterator[int]:
+    """Номера установленных битов по возрастанию"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def positions_from_mask(mask: int) -> List[Tuple[int, int]]:
+    """Список координат (x, y) установленных битов"""
+    return [(idx % SIZE, idx // SIZE) for idx in iter_indices(mask)]
+
+
+def to_bitmap(mask: int) -> bytes:
+    """Маска в виде 13-байтовой битовой карты в порядке Redis (бит 0 - старший бит первого байта)"""
+    data = bytearray(BITMAP_BYTES)
+    for idx in iter_indices(mask):
+        data[idx >> 3] |= 0x80 >> (idx & 7)
+    return bytes(data)
+
+
+def from_bitmap(data) -> int:
+    """Обратное к to_bitmap; пустое значение даёт пустую маску"""
+    mask = 0
+    for i, byte in enumerate(data or b''):
+        while byte:
+            high = byte.bit_length() - 1
+            mask |= 1 << (i * 8 + 7 - high)
+            byte ^= 1 << high
+    return mask
+
+
+def dilate(mask: int) -> int:
+    """Маска вместе со всеми соседними клетками (включая диагональ)"""
+    row = mask | ((mask & ~_LAST_COLUMN) << 1) | ((mask & ~_FIRST_COLUMN) >> 1)
+    return (row | (row << SIZE) | (row >> SIZE)) & FULL_MASK
+
+
+# Восемь симметрий квадрата (группа диэдра): преобразования координат
+SYMMETRIES = (
+    lambda x, y: (x, y),
+    lambda x, y: (SIZE - 1 - x, y),
+    lambda x, y: (x, SIZE - 1 - y),
+    lambda x, y: (SIZE - 1 - x, SIZE - 1 - y),
+    lambda x, y: (y, x),
+    lambda x, y: (SIZE - 1 - y, x),
+    lambda x, y: (y, SIZE - 1 - x),
+    lambda x, y: (SIZE - 1 - y, SIZE - 1 - x),
+)
@@ -0,0 +1,275 @@
+"""Компактный двоичный формат снимков Game и GameRoom.
+
+Снимок начинается с заголовка фиксированного размера, за ним идут
+переменные части:
+
+    0   B   версия формата
+    1   B   вид: 0 - одиночная игра, 1 - комната
+    2   B   флаги игры: статус (2 бита), ход, победитель (2 бита),
+            готовность player1 / player2, есть ли игра
+    3   B   флаги комнаты: статус (2 бита), готовность player1 / player2
+    4   11  последний ход: роль, клетка, результат, время (double)
+    15  16  время создания и последней активности комнаты (double)
+    31  52  битовые карты: попадания и промахи по полям player1 и player2,
+            по 13 байт в порядке битов Redis
+    83  ... корабли каждого поля (число, затем длина и клетки корабля)
+            и строки (ID игры, игроки) с длиной в 1 байт, 0xFF - None
+    ... до конца: журнал ходов, по байту на выстрел (старший бит - поле
+            player2, остальные - клетка); результат выводится из кораблей
+
+Поле с семью кораблями занимает 51 байт. Всё, что меняет выстрел, лежит
+в заголовке по постоянным смещениям, а журнал - в конце снимка, поэтому
+общее хранилище записывает ход командами SETBIT, SETRANGE и APPEND, не
+переписывая снимок целиком.
+Декодирование читает буфер через memoryview без промежуточных копий.
+"""
+import struct
+from typing import Optional, Union
+
+from .bitboard import BITMAP_BYTES, SIZE, from_bitmap, iter_indices, to_bitmap
+from .core import Game, GameRoom
+
+VERSION = 1
+
+KIND_GAME = 0
+KIND_ROOM = 1
+
+ROLES = ('player1', 'player2')
+STATUSES = ('waiting', 'placement', 'active', 'finished')
+RESULTS = ('miss', 'hit', 'invalid')
+
+_HEADER = struct.Struct('<BBBB')
+_LAST_MOVE = struct.Struct('<BBBd')
+_TIMES = struct.Struct('<dd')
+
+FLAGS_OFFSET = 2
+LAST_MOVE_OFFSET = _HEADER.size
+TIMES_OFFSET = LAST_MOVE_OFFSET + _LAST_MOVE.size
+BITMAPS_OFFSET = TIMES_OFFSET + _TIMES.size
+BODY_OFFSET = BITMAPS_OFFSET + 4 * BITMAP_BYTES
+
+_NONE = 0xFF
+
+
+class CodecError(ValueError):
+    """Снимок не удалось закодировать или прочитать"""
+
+
+def bitmap_offset(role: str, hit: bool) -> int:
+    """Смещение (в байтах) битовой карты попаданий или промахов по полю role"""
+    return BITMAPS_OFFSET + (ROLES.index(role) * 2 + (0 if hit else 1)) * BITMAP_BYTES
+
+
+def move_byte(target_role: str, x: int, y: int) -> int:
+    """Байт журнала ходов для выстрела по полю target_role"""
+    return ROLES.index(target_role) << 7 | y * SIZE + x
+
+
+# ---------- кодирование ----------
+
+def _index(values, value, what: str) -> int:
+    try:
+        return values.index(value)
+    except ValueError:
+        raise CodecError(f"Нельзя закодировать {what}: {value!r}") from None
+
+
+def _game_flags(game: Optional[Game]) -> int:
+    if game is None:
+        return 0
+    winner = 0 if game.winner is None else 1 + _index(ROLES, game.winner, 'победителя')
+    return (_index(STATUSES, game.status, 'статус игры')
+            | _index(ROLES, game.current_turn, 'ход') << 2
+            | winner << 3
+            | ('player1' in game.ready_players) << 5
+            | ('player2' in game.ready_players) << 6
+            | 1 << 7)
+
+
+def _room_flags(room: Optional[GameRoom]) -> int:
+    if room is None:
+        return 0
+    return (_index(STATUSES, room.status, 'статус комнаты')
+            | room.player1_ready << 2
+            | room.player2_ready << 3)
+
+
+def _last_move(game: Optional[Game]) -> bytes:
+    move = game.last_move if game else None
+    if not move:
+        return _LAST_MOVE.pack(0, 0, 0, 0.0)
+    return _LAST_MOVE.pack(1 + _index(ROLES, move['player'], 'роль хода'),
+                           move['y'] * SIZE + move['x'],
+                           _index(RESULTS, move['result'], 'результат хода'),
+                           move.get('timestamp', 0.0))
+
+
+def _string(value: Optional[str]) -> bytes:
+    if value is None:
+        return bytes((_NONE,))
+    data = value.encode('utf-8')
+    if len(data) >= _NONE:
+        raise CodecError(f"Слишком длинная строка: {value[:20]}...")
+    return bytes((len(data),)) + data
+
+
+def dynamic_header(owner: Union[Game, GameRoom]) -> bytes:
+    """Изменяемая часть заголовка (флаги, последний ход, время) - всё, кроме карт выстрелов"""
+    room = owner if isinstance(owner, GameRoom) else None
+    game = room.game if room else owner
+    times = _TIMES.pack(room.created_at, room.last_activity) if room else _TIMES.pack(0.0, 0.0)
+    return bytes((_game_flags(game), _room_flags(room))) + _last_move(game) + times
+
+
+def _encode(kind: int, owner, game: Optional[Game], strings) -> bytes:
+    parts = [bytes((VERSION, kind)), dynamic_header(owner)]
+    ships = []
+    for role in ROLES:
+        board = game.boards[role] if game else None
+        parts.append(to_bitmap(board._hit_mask if board else 0))
+        parts.append(to_bitmap(board._miss_mask if board else 0))
+        masks = board._ship_masks if board else []
+        ships.append(bytes((len(masks),)))
+        for mask in masks:
+            cells = list(iter_indices(mask))
+            ships.append(bytes((len(cells), *cells)))
+    parts.extend(ships)
+    parts.extend(_string(value) for value in strings)
+    if game:
+        parts.append(bytes(move_byte(role, x, y) for role, x, y, _ in game.moves))
+    return b''.join(parts)
+
+
+def encode_game(game: Game) -> bytes:
+    """Снимок одиночной игры"""
+    return _encode(KIND_GAME, game, game,
+                   (game.id, game.players['player1'], game.players['player2']))
+
+
+def encode_room(room: GameRoom) -> bytes:
+    """Снимок комнаты вместе с её игрой"""
+    game = room.game
+    strings = [room.room_code, room.creator_id, room.player1_id, room.player2_id]
+    if game:
+        strings += [game.id, game.players['player1'], game.players['player2']]
+    return _encode(KIND_ROOM, room, game, strings)
+
+
+# ---------- декодирование ----------
+
+class _Reader:
+    """Последовательное чтение из memoryview без копирования"""
+
+    def __init__(self, view: memoryview, offset: int):
+        self.view = view
+        self.offset = offset
+
+    def byte(self) -> int:
+        value = self.view[self.offset]
+        self.offset += 1
+        return value
+
+    def cells(self, count: int) -> memoryview:
+        cells = self.view[self.offset:self.offset + count]
+        if len(cells) != count:
+            raise CodecError("Снимок обрезан")
+        self.offset += count
+        return cells
+
+    def string(self) -> Optional[str]:
+        length = self.byte()
+        if length == _NONE:
+            return None
+        return str(self.cells(length), 'utf-8')
+
+
+def _decode_moves(moves: memoryview, ships: dict) -> list:
+    ship_cells = {role: {idx for cells in ships[role] for idx in cells} for role in ROLES}
+    result = []
+    for byte in moves:
+        role, idx = ROLES[byte >> 7], byte & 0x7F
+        result.append((role, idx % SIZE, idx // SIZE, 'hit' if idx in ship_cells[role] else 'miss'))
+    return result
+
+
+def _decode_game(view: memoryview, ships: dict, game_id: str, players, flags: int,
+                 moves: memoryview) -> Game:
+    boards = {}
+    for role in ROLES:
+        hits = bitmap_offset(role, True)
+        misses = bitmap_offset(role, False)
+        boards[role] = {
+            'ships': ships[role],
+            'hits': from_bitmap(view[hits:hits + BITMAP_BYTES]),
+            'misses': from_bitmap(view[misses:misses + BITMAP_BYTES])
+        }
+    winner = flags >> 3 & 3
+    role, cell, result, timestamp = _LAST_MOVE.unpack_from(view, LAST_MOVE_OFFSET)
+    last_move = None
+    if role:
+        last_move = {'player': ROLES[role - 1], 'x': cell % SIZE, 'y': cell // SIZE,
+                     'result': RESULTS[result], 'timestamp': timestamp}
+    return Game.from_state({
+        'id': game_id,
+        'players': {'player1': players[0], 'player2': players[1]},
+        'current_turn': ROLES[flags >> 2 & 1],
+        'status': STATUSES[flags & 3],
+        'winner': ROLES[winner - 1] if winner else None,
+        'ready_players': [role for bit, role in ((5, 'player1'), (6, 'player2')) if flags >> bit & 1],
+        'last_move': last_move,
+        'moves': _decode_moves(moves, ships),
+        'boards': boards
+    })
+
+
+def decode(data) -> Union[Game, GameRoom]:
+    """Прочитать снимок любого вида (bytes, bytearray или memoryview)"""
+    view = memoryview(data)
+    if len(view) < BODY_OFFSET:
+        raise CodecError("Снимок обрезан")
+    version, kind, game_flags, room_flags = _HEADER.unpack_from(view)
+    if version != VERSION:
+        raise CodecError(f"Неподдерживаемая версия снимка: {version}")
+    if kind not in (KIND_GAME, KIND_ROOM):
+        raise CodecError(f"Неизвестный вид снимка: {kind}")
+
+    reader = _Reader(view, BODY_OFFSET)
+    try:
+        ships = {role: [list(reader.cells(reader.byte())) for _ in range(reader.byte())]
+                 for role in ROLES}
+        if kind == KIND_GAME:
+            game_id, player1, player2 = reader.string(), reader.string(), reader.string()
+            return _decode_game(view, ships, game_id, (player1, player2), game_flags,
+                                view[reader.offset:])
+
+        code, creator, player1, player2 = (reader.string() for _ in range(4))
+        room = GameRoom(code, creator)
+        room.player1_id = player1
+        room.player2_id = player2
+        room.status = STATUSES[room_flags & 3]
+        room.player1_ready = bool(room_flags >> 2 & 1)
+        room.player2_ready = bool(room_flags >> 3 & 1)
+        room.created_at, room.last_activity = _TIMES.unpack_from(view, TIMES_OFFSET)
+        if game_flags >> 7:
+            game_id, game_player1, game_player2 = reader.string(), reader.string(), reader.string()
+            room.game = _decode_game(view, ships, game_id, (game_player1, game_player2), game_flags,
+                                     view[reader.offset:])
+        return room
+    except IndexError:
+        raise CodecError("Снимок обрезан") from None
+
+
+def decode_game(data) -> Game:
+    """Прочитать снимок одиночной игры"""
+    game = decode(data)
+    if not isinstance(game, Game):
+        raise CodecError("Ожидался снимок игры")
+    return game
+
+
+def decode_room(data) -> GameRoom:
+    """Прочитать снимок комнаты"""
+    room = decode(data)
+    if not isinstance(room, GameRoom):
+        raise CodecError("Ожидался снимок комнаты")
+    return room
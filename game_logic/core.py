@@ -1,6 +1,11 @@
 import random
 from typing import List, Tuple, Optional, Set
 
+from .bitboard import CELLS, SIZE, dilate, iter_indices
+from .movelog import MoveLog
+from .moves import MoveError, MoveResult, apply_move
+from .placement import FLEET, generate_fleet
+
 class Ship:
     def __init__(self, length: int, positions: List[Tuple[int, int]]):
         self.length = length
@@ -11,12 +16,54 @@ class Ship:
         return len(self.hits) == len(self.positions)
 
 class Board:
-    SIZE = 10
+    """Игровое поле на битовых масках.
+
+    Корабли, попадания, промахи и ореол вокруг кораблей (клетки, куда
+    нельзя ставить следующий корабль) хранятся 100-битными числами.
+    Атрибут ``grid`` остался для старого кода и строится лениво.
+    Индекс клетка -> номер корабля и счётчики оставшихся палуб и кораблей
+    делают обработку выстрела и проверку конца игры O(1).
+    """
+    SIZE = SIZE
     
     def __init__(self):
-        self.grid = [['~' for _ in range(self.SIZE)] for _ in range(self.SIZE)]
         self.ships = []
         self.misses = set()
+        self._ship_masks = []
+        self._ship_mask = 0
+        self._hit_mask = 0
+        self._miss_mask = 0
+        self._halo_mask = 0
+        self._grid = None
+        self._cell_ship = [-1] * CELLS
+        self._hull_left = []
+        self.hull_remaining = 0
+        self.ships_remaining = 0
+    
+    @property
+    def grid(self):
+        """Представление поля в виде матрицы символов ('~', 'S', 'X', 'O')"""
+        if self._grid is None:
+            grid = [['~'] * self.SIZE for _ in range(self.SIZE)]
+            for idx in iter_indices(self._ship_mask):
+                grid[idx // self.SIZE][idx % self.SIZE] = 'S'
+            for idx in iter_indices(self._hit_mask):
+                grid[idx // self.SIZE][idx % self.SIZE] = 'X'
+            for idx in iter_indices(self._miss_mask):
+                grid[idx // self.SIZE][idx % self.SIZE] = 'O'
+            self._grid = grid
+        return self._grid
+    
+    def shots(self) -> List[Tuple[int, int, str]]:
+        """Все выстрелы по полю: (x, y, 'hit' / 'miss') в порядке клеток"""
+        shots = [(idx, 'hit') for idx in iter_indices(self._hit_mask)]
+        shots += [(idx, 'miss') for idx in iter_indices(self._miss_mask)]
+        shots.sort()
+        return [(idx % self.SIZE, idx // self.SIZE, kind) for idx, kind in shots]
+    
+    def is_attacked(self, x: int, y: int) -> bool:
+        """Стреляли ли уже в эту клетку"""
+        return bool((self._hit_mask | self._miss_mask) >> (y * self.SIZE + x) & 1)
     
     def place_ship(self, ship: Ship) -> bool:
         """Старый метод для обратной совместимости"""
@@ -37,122 +84,111 @@ class Board:
             return False, f"Некорректные координаты: {pos}"
         
         # Проверяем, что все клетки в пределах доски
+        mask = 0
         for x, y in positions:
             if not (0 <= x < self.SIZE and 0 <= y < self.SIZE):
                 return False, "Корабль выходит за пределы доски"
+            mask |= 1 << (y * self.SIZE + x)
         
         # Проверяем, что клетки свободны
-        for x, y in positions:
-            if self.grid[y][x] != '~':
-                return False, "Клетка уже занята"
+        if mask & (self._ship_mask | self._miss_mask):
+            return False, "Клетка уже занята"
         
         # Проверяем, что корабли не соприкасаются
-        for x, y in positions:
-            for dx in [-1, 0, 1]:
-                for dy in [-1, 0, 1]:
-                    nx, ny = x + dx, y + dy
-                    if (0 <= nx < self.SIZE and 0 <= ny < self.SIZE and 
-                        self.grid[ny][nx] != '~'):
-                        return False, "Корабли не должны соприкасаться"
+        if mask & self._halo_mask:
+            return False, "Корабли не должны соприкасаться"
         
         # Если все проверки пройдены - размещаем корабль
-        ship = Ship(len(positions), positions)
-        for x, y in positions:
-            self.grid[y][x] = 'S'
-        self.ships.append(ship)
+        self._add_ship(positions, mask)
         return True, "Корабль размещен"
 
-    def auto_place_all_ships(self):
-        """Автоматическая расстановка всех кораблей по правилам"""
-        ship_lengths = [4, 3, 3, 2, 2, 1, 1]
+    def _add_ship(self, positions, mask: int):
+        """Добавить уже проверенный корабль"""
+        ship_id = len(self.ships)
+        cells = mask.bit_count()
+        self.ships.append(Ship(len(positions), positions))
+        self._ship_masks.append(mask)
+        self._hull_left.append(cells)
+        for idx in iter_indices(mask):
+            self._cell_ship[idx] = ship_id
+        self.hull_remaining += cells
+        if cells:
+            self.ships_remaining += 1
+        self._ship_mask |= mask
+        self._halo_mask |= dilate(mask)
+        self._grid = None
+
+    def clear(self):
+        """Убрать все корабли и выстрелы"""
         self.ships = []
-        self.grid = [['~' for _ in range(self.SIZE)] for _ in range(self.SIZE)]
-        
-        for length in ship_lengths:
-            placed = False
-            attempts = 0
-            
-            while not placed and attempts < 100:
-                horizontal = random.choice([True, False])
-                
-                if horizontal:
-                    max_x = self.SIZE - length
-                    max_y = self.SIZE - 1
-                    start_x = random.randint(0, max_x)
-                    start_y = random.randint(0, max_y)
-                    positions = [(start_x + i, start_y) for i in range(length)]
-                else:
-                    max_x = self.SIZE - 1
-                    max_y = self.SIZE - length
-                    start_x = random.randint(0, max_x)
-                    start_y = random.randint(0, max_y)
-                    positions = [(start_x, start_y + i) for i in range(length)]
-                
-                # Проверяем, можно ли разместить
-                can_place = True
-                for x, y in positions:
-                    if not (0 <= x < self.SIZE and 0 <= y < self.SIZE) or self.grid[y][x] != '~':
-                        can_place = False
-                        break
-                    
-                    for dx in [-1, 0, 1]:
-                        for dy in [-1, 0, 1]:
-                            nx, ny = x + dx, y + dy
-                            if (0 <= nx < self.SIZE and 0 <= ny < self.SIZE and 
-                                self.grid[ny][nx] != '~'):
-                                can_place = False
-                                break
-                    if not can_place:
-                        break
-                
-                if can_place:
-                    ship = Ship(length, positions)
-                    for x, y in positions:
-                        self.grid[y][x] = 'S'
-                    self.ships.append(ship)
-                    placed = True
-                
-                attempts += 1
-            
-            if not placed:
-                # Если не удалось разместить - начинаем заново
-                return self.auto_place_all_ships()
-        
+        self.misses = set()
+        self._ship_masks = []
+        self._ship_mask = 0
+        self._hit_mask = 0
+        self._miss_mask = 0
+        self._halo_mask = 0
+        self._grid = None
+        self._cell_ship = [-1] * CELLS
+        self._hull_left = []
+        self.hull_remaining = 0
+        self.ships_remaining = 0
+
+    def auto_place_all_ships(self, rng=None):
+        """Автоматическая расстановка всех кораблей по правилам"""
+        self.place_fleet(generate_fleet(rng=rng))
         return True
 
+    def place_fleet(self, placements):
+        """Поставить готовую расстановку (список Placement) на чистое поле"""
+        self.clear()
+        for placement in placements:
+            self._add_ship(list(placement.positions), placement.mask)
+
     def receive_attack(self, x: int, y: int) -> dict:
         """Обработка атаки по координатам"""
         # Валидация координат
         if not (0 <= x < self.SIZE and 0 <= y < self.SIZE):
             return {'result': 'invalid'}
         
-        # Проверка попадания
-        for i, ship in enumerate(self.ships):
-            if (x, y) in ship.positions:
-                ship.hits.add((x, y))
-                self.grid[y][x] = 'X'
-                
-                result = {
-                    'result': 'hit',
-                    'sunk': ship.is_sunk(),
-                    'ship_id': i,
-                    'ship_length': ship.length
-                }
-                
-                if ship.is_sunk():
-                    result['ship_positions'] = list(ship.positions)
-                
-                # Проверка победы
-                if all(s.is_sunk() for s in self.ships):
-                    result['game_over'] = True
-                
-                return result
+        idx = y * self.SIZE + x
+        bit = 1 << idx
+        i = self._cell_ship[idx]
         
         # Промах
-        if (x, y) not in self.misses:
-            self.misses.add((x, y))
-            self.grid[y][x] = 'O'
-        return {'result': 'miss'}
+        if i < 0:
+            if not self._miss_mask & bit:
+                self._miss_mask |= bit
+                self.misses.add((x, y))
+                self._grid = None
+            return {'result': 'miss'}
+        
+        # Попадание: повторный выстрел в подбитую палубу счётчики не меняет
+        ship = self.ships[i]
+        if not self._hit_mask & bit:
+            self._hit_mask |= bit
+            self._grid = None
+            ship.hits.add((x, y))
+            self._hull_left[i] -= 1
+            self.hull_remaining -= 1
+            if not self._hull_left[i]:
+                self.ships_remaining -= 1
+        sunk = not self._hull_left[i]
+        
+        result = {
+            'result': 'hit',
+            'sunk': sunk,
+            'ship_id': i,
+            'ship_length': ship.length
+        }
+        
+        if sunk:
+            result['ship_positions'] = list(ship.positions)
+        
+        # Проверка победы
+        if not self.ships_remaining:
+            result['game_over'] = True
+        
+        return result
     
     def get_all_ship_positions(self):
         """Возвращает все позиции кораблей"""
@@ -161,6 +197,25 @@ class Board:
             positions.extend(ship.positions)
         return positions
     
+    def export_state(self) -> dict:
+        """Компактное состояние поля: клетки кораблей и маски выстрелов"""
+        return {
+            'ships': [list(iter_indices(mask)) for mask in self._ship_masks],
+            'hits': self._hit_mask,
+            'misses': self._miss_mask
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'Board':
+        """Восстановить поле из export_state"""
+        board = cls()
+        for cells in state['ships']:
+            board._add_ship([(idx % SIZE, idx // SIZE) for idx in cells],
+                            sum(1 << idx for idx in cells))
+        for idx in iter_indices(state['hits'] | state['misses']):
+            board.receive_attack(idx % SIZE, idx // SIZE)
+        return board
+    
 class Game:
     def __init__(self, game_id: str, player1_id: str):
         self.id = game_id
@@ -171,6 +226,21 @@ class Game:
         self.winner = None
         self.ready_players = set()
         self.last_move = None
+        # Журнал выстрелов: (роль обстрелянного поля, x, y, результат)
+        self.moves = MoveLog()
+    
+    @property
+    def version(self) -> int:
+        """Версия игры по ходам: растёт на единицу с каждым выстрелом"""
+        return len(self.moves)
+    
+    def record_move(self, target_role: str, x: int, y: int, result: str) -> int:
+        """Добавить выстрел в журнал и вернуть новую версию"""
+        return self.moves.append(target_role, x, y, result)
+    
+    def moves_since(self, version: int) -> list:
+        """Выстрелы после указанной версии"""
+        return self.moves.since(version)
     
     def join_game(self, player2_id: str) -> bool:
         if self.players['player2'] is None:
@@ -178,13 +248,56 @@ class Game:
             return True
         return False
     
+    def get_player_role(self, player_id: str) -> Optional[str]:
+        """Роль игрока ('player1' / 'player2') или None"""
+        if player_id is None:
+            return None
+        for role, pid in self.players.items():
+            if pid == player_id:
+                return role
+        return None
+    
+    def export_state(self) -> dict:
+        """Состояние игры в виде словаря (поля - через Board.export_state)"""
+        return {
+            'id': self.id,
+            'players': dict(self.players),
+            'current_turn': self.current_turn,
+            'status': self.status,
+            'winner': self.winner,
+            'ready_players': sorted(self.ready_players),
+            'last_move': self.last_move,
+            'moves': [list(move) for move in self.moves],
+            'boards': {role: board.export_state() for role, board in self.boards.items()}
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'Game':
+        """Восстановить игру из export_state"""
+        game = cls(state['id'], state['players']['player1'])
+        game.players = dict(state['players'])
+        game.boards = {role: Board.from_state(board) for role, board in state['boards'].items()}
+        game.current_turn = state['current_turn']
+        game.status = state['status']
+        game.winner = state['winner']
+        game.ready_players = set(state['ready_players'])
+        game.last_move = state['last_move']
+        game.moves = MoveLog(state.get('moves', ()))
+        return game
+    
 # ==============================
 # КЛАССЫ ДЛЯ МУЛЬТИПЛЕЕРА
 # ==============================
 
+import string
+import threading
 import time
+import uuid
 from typing import Dict, Optional
 
+# Сколько раз ход перепроверяется, если другой воркер успел изменить комнату
+MOVE_RETRIES = 3
+
 class GameRoom:
     """Комната для мультиплеерной игры"""
     
@@ -258,9 +371,9 @@ class GameRoom:
     def start_game(self):
         """Начать игру в комнате"""
         if self.is_full() and self.player1_ready and self.player2_ready:
-            # Создаем игру
+            # Создаем игру; суффикс отличает партии одной комнаты друг от друга
             self.game = Game(
-                game_id=f"multi_{self.room_code}",
+                game_id=f"multi_{self.room_code}_{uuid.uuid4().hex[:6]}",
                 player1_id=self.player1_id
             )
             self.game.players['player2'] = self.player2_id
@@ -292,78 +405,458 @@ class GameRoom:
             'player2_ready': self.player2_ready,
             'has_game': self.game is not None
         }
+    
+    def export_state(self) -> dict:
+        """Полное состояние комнаты (в отличие от to_dict - вместе с игрой)"""
+        return {
+            'room_code': self.room_code,
+            'creator_id': self.creator_id,
+            'player1_id': self.player1_id,
+            'player2_id': self.player2_id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'last_activity': self.last_activity,
+            'player1_ready': self.player1_ready,
+            'player2_ready': self.player2_ready,
+            'game': self.game.export_state() if self.game else None
+        }
+    
+    @classmethod
+    def from_state(cls, state: dict) -> 'GameRoom':
+        """Восстановить комнату из export_state"""
+        room = cls(state['room_code'], state['creator_id'])
+        for name in ('player1_id', 'player2_id', 'status', 'created_at',
+                     'last_activity', 'player1_ready', 'player2_ready'):
+            setattr(room, name, state[name])
+        room.game = Game.from_state(state['game']) if state['game'] else None
+        return room
+
+
+class TimerWheel:
+    """Хешированное колесо таймеров.
+
+    Ключ кладётся в ячейку, соответствующую тику его срока. advance()
+    обходит только ячейки, чьё время пришло, поэтому постановка и снятие
+    срабатываний стоят O(1). Продление срока колесо не отслеживает:
+    владелец сам проверяет ключ при срабатывании и при необходимости
+    ставит его заново.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 512, clock=time.time):
+        self.tick_seconds = tick_seconds
+        self.clock = clock
+        self._buckets = [set() for _ in range(slots)]
+        self._current_tick = int(clock() // tick_seconds)
+        self._lock = threading.Lock()
+
+    def schedule(self, key, deadline: float):
+        """Поставить ключ на срабатывание не раньше deadline"""
+        with self._lock:
+            # Текущий тик читается под той же блокировкой, что и сдвигается в advance()
+            tick = max(int(deadline // self.tick_seconds) + 1, self._current_tick + 1)
+            self._buckets[tick % len(self._buckets)].add(key)
+
+    def advance(self, now: float = None) -> list:
+        """Сдвинуть колесо до now и вернуть ключи из пройденных ячеек"""
+        now = self.clock() if now is None else now
+        target_tick = int(now // self.tick_seconds)
+        due = []
+        with self._lock:
+            # Даже после долгой паузы каждая ячейка обходится не больше одного раза
+            steps = min(target_tick - self._current_tick, len(self._buckets))
+            for step in range(1, steps + 1):
+                bucket = self._buckets[(self._current_tick + step) % len(self._buckets)]
+                due.extend(bucket)
+                bucket.clear()
+            self._current_tick = max(self._current_tick, target_tick)
+        return due
+
+
+class RoomCodeAllocator:
+    """Выдача уникальных 6-символьных кодов комнат.
+
+    Код - число в системе счисления по основанию 36. Поиск свободного кода
+    начинается со случайного числа и идёт с шагом, взаимно простым с
+    размером пространства, поэтому перебирает все коды без повторов и
+    завершается даже при почти полной занятости.
+    """
+    ALPHABET = string.ascii_uppercase + string.digits
+    LENGTH = 6
+    SPACE = len(ALPHABET) ** LENGTH
+    STRIDE = 1_000_003  # простое число, не делит 36 ** 6
+
+    def __init__(self):
+        self.used = set()
+
+    def _encode(self, number: int) -> str:
+        chars = []
+        for _ in range(self.LENGTH):
+            number, digit = divmod(number, len(self.ALPHABET))
+            chars.append(self.ALPHABET[digit])
+        return ''.join(chars)
+
+    def allocate(self) -> str:
+        """Занять свободный код"""
+        number = random.randrange(self.SPACE)
+        for _ in range(self.SPACE):
+            code = self._encode(number)
+            if code not in self.used:
+                self.used.add(code)
+                return code
+            number = (number + self.STRIDE) % self.SPACE
+        raise RuntimeError("Свободные коды комнат закончились")
+
+    def release(self, code: str):
+        """Вернуть код в пул свободных"""
+        self.used.discard(code)
+
+
+class RoomLocks:
+    """Блокировки комнат, разбитые на шарды по коду комнаты.
+
+    Команды одной комнаты (ходы, готовность, расстановка) выполняются
+    строго по очереди, разные комнаты - параллельно: общую блокировку
+    делят только комнаты одного шарда. Считает ожидание блокировки
+    (очередь) и время под ней (задержка хода).
+    """
+
+    def __init__(self, shards: int = 256):
+        self._shards = [threading.RLock() for _ in range(shards)]
+        self._stats_lock = threading.Lock()
+        self.commands = 0
+        self.contended = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.hold_seconds = 0.0
+        self.max_hold_seconds = 0.0
+
+    def hold(self, room_code: str) -> '_RoomLock':
+        """Контекст, в котором команды комнаты не пересекаются"""
+        return _RoomLock(self, self._shards[hash(room_code) % len(self._shards)])
+
+    def _acquired(self, waited: float, contended: bool):
+        with self._stats_lock:
+            self.commands += 1
+            self.contended += contended
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _released(self, held: float):
+        with self._stats_lock:
+            self.hold_seconds += held
+            self.max_hold_seconds = max(self.max_hold_seconds, held)
+
+    def _queue(self, delta: int):
+        with self._stats_lock:
+            self.waiting += delta
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def stats(self) -> dict:
+        """Счётчики блокировок для мониторинга"""
+        commands = self.commands or 1
+        return {
+            'shards': len(self._shards),
+            'commands': self.commands,
+            'contended': self.contended,
+            'queue_depth': self.waiting,
+            'max_queue_depth': self.max_waiting,
+            'avg_wait_ms': round(self.wait_seconds / commands * 1000, 3),
+            'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+            'avg_latency_ms': round(self.hold_seconds / commands * 1000, 3),
+            'max_latency_ms': round(self.max_hold_seconds * 1000, 3)
+        }
+
+
+class _RoomLock:
+    __slots__ = ('_owner', '_lock', '_acquired_at')
+
+    def __init__(self, owner: RoomLocks, lock):
+        self._owner = owner
+        self._lock = lock
+
+    def __enter__(self):
+        started = time.perf_counter()
+        contended = not self._lock.acquire(blocking=False)
+        if contended:
+            self._owner._queue(1)
+            try:
+                self._lock.acquire()
+            finally:
+                self._owner._queue(-1)
+        self._acquired_at = time.perf_counter()
+        self._owner._acquired(self._acquired_at - started, contended)
+        return self
+
+    def __exit__(self, *exc):
+        held = time.perf_counter() - self._acquired_at
+        self._lock.release()
+        self._owner._released(held)
+        return False
 
 
 class GameManager:
-    """Менеджер для управления игровыми комнатами"""
+    """Менеджер для управления игровыми комнатами.
+
+    С общим хранилищем (backend.shared) источником правды служит backend:
+    get_room каждый раз читает комнату из него, а rooms и индекс игроков
+    лишь кэшируют то, что видел этот воркер. Изменения комнаты сохраняются
+    через save_room, отдельные выстрелы - через record_attack. Неактивные
+    комнаты в общем хранилище удаляются по TTL ключей.
+    """
     
-    def __init__(self):
+    def __init__(self, room_timeout: int = 300, backend=None, archive=None, history=None,
+                 ratings=None):
+        from .storage import MemoryBackend
+        self.backend = backend or MemoryBackend()
+        # Архив журналов законченных игр (movelog.MoveArchive) или None
+        self.archive = archive
+        # История матчей (history.MatchHistory) или None
+        self.history = history
+        # Рейтинги игроков (rating.RatingService) или None
+        self.ratings = ratings
         self.rooms: Dict[str, GameRoom] = {}
-        self.room_codes = set()
+        self.code_allocator = RoomCodeAllocator()
+        self.room_codes = self.code_allocator.used
+        # player_id -> {room_code: роль}; последняя комната игрока - в конце
+        self.player_rooms: Dict[str, Dict[str, str]] = {}
+        self.room_timeout = room_timeout
+        # Команды одной комнаты выполняются по очереди (см. RoomLocks)
+        self.room_locks = RoomLocks()
+        # Изменения rooms и player_rooms из разных комнат (и из потока удаления
+        # неактивных) не пересекаются; берётся внутри блокировки комнаты
+        self._registry_lock = threading.RLock()
+        self.expiry_wheel = TimerWheel()
+        self.expired_rooms = 0
+        self._expiry_listeners = []
+        self._expiry_thread = None
     
     def create_room(self, player_id: str) -> str:
         """Создать новую комнату с уникальным кодом"""
-        import random
-        import string
-        
-        # Генерация 6-значного кода
-        while True:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            if code not in self.room_codes:
-                break
+        code = self.code_allocator.allocate()
+        # Код мог занять другой воркер - берём следующий
+        while not self.backend.claim_room(code, self.room_timeout):
+            code = self.code_allocator.allocate()
         
         room = GameRoom(code, player_id)
         self.rooms[code] = room
-        self.room_codes.add(code)
+        self._index_player(player_id, code, 'player1')
+        self.expiry_wheel.schedule(code, room.last_activity + self.room_timeout)
+        self.save_room(room)
         return code
     
     def join_room(self, room_code: str, player_id: str) -> bool:
         """Присоединиться к комнате"""
-        room = self.rooms.get(room_code)
+        room = self.get_room(room_code)
         if room and not room.is_full() and room.status == 'waiting':
-            return room.join(player_id)
+            if room.join(player_id):
+                self._index_player(player_id, room_code, 'player2')
+                self.save_room(room)
+                return True
         return False
     
     def leave_room(self, room_code: str, player_id: str):
         """Покинуть комнату"""
-        room = self.rooms.get(room_code)
+        room = self.get_room(room_code)
         if room:
+            if self.get_player_role(room_code, player_id):
+                self._unindex_player(player_id, room_code)
             should_delete = room.leave(player_id)
             
             if should_delete:
                 # Удаляем комнату полностью
-                del self.rooms[room_code]
-                self.room_codes.remove(room_code)
+                self._delete_room(room_code)
             else:
                 # Обновляем активность, но сохраняем комнату
                 room.update_activity()
                 
                 # Если оба игрока вышли - все равно удаляем комнату
                 if room.player1_id is None and room.player2_id is None:
-                    del self.rooms[room_code]
-                    self.room_codes.remove(room_code)
+                    self._delete_room(room_code)
+                else:
+                    self.save_room(room)
+    
+    def _delete_room(self, room_code: str):
+        """Удалить комнату из всех структур менеджера"""
+        with self._registry_lock:
+            room = self.rooms.pop(room_code, None)
+            if room:
+                for player_id in (room.player1_id, room.player2_id):
+                    if player_id is not None:
+                        self._unindex_player(player_id, room_code)
+        self.code_allocator.release(room_code)
+        self.backend.delete_room(room_code)
+    
+    def _index_player(self, player_id: str, room_code: str, role: str):
+        with self._registry_lock:
+            rooms = self.player_rooms.setdefault(player_id, {})
+            rooms.pop(room_code, None)
+            rooms[room_code] = role
+    
+    def _unindex_player(self, player_id: str, room_code: str):
+        with self._registry_lock:
+            rooms = self.player_rooms.get(player_id)
+            if rooms is not None:
+                rooms.pop(room_code, None)
+                if not rooms:
+                    del self.player_rooms[player_id]
+    
+    def get_player_role(self, room_code: str, player_id: str) -> Optional[str]:
+        """Роль игрока в комнате ('player1' / 'player2') или None, O(1)"""
+        rooms = self.player_rooms.get(player_id)
+        return rooms.get(room_code) if rooms else None
     
     def get_room(self, room_code: str) -> Optional[GameRoom]:
         """Получить комнату по коду"""
+        if self.backend.shared:
+            return self._load_room(room_code)
         return self.rooms.get(room_code)
     
+    def _load_room(self, room_code: str) -> Optional[GameRoom]:
+        """Прочитать комнату из общего хранилища и обновить локальный кэш"""
+        room = self.backend.load_room(room_code, self.room_timeout)
+        with self._registry_lock:
+            cached = self.rooms.pop(room_code, None)
+            if cached:
+                for player_id in (cached.player1_id, cached.player2_id):
+                    if player_id is not None:
+                        self._unindex_player(player_id, room_code)
+            if room is None:
+                self.code_allocator.release(room_code)
+                return None
+            self.rooms[room_code] = room
+            self.code_allocator.used.add(room_code)
+            for role in ('player1', 'player2'):
+                player_id = getattr(room, f'{role}_id')
+                if player_id is not None:
+                    self._index_player(player_id, room_code, role)
+        if cached is None:
+            self.expiry_wheel.schedule(room_code, room.last_activity + self.room_timeout)
+        return room
+    
+    def save_room(self, room: GameRoom):
+        """Сохранить изменения комнаты в хранилище"""
+        self.backend.save_room(room, self.room_timeout)
+        self._archive_finished(room.game)
+    
+    def touch_room(self, room: GameRoom):
+        """Отметить активность в комнате без изменения её состояния"""
+        room.update_activity()
+        self.backend.touch_room(room.room_code, self.room_timeout)
+    
+    def record_attack(self, room: GameRoom, target_role: str, x: int, y: int, hit: bool):
+        """Сохранить один выстрел по полю target_role и новое состояние игры"""
+        room.game.record_move(target_role, x, y, 'hit' if hit else 'miss')
+        self.backend.record_room_attack(room, target_role, x, y, hit, self.room_timeout)
+        self._archive_finished(room.game)
+    
+    def apply_move(self, room: GameRoom, attacker_role: str, x: int, y: int) -> Tuple[MoveResult, GameRoom]:
+        """Ход в комнате: выстрел, передача хода и сохранение (moves.MoveError - ход отклонён).
+
+        Возвращает результат и комнату, в которой он записан. В общем
+        хранилище запись выстрела проверяет версию комнаты: если другой
+        воркер успел её изменить, комната перечитывается и ход проверяется
+        заново уже на свежем объекте.
+        """
+        from .storage import StaleWriteError
+
+        for _ in range(MOVE_RETRIES):
+            def record(target_role, x, y, hit, room=room):
+                if room.game.status == 'finished':
+                    room.status = 'finished'
+                room.update_activity()
+                self.record_attack(room, target_role, x, y, hit)
+
+            try:
+                return apply_move(room.game, attacker_role, x, y, record, time.time()), room
+            except StaleWriteError:
+                room = self._load_room(room.room_code)
+                if room is None or room.game is None:
+                    raise MoveError('not_active', 'Игра не активна')
+        raise MoveError('conflict', 'Комната изменилась во время хода, повторите ход')
+    
+    def _archive_finished(self, game: Optional[Game]):
+        if game is None or game.status != 'finished':
+            return
+        if self.archive is not None:
+            self.archive.add(game)
+        if self.history is not None:
+            self.history.add(game)
+        if self.ratings is not None:
+            self.ratings.record_game(game)
+    
     def cleanup_inactive_rooms(self):
         """Очистить неактивные комнаты"""
-        inactive_codes = []
-        for code, room in self.rooms.items():
-            if room.cleanup_if_inactive():
-                inactive_codes.append(code)
-        
-        for code in inactive_codes:
-            del self.rooms[code]
-            self.room_codes.remove(code)
+        # Снимок: другие потоки могут менять rooms во время обхода
+        for code, room in list(self.rooms.items()):
+            with self.room_locks.hold(code):
+                # Пока ждали блокировку, комнату могли удалить или оживить
+                if self.rooms.get(code) is room and room.cleanup_if_inactive(self.room_timeout):
+                    self._delete_room(code)
+
+    def add_expiry_listener(self, listener):
+        """Подписаться на удаление комнат по неактивности: listener(room_code, room)"""
+        if listener not in self._expiry_listeners:
+            self._expiry_listeners.append(listener)
+
+    def expire_inactive_rooms(self, now: float = None) -> list:
+        """Удалить комнаты, чей срок в колесе таймеров подошёл и которые не ожили"""
+        now = time.time() if now is None else now
+        expired = []
+        for code in self.expiry_wheel.advance(now):
+            # Проверка и удаление - под блокировкой комнаты, как и её команды
+            with self.room_locks.hold(code):
+                room = self.rooms.get(code)
+                if room is None:
+                    continue
+                if self.backend.shared:
+                    # В общем хранилище комната живёт, пока её ключи не истекли по TTL;
+                    # здесь только поддерживаем локальный кэш в актуальном виде
+                    if self._load_room(code) is not None:
+                        self.expiry_wheel.schedule(code, now + self.room_timeout)
+                    continue
+                deadline = room.last_activity + self.room_timeout
+                if deadline > now:
+                    # В комнате была активность - переносим срок
+                    self.expiry_wheel.schedule(code, deadline)
+                    continue
+                self._delete_room(code)
+                # Комнаты разных шардов истекают параллельно - счётчик под общей блокировкой
+                with self._registry_lock:
+                    self.expired_rooms += 1
+            expired.append(code)
+            for listener in self._expiry_listeners:
+                try:
+                    listener(code, room)
+                except Exception as e:
+                    print(f"Ошибка в обработчике удаления комнаты {code}: {e}")
+        return expired
+
+    def start_expiry(self, room_timeout: int = None):
+        """Запустить фоновое удаление неактивных комнат (идемпотентно)"""
+        if room_timeout is not None:
+            self.room_timeout = room_timeout
+        if self._expiry_thread is not None:
+            return
+        self._expiry_thread = threading.Thread(target=self._expiry_loop,
+                                               name='room-expiry', daemon=True)
+        self._expiry_thread.start()
+
+    def _expiry_loop(self):
+        while True:
+            time.sleep(self.expiry_wheel.tick_seconds)
+            try:
+                self.expire_inactive_rooms()
+            except Exception as e:
+                print(f"Ошибка при удалении неактивных комнат: {e}")
 
     def get_room_for_player(self, player_id: str) -> Optional[str]:
-        """Найти комнату по ID игрока"""
-        for code, room in self.rooms.items():
-            if room.player1_id == player_id or room.player2_id == player_id:
-                return code
-        return None
+        """Найти комнату по ID игрока (последнюю, в которую он вошёл)"""
+        rooms = self.player_rooms.get(player_id)
+        if not rooms:
+            return None
+        return next(reversed(rooms))
 
 # Создаем глобальный экземпляр менеджера комнат
 game_manager = GameManager()
\ No newline at end of file
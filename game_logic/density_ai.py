@@ -0,0 +1,148 @@
+"""ИИ на карте плотности вероятностей.
+
+Для каждой длины корабля хранится матрица всех его положений на поле
+(строка - положение, столбец - клетка). Для каждой игры держится вектор
+"ещё возможных" положений и их суммарное покрытие клеток. Промах или
+запретная клетка вычёркивают только задевающие её положения, поэтому
+стоимость хода не зависит от того, сколько выстрелов уже сделано.
+"""
+import random
+from collections import Counter
+from typing import Tuple
+
+import numpy as np
+
+from .bitboard import CELLS, SIZE
+from .placement import FLEET, PLACEMENTS
+
+# Матрицы положений (n_положений x 100), общие для всех игр
+PLACEMENT_MATRICES = {}
+for _length, _table in PLACEMENTS.items():
+    _matrix = np.zeros((len(_table), CELLS), dtype=np.int32)
+    for _i, _placement in enumerate(_table):
+        for _x, _y in _placement.positions:
+            _matrix[_i, _y * SIZE + _x] = 1
+    PLACEMENT_MATRICES[_length] = _matrix
+
+# Вес положений, проходящих через раненый корабль, в режиме добивания
+TARGET_WEIGHT = 50
+
+
+class DensityAI:
+    """ИИ, стреляющий в клетку с наибольшим числом возможных положений кораблей"""
+    difficulty = 'hard'
+
+    def __init__(self, board_size: int = 10, fleet=FLEET, rng=None):
+        self.board_size = board_size
+        self.rng = rng or random
+        self.remaining = Counter(fleet)
+        self.shot_history = set()
+        self.sunk_ships = []
+        self.forbidden_cells = set()
+        self.hits = []
+        self._log = []  # записанные выстрелы: по ним состояние восстанавливается целиком
+
+        self._available = np.ones(CELLS, dtype=bool)   # клетки, куда ещё можно стрелять
+        self._unresolved = np.zeros(CELLS, dtype=bool)  # попадания в непотопленные корабли
+        self._alive = {length: np.ones(len(m), dtype=bool)
+                       for length, m in PLACEMENT_MATRICES.items()}
+        self._coverage = {length: m.sum(axis=0)
+                          for length, m in PLACEMENT_MATRICES.items()}
+
+    def generate_shot(self) -> Tuple[int, int]:
+        """Выстрел в самую вероятную свободную клетку"""
+        if self._unresolved.any():
+            heat = self._target_heat()
+        else:
+            heat = self._hunt_heat()
+
+        heat = np.where(self._available, heat, -1)
+        best = heat.max()
+        if best < 0:
+            return (self.rng.randint(0, self.board_size - 1),
+                    self.rng.randint(0, self.board_size - 1))
+        if best == 0 and not self._unresolved.any():
+            candidates = np.flatnonzero(self._available)
+        else:
+            candidates = np.flatnonzero(heat == best)
+        idx = int(candidates[self.rng.randrange(len(candidates))])
+        return (idx % SIZE, idx // SIZE)
+
+    def _hunt_heat(self) -> np.ndarray:
+        """Карта плотности по всем оставшимся кораблям"""
+        heat = np.zeros(CELLS, dtype=np.int64)
+        for length, count in self.remaining.items():
+            if count > 0:
+                heat += count * self._coverage[length]
+        return heat
+
+    def _target_heat(self) -> np.ndarray:
+        """Карта плотности с упором на положения через раненые клетки"""
+        heat = self._hunt_heat()
+        hit_cells = np.flatnonzero(self._unresolved)
+        for length, count in self.remaining.items():
+            if count <= 0:
+                continue
+            matrix = PLACEMENT_MATRICES[length]
+            alive = np.flatnonzero(self._alive[length])
+            through_hits = matrix[alive][:, hit_cells].sum(axis=1)
+            selected = through_hits > 0
+            if selected.any():
+                weights = count * TARGET_WEIGHT * through_hits[selected] ** 2
+                heat += weights @ matrix[alive[selected]]
+        return heat
+
+    def _block(self, cells):
+        """Вычеркнуть положения, задевающие указанные клетки"""
+        for length, matrix in PLACEMENT_MATRICES.items():
+            alive = self._alive[length]
+            killed = alive & (matrix[:, cells].sum(axis=1) > 0)
+            if killed.any():
+                self._coverage[length] -= matrix[killed].sum(axis=0)
+                alive &= ~killed
+
+    def record_shot(self, x: int, y: int, result: str, sunk_positions=None):
+        """Запись результата выстрела и обновление карты"""
+        idx = y * SIZE + x
+        self._log.append([x, y, result, [list(p) for p in sunk_positions] if sunk_positions else None])
+        self.shot_history.add((x, y))
+        self._available[idx] = False
+
+        if result != 'hit':
+            self._block([idx])
+            return
+
+        self.hits.append((x, y))
+        self._unresolved[idx] = True
+
+        if sunk_positions:
+            positions = [tuple(p) for p in sunk_positions]
+            self.sunk_ships.append(positions)
+            if self.remaining[len(positions)] > 0:
+                self.remaining[len(positions)] -= 1
+
+            # Сам корабль и ореол вокруг него больше не могут содержать палуб
+            halo = set()
+            for sx, sy in positions:
+                self._unresolved[sy * SIZE + sx] = False
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        nx, ny = sx + dx, sy + dy
+                        if 0 <= nx < self.board_size and 0 <= ny < self.board_size:
+                            halo.add(ny * SIZE + nx)
+                            self.forbidden_cells.add((nx, ny))
+            cells = sorted(halo)
+            self._available[cells] = False
+            self._block(cells)
+
+    def export_state(self) -> dict:
+        """Состояние ИИ: журнал выстрелов (generate_shot состояние не меняет)"""
+        return {'shots': self._log}
+
+    @classmethod
+    def from_state(cls, state: dict, rng=None) -> 'DensityAI':
+        """Восстановить ИИ, повторив записанные выстрелы"""
+        ai = cls(rng=rng)
+        for x, y, result, sunk_positions in state['shots']:
+            ai.record_shot(x, y, result, sunk_positions)
+        return ai
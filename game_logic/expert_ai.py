@@ -0,0 +1,82 @@
+"""ИИ с точным подсчётом расстановок оставшегося флота.
+
+Каждый ход перебирает все расстановки ещё не потопленных кораблей,
+совместные с попаданиями, промахами и ореолами потопленных (решатель из
+solver: перебор по битовым маскам, сведение симметричных позиций и общий
+кэш), и стреляет в клетку, которую накрывает больше всего расстановок.
+Перебор ограничен числом шагов, а не временем: с тем же зерном партия
+повторяется ход в ход на любой машине и под любой нагрузкой (selfplay и
+симуляции на этом строятся). Не уложился - ход считается по карте
+плотности DensityAI, а точный подсчёт откладывается, пока свободных
+клеток не станет меньше.
+
+Экспериментальная стратегия: доступна только в симуляциях (см. README).
+"""
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .bitboard import SIZE
+from .density_ai import DensityAI
+from .placement import FLEET
+from .solver import MAX_NODES, solve
+
+
+class ExpertAI(DensityAI):
+    """ИИ, стреляющий в клетку с наибольшей точной вероятностью корабля"""
+    difficulty = 'expert'
+    # При большем числе свободных клеток перебор заведомо не укладывается в бюджет
+    max_cells = 60
+
+    def __init__(self, board_size: int = 10, fleet=FLEET, rng=None, node_budget: int = MAX_NODES):
+        super().__init__(board_size, fleet, rng)
+        # Шагов перебора на точный подсчёт в одном ходе
+        self.node_budget = node_budget
+        # Сколько было свободных клеток, когда перебор не уложился в бюджет
+        self.give_up_at = self.max_cells + 1
+        self.exact_moves = 0
+
+    def generate_shot(self) -> Tuple[int, int]:
+        """Выстрел по точному подсчёту или, если перебор велик, по карте плотности"""
+        shot = self._exact_shot()
+        if shot is not None:
+            return shot
+        return super().generate_shot()
+
+    def _exact_shot(self) -> Optional[Tuple[int, int]]:
+        free = np.flatnonzero(self._available)
+        if not len(free) or len(free) >= self.give_up_at:
+            return None
+        fleet = list(self.remaining.elements())
+        if not fleet:
+            return None
+        available = 0
+        for idx in free:
+            available |= 1 << int(idx)
+        hits = 0
+        for idx in np.flatnonzero(self._unresolved):
+            hits |= 1 << int(idx)
+
+        solution = solve(available, hits, fleet, max_nodes=self.node_budget)
+        if solution is None:
+            self.give_up_at = len(free)
+            return None
+        total, coverage = solution
+        if not total:
+            return None
+        best = max(coverage[int(idx)] for idx in free)
+        candidates = [int(idx) for idx in free if coverage[int(idx)] == best]
+        self.exact_moves += 1
+        idx = candidates[self.rng.randrange(len(candidates))]
+        return (idx % SIZE, idx // SIZE)
+
+    def export_state(self) -> dict:
+        """Журнал выстрелов, бюджет перебора и порог, с которого снова пробовать точный подсчёт"""
+        return {'shots': self._log, 'node_budget': self.node_budget, 'give_up_at': self.give_up_at}
+
+    @classmethod
+    def from_state(cls, state: dict, rng=None) -> 'ExpertAI':
+        ai = super().from_state(state, rng=rng)
+        ai.node_budget = state.get('node_budget', ai.node_budget)
+        ai.give_up_at = state.get('give_up_at', ai.give_up_at)
+        return ai
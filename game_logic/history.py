@@ -0,0 +1,185 @@
+"""История матчей в SQLite.
+
+Законченные игры ставятся в очередь (add) и записываются фоновым потоком
+пачками: одна транзакция на пачку, поэтому обработчики ходов не ждут диска.
+База в режиме WAL: чтение истории не блокируется записью, а несколько
+воркеров на одной машине могут писать в один файл.
+
+Таблицы:
+
+    matches        одна строка на законченную игру, ходы - блоб MoveLog
+    match_players  (player_id, match_id) - индекс для истории игрока
+
+Постраничная выдача идёт по ключу: курсор - id последнего показанного
+матча, поэтому страница стоит одного поиска по индексу при любой глубине.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from .movelog import MoveLog, finish_key
+from .workers import BatchedWriter
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_key TEXT NOT NULL UNIQUE,
+    game_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    player1 TEXT,
+    player2 TEXT,
+    winner TEXT,
+    shots1 INTEGER NOT NULL,
+    shots2 INTEGER NOT NULL,
+    finished_at REAL NOT NULL,
+    moves BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS match_players (
+    player_id TEXT NOT NULL,
+    match_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    PRIMARY KEY (player_id, match_id)
+) WITHOUT ROWID;
+'''
+
+_COLUMNS = 'm.id, m.game_id, m.mode, m.player1, m.player2, m.winner, m.shots1, m.shots2, m.finished_at'
+
+
+def _open(path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=NORMAL')
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _row(game, finished_at: float) -> tuple:
+    # Выстрелы по полю player2 сделал player1, и наоборот
+    shots2 = sum(1 for target, _, _, _ in game.moves if target == 'player1')
+    mode = 'ai' if game.players['player2'] == 'AI_BOT' else 'multiplayer'
+    return (finish_key(game), game.id, mode, game.players['player1'], game.players['player2'],
+            game.winner, len(game.moves) - shots2, shots2, finished_at, game.moves.to_bytes())
+
+
+def _match(row, role: Optional[str] = None) -> dict:
+    match_id, game_id, mode, player1, player2, winner, shots1, shots2, finished_at = row[:9]
+    match = {
+        'id': match_id,
+        'game_id': game_id,
+        'mode': mode,
+        'players': {'player1': player1, 'player2': player2},
+        'winner': winner,
+        'shots': {'player1': shots1, 'player2': shots2},
+        'finished_at': finished_at
+    }
+    if role is not None:
+        match['role'] = role
+        match['result'] = None if winner is None else ('win' if winner == role else 'loss')
+    return match
+
+
+class MatchHistory:
+    """Пакетная запись законченных игр и постраничная история игроков"""
+
+    def __init__(self, path: str, batch_size: int = 64, max_wait: float = 1.0,
+                 recent: int = 10000):
+        self.path = path
+        self._queue = BatchedWriter(self._write, 'match-history', batch_size, max_wait, recent)
+        # Отдельные соединения для записи и чтения: в WAL чтение не ждёт транзакцию
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+
+    # ---------- запись ----------
+
+    def add(self, game) -> bool:
+        """Поставить законченную игру в очередь; False - игра уже записана"""
+        return self._queue.add(_row(game, time.time()), finish_key(game))
+
+    def flush(self):
+        """Сразу записать всё накопленное"""
+        self._queue.flush()
+
+    def _write(self, rows: List[tuple]):
+        try:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = _open(self.path)
+                db = self._writer
+                with db:
+                    for row in rows:
+                        cursor = db.execute(
+                            'INSERT OR IGNORE INTO matches (match_key, game_id, mode, player1, player2, '
+                            'winner, shots1, shots2, finished_at, moves) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            row)
+                        if not cursor.rowcount:
+                            # Ту же игру уже записал другой воркер
+                            continue
+                        db.executemany('INSERT OR IGNORE INTO match_players VALUES (?, ?, ?)',
+                                       [(player_id, cursor.lastrowid, role)
+                                        for role, player_id in (('player1', row[3]), ('player2', row[4]))
+                                        if player_id and player_id != 'AI_BOT'])
+                        self.written += 1
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"[MatchHistory] Не удалось записать {len(rows)} игр в {self.path}: {e}")
+
+    # ---------- чтение ----------
+
+    def player_matches(self, player_id: str, limit: int = 20, before: Optional[int] = None) -> dict:
+        """Страница истории игрока, новые матчи первыми.
+
+        before - курсор next_before предыдущей страницы.
+        """
+        query = (f'SELECT {_COLUMNS}, p.role FROM match_players p JOIN matches m ON m.id = p.match_id '
+                 'WHERE p.player_id = ?')
+        params = [player_id]
+        if before is not None:
+            query += ' AND p.match_id < ?'
+            params.append(before)
+        query += ' ORDER BY p.match_id DESC LIMIT ?'
+        # Лишняя строка показывает, есть ли следующая страница
+        params.append(limit + 1)
+        rows = self._read(query, params)
+        matches = [_match(row, row[9]) for row in rows[:limit]]
+        return {
+            'matches': matches,
+            'next_before': matches[-1]['id'] if len(rows) > limit else None
+        }
+
+    def get_match(self, match_id: int) -> Optional[dict]:
+        """Матч с журналом ходов или None"""
+        rows = self._read(f'SELECT {_COLUMNS}, m.moves FROM matches m WHERE m.id = ?', (match_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        match = _match(row)
+        match['moves'] = [{'target': target, 'x': x, 'y': y, 'result': result}
+                          for target, x, y, result in MoveLog.from_bytes(row[9])]
+        return match
+
+    def _read(self, query: str, params) -> list:
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = _open(self.path)
+            return self._reader.execute(query, params).fetchall()
+
+    def stats(self) -> dict:
+        """Счётчики истории для мониторинга"""
+        return {
+            'path': self.path,
+            'pending': self._queue.pending,
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors
+        }
@@ -0,0 +1,101 @@
+"""Пул заранее сгенерированных расстановок флота.
+
+Расстановки хранятся в сжатом виде: один байт на корабль — номер
+положения в таблице placement.PLACEMENTS для соответствующей длины.
+Фоновый поток дозаполняет пул, когда он опускается ниже порога, так что
+создание игры забирает готовую расстановку за O(1).
+"""
+import threading
+import time
+from collections import deque
+from typing import List
+
+from .placement import FLEET, PLACEMENTS, Placement, generate_fleet
+from .workers import BackgroundWorker
+
+
+class FleetLayoutPool:
+    """Пул расстановок с фоновым пополнением"""
+
+    def __init__(self, size: int = 256, low_water: int = 64, fleet=FLEET):
+        self.size = size
+        self.low_water = min(low_water, size)
+        self.fleet = tuple(sorted(fleet, reverse=True))
+        self._layouts = deque()
+        self._lock = threading.Lock()
+        self._refiller = BackgroundWorker(self._refill_loop, 'fleet-layout-pool')
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+
+    def encode(self, placements: List[Placement]) -> bytes:
+        """Расстановка -> байты (номер положения для каждого корабля флота)"""
+        ordered = sorted(placements, key=lambda p: p.length, reverse=True)
+        return bytes(p.index for p in ordered)
+
+    def decode(self, data: bytes) -> List[Placement]:
+        """Байты -> список Placement"""
+        return [PLACEMENTS[length][index] for length, index in zip(self.fleet, data)]
+
+    def take(self) -> List[Placement]:
+        """Забрать расстановку из пула; если пул пуст - сгенерировать на месте"""
+        self.start()
+        try:
+            data = self._layouts.popleft()
+        except IndexError:
+            data = None
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if self._needs_refill():
+            with self._refiller.wakeup:
+                self._refiller.wakeup.notify()
+
+        if data is None:
+            return generate_fleet(self.fleet)
+        return self.decode(data)
+
+    def fill(self, count: int = None):
+        """Синхронно дозаполнить пул (по умолчанию до полного размера)"""
+        target = self.size if count is None else min(self.size, len(self._layouts) + count)
+        while len(self._layouts) < target:
+            self._layouts.append(self.encode(generate_fleet(self.fleet)))
+            with self._lock:
+                self.generated += 1
+            # Отдаём управление, чтобы не блокировать обработку запросов
+            time.sleep(0)
+
+    def _needs_refill(self) -> bool:
+        # Пустой пул пополняется всегда, даже при low_water = 0
+        return len(self._layouts) < max(self.low_water, 1)
+
+    def start(self):
+        """Запустить фоновый поток пополнения (идемпотентно)"""
+        self._refiller.start()
+
+    def _refill_loop(self):
+        wakeup = self._refiller.wakeup
+        while True:
+            with wakeup:
+                while not self._needs_refill():
+                    wakeup.wait()
+            try:
+                self.fill()
+            except Exception as e:
+                print(f"[FleetPool] Ошибка пополнения пула: {e}")
+                time.sleep(1)
+
+    def stats(self) -> dict:
+        """Счётчики пула для мониторинга"""
+        return {
+            'available': len(self._layouts),
+            'size': self.size,
+            'low_water': self.low_water,
+            'hits': self.hits,
+            'misses': self.misses,
+            'generated': self.generated
+        }
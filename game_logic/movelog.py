@@ -0,0 +1,186 @@
+"""Журнал ходов игры и его архив на диске.
+
+MoveLog хранит выстрелы в array('H') по 2 байта на ход:
+
+    биты 0-6   клетка (y * 10 + x)
+    бит  7     обстрелянное поле: 0 - player1, 1 - player2
+    бит  8     результат: 0 - промах, 1 - попадание
+
+Журнал только дописывается; номер хода (seq) - его позиция, начиная с 1,
+поэтому "ходы после seq" - это срез без поиска. MoveArchive копит журналы
+законченных игр и дописывает их в файл пачками из фонового потока.
+"""
+import os
+import struct
+import time
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from .bitboard import SIZE
+from .workers import BatchedWriter
+
+ROLES = ('player1', 'player2')
+RESULTS = ('miss', 'hit')
+
+Move = Tuple[str, int, int, str]
+
+
+def _pack(target_role: str, x: int, y: int, result: str) -> int:
+    return (y * SIZE + x) | ROLES.index(target_role) << 7 | RESULTS.index(result) << 8
+
+
+def _unpack(value: int) -> Move:
+    idx = value & 0x7F
+    return ROLES[value >> 7 & 1], idx % SIZE, idx // SIZE, RESULTS[value >> 8 & 1]
+
+
+class MoveLog:
+    """Журнал выстрелов игры: только дописывание, по 2 байта на ход"""
+
+    __slots__ = ('_records',)
+
+    def __init__(self, moves=()):
+        self._records = array('H', (_pack(*move) for move in moves))
+
+    def append(self, target_role: str, x: int, y: int, result: str) -> int:
+        """Дописать выстрел и вернуть его номер"""
+        self._records.append(_pack(target_role, x, y, result))
+        return len(self._records)
+
+    @property
+    def last_seq(self) -> int:
+        """Номер последнего хода (0 - ходов не было)"""
+        return len(self._records)
+
+    def since(self, seq: int) -> List[Move]:
+        """Ходы после хода с номером seq"""
+        return [_unpack(value) for value in self._records[max(seq, 0):]]
+
+    def replay(self, boards: dict, start: int = 0, stop: Optional[int] = None) -> int:
+        """Применить ходы start..stop к полям {роль: Board}; вернуть номер последнего"""
+        stop = len(self._records) if stop is None else min(stop, len(self._records))
+        for value in self._records[max(start, 0):stop]:
+            target, x, y, _ = _unpack(value)
+            boards[target].receive_attack(x, y)
+        return max(stop, start)
+
+    def to_bytes(self) -> bytes:
+        return self._records.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data) -> 'MoveLog':
+        log = cls()
+        log._records.frombytes(bytes(data))
+        return log
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[Move]:
+        return (_unpack(value) for value in self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_unpack(value) for value in self._records[index]]
+        return _unpack(self._records[index])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, MoveLog):
+            return self._records == other._records
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'MoveLog({len(self._records)} moves)'
+
+
+# ---------- архив законченных игр ----------
+
+# Заголовок записи: длина записи, время окончания, победитель (0 - нет), число ходов
+_RECORD = struct.Struct('<IdBH')
+
+
+def _string(value: Optional[str]) -> bytes:
+    data = (value or '').encode('utf-8')[:255]
+    return bytes((len(data),)) + data
+
+
+def finish_key(game) -> str:
+    """Ключ законченной игры для отсева повторов (ID уникален для каждой партии)"""
+    return f"{game.id}:{game.players['player1']}:{game.players['player2']}:{len(game.moves)}"
+
+
+def encode_record(game, finished_at: float) -> bytes:
+    """Запись архива: заголовок, ID игры и игроков, журнал ходов"""
+    winner = 0 if game.winner is None else 1 + ROLES.index(game.winner)
+    body = (_string(game.id) + _string(game.players['player1']) + _string(game.players['player2'])
+            + game.moves.to_bytes())
+    return _RECORD.pack(_RECORD.size + len(body), finished_at, winner, len(game.moves)) + body
+
+
+def read_archive(path: str) -> Iterator[dict]:
+    """Прочитать архив: словари с game_id, players, winner, finished_at и moves (MoveLog)"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    view = memoryview(data)
+    offset = 0
+    while offset + _RECORD.size <= len(view):
+        size, finished_at, winner, count = _RECORD.unpack_from(view, offset)
+        if size < _RECORD.size or offset + size > len(view):
+            # Хвост недописанной записи (сбой во время записи) пропускаем
+            break
+        pos = offset + _RECORD.size
+        strings = []
+        for _ in range(3):
+            length = view[pos]
+            strings.append(str(view[pos + 1:pos + 1 + length], 'utf-8') or None)
+            pos += 1 + length
+        yield {
+            'game_id': strings[0],
+            'players': {'player1': strings[1], 'player2': strings[2]},
+            'winner': ROLES[winner - 1] if winner else None,
+            'finished_at': finished_at,
+            'moves': MoveLog.from_bytes(view[pos:pos + 2 * count])
+        }
+        offset += size
+
+
+class MoveArchive:
+    """Пакетная запись журналов законченных игр в файл"""
+
+    def __init__(self, path: str, batch_size: int = 64, max_wait: float = 1.0,
+                 recent: int = 10000):
+        self.path = path
+        self._queue = BatchedWriter(self._write, 'move-archive', batch_size, max_wait, recent)
+        self.archived = 0
+        self.batches = 0
+
+    def add(self, game) -> bool:
+        """Поставить законченную игру в очередь; False - игра уже в архиве"""
+        return self._queue.add(encode_record(game, time.time()), finish_key(game))
+
+    def flush(self):
+        """Сразу записать всё накопленное"""
+        self._queue.flush()
+
+    def _write(self, records: List[bytes]):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(records))
+                f.flush()
+                os.fsync(f.fileno())
+            self.archived += len(records)
+            self.batches += 1
+        except OSError as e:
+            print(f"[MoveArchive] Не удалось записать {len(records)} игр в {self.path}: {e}")
+
+    def stats(self) -> dict:
+        """Счётчики архива для мониторинга"""
+        return {
+            'path': self.path,
+            'pending': self._queue.pending,
+            'archived': self.archived,
+            'batches': self.batches
+        }
@@ -0,0 +1,146 @@
+"""Обработка хода: одна реализация для REST и Socket.IO.
+
+apply_move проверяет ход, стреляет по полю соперника, передаёт ход и
+заканчивает игру. Сохранение - через колбэк record(target_role, x, y, hit),
+его дают транспорты: GameManager.record_attack для комнат,
+GameStore.record_attack для одиночных игр. apply_moves применяет пачку
+ходов одним вызовом, play_ai_turns - ходы ИИ до промаха или конца игры.
+"""
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .bitboard import SIZE
+
+Recorder = Callable[[str, int, int, bool], None]
+
+
+def opponent(role: str) -> str:
+    return 'player2' if role == 'player1' else 'player1'
+
+
+class MoveError(ValueError):
+    """Ход отклонён: reason - not_active, not_your_turn, invalid, already_attacked или conflict"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class MoveResult:
+    """Результат одного выстрела"""
+
+    __slots__ = ('attacker', 'x', 'y', 'hit', 'sunk_positions', 'game_over', 'next_turn', 'version')
+
+    def __init__(self, attacker: str, x: int, y: int, hit: bool, sunk_positions: Optional[list],
+                 game_over: bool, next_turn: Optional[str], version: int):
+        self.attacker = attacker
+        self.x = x
+        self.y = y
+        self.hit = hit
+        self.sunk_positions = sunk_positions
+        self.game_over = game_over
+        self.next_turn = next_turn
+        self.version = version
+
+    @property
+    def target(self) -> str:
+        return opponent(self.attacker)
+
+    @property
+    def result(self) -> str:
+        return 'hit' if self.hit else 'miss'
+
+    @property
+    def sunk(self) -> bool:
+        return self.sunk_positions is not None
+
+    def to_dict(self) -> dict:
+        """Ответ клиенту в прежнем формате эндпоинтов"""
+        data = {
+            'result': self.result,
+            'sunk': self.sunk,
+            'sunk_positions': self.sunk_positions or [],
+            'game_over': self.game_over,
+            'next_turn': self.next_turn,
+            'attacker': self.attacker,
+            'x': self.x,
+            'y': self.y
+        }
+        if self.game_over:
+            data['winner'] = self.attacker
+        return data
+
+    def shot(self) -> dict:
+        """Выстрел ИИ в формате ai_shots"""
+        return {
+            'x': self.x,
+            'y': self.y,
+            'result': self.result,
+            'sunk': self.sunk,
+            'sunk_positions': self.sunk_positions
+        }
+
+
+def apply_move(game, attacker: str, x: int, y: int, record: Optional[Recorder] = None,
+               timestamp: Optional[float] = None) -> MoveResult:
+    """Выполнить выстрел attacker по клетке (x, y) и вернуть результат"""
+    if game.status != 'active':
+        raise MoveError('not_active', 'Игра не активна')
+    if game.current_turn != attacker:
+        raise MoveError('not_your_turn', 'Сейчас не ваш ход')
+    if not (0 <= x < SIZE and 0 <= y < SIZE):
+        raise MoveError('invalid', 'Некорректные координаты')
+    target = opponent(attacker)
+    board = game.boards[target]
+    if board.is_attacked(x, y):
+        raise MoveError('already_attacked', 'В эту клетку уже стреляли')
+
+    outcome = board.receive_attack(x, y)
+    hit = outcome['result'] == 'hit'
+    sunk_positions = list(board.ships[outcome['ship_id']].positions) if outcome.get('sunk') else None
+    game_over = bool(outcome.get('game_over'))
+    if game_over:
+        game.status = 'finished'
+        game.winner = attacker
+        next_turn = None
+    else:
+        # Попал - ходит снова, промахнулся - ход сопернику
+        next_turn = game.current_turn = attacker if hit else target
+    if timestamp is not None:
+        game.last_move = {'player': attacker, 'x': x, 'y': y, 'result': outcome['result'],
+                          'timestamp': timestamp}
+    if record is not None:
+        record(target, x, y, hit)
+    return MoveResult(attacker, x, y, hit, sunk_positions, game_over, next_turn, game.version)
+
+
+def apply_moves(game, moves: Iterable[Tuple[str, int, int]], record: Optional[Recorder] = None,
+                timestamp: Optional[float] = None) -> Tuple[List[MoveResult], Optional[MoveError]]:
+    """Применить пачку ходов (attacker, x, y) по порядку.
+
+    Останавливается на первом отклонённом ходе и возвращает его ошибку
+    вместе с результатами уже выполненных.
+    """
+    results = []
+    for attacker, x, y in moves:
+        try:
+            results.append(apply_move(game, attacker, x, y, record, timestamp))
+        except MoveError as e:
+            return results, e
+    return results, None
+
+
+def play_ai_turns(game, ai, role: str = 'player2', record: Optional[Recorder] = None,
+                  timestamp: Optional[float] = None,
+                  think: Optional[Callable] = None) -> List[MoveResult]:
+    """Ходы ИИ, пока он попадает и игра не закончена.
+
+    think(ai) -> (x, y) считает выстрел вместо ai.generate_shot() (например,
+    в другом потоке, см. ai_turns.AITurnPool.think).
+    """
+    results = []
+    while game.status == 'active' and game.current_turn == role:
+        x, y = think(ai) if think else ai.generate_shot()
+        result = apply_move(game, role, x, y, record, timestamp)
+        ai.record_shot(x, y, result.result, result.sunk_positions)
+        results.append(result)
+    return results
@@ -0,0 +1,152 @@
+"""Таблицы всех допустимых положений кораблей и генератор расстановки.
+
+Для каждой длины корабля заранее перечислены все его положения на поле
+10x10: маска палуб, маска «запретной зоны» (палубы плюс соседние клетки)
+и список координат. Расстановка флота сводится к выбору положений,
+маски которых не пересекаются с зонами уже поставленных кораблей.
+"""
+import random
+from typing import Dict, List, Sequence, Tuple
+
+from .bitboard import SIZE, SYMMETRIES, dilate, mask_from_positions
+
+# Стандартный флот: 1x4, 2x3, 2x2, 2x1
+FLEET = (4, 3, 3, 2, 2, 1, 1)
+
+# Попыток выборки с отбраковкой (принимается около 1.6% стандартных флотов)
+MAX_SAMPLES = 4000
+
+# Ограничения на запасной поиск: шаги перебора в одной попытке и число попыток
+MAX_STEPS = 200
+MAX_RESTARTS = 20
+
+
+class Placement:
+    """Одно положение корабля на поле"""
+    __slots__ = ('index', 'length', 'mask', 'zone', 'positions')
+
+    def __init__(self, index: int, length: int, positions: Tuple[Tuple[int, int], ...]):
+        self.index = index
+        self.length = length
+        self.positions = positions
+        self.mask = mask_from_positions(positions)
+        self.zone = dilate(self.mask)
+
+
+def _build_table(length: int) -> Tuple[Placement, ...]:
+    """Все положения корабля заданной длины"""
+    variants = []
+    for y in range(SIZE):
+        for x in range(SIZE - length + 1):
+            variants.append(tuple((x + i, y) for i in range(length)))
+    if length > 1:
+        for x in range(SIZE):
+            for y in range(SIZE - length + 1):
+                variants.append(tuple((x, y + i) for i in range(length)))
+    return tuple(Placement(i, length, positions) for i, positions in enumerate(variants))
+
+
+PLACEMENTS: Dict[int, Tuple[Placement, ...]] = {
+    length: _build_table(length) for length in sorted(set(FLEET))
+}
+
+# Заведомо корректная расстановка на случай исчерпания лимитов поиска
+_FALLBACK = (
+    ((0, 0), (1, 0), (2, 0), (3, 0)),
+    ((5, 0), (6, 0), (7, 0)),
+    ((0, 2), (1, 2), (2, 2)),
+    ((4, 2), (5, 2)),
+    ((7, 2), (8, 2)),
+    ((0, 4),),
+    ((2, 4),),
+)
+
+
+def _fallback_fleet(rng) -> List[Placement]:
+    """Запасная расстановка, повернутая случайной симметрией поля"""
+    transform = rng.choice(SYMMETRIES)
+    fleet = []
+    for positions in _FALLBACK:
+        cells = tuple(sorted(transform(x, y) for x, y in positions))
+        mask = mask_from_positions(cells)
+        placement = next(p for p in PLACEMENTS[len(cells)] if p.mask == mask)
+        fleet.append(placement)
+    return fleet
+
+
+def _search(fleet: Sequence[int], rng) -> List[Placement]:
+    """Одна попытка: случайный поиск с возвратом на явном стеке"""
+    blocked = 0
+    chosen: List[Placement] = []
+    stack: List[List[Placement]] = []
+    steps = 0
+
+    while len(chosen) < len(fleet) and steps < MAX_STEPS:
+        steps += 1
+        if len(stack) == len(chosen):
+            length = fleet[len(chosen)]
+            stack.append([p for p in PLACEMENTS[length] if not p.mask & blocked])
+
+        candidates = stack[-1]
+        if not candidates:
+            # Тупик: снимаем предыдущий корабль и пробуем другое положение
+            stack.pop()
+            if not chosen:
+                break
+            chosen.pop()
+            blocked = 0
+            for placement in chosen:
+                blocked |= placement.zone
+            continue
+
+        # Равновероятный выбор среди совместимых положений
+        i = rng.randrange(len(candidates))
+        candidates[i], candidates[-1] = candidates[-1], candidates[i]
+        placement = candidates.pop()
+        chosen.append(placement)
+        blocked |= placement.zone
+
+    return chosen if len(chosen) == len(fleet) else []
+
+
+def _sample(fleet: Sequence[int], rng) -> List[Placement]:
+    """Выборка с отбраковкой: все корабли равновероятно по всему полю.
+
+    Конфликт любых двух кораблей отбраковывает флот целиком, поэтому
+    принятые расстановки равновероятны среди всех корректных.
+    """
+    for _ in range(MAX_SAMPLES):
+        blocked = 0
+        chosen = []
+        for length in fleet:
+            table = PLACEMENTS[length]
+            placement = table[rng.randrange(len(table))]
+            if placement.mask & blocked:
+                break
+            chosen.append(placement)
+            blocked |= placement.zone
+        else:
+            return chosen
+    return []
+
+
+def generate_fleet(fleet: Sequence[int] = FLEET, rng=None) -> List[Placement]:
+    """Случайная корректная расстановка флота за ограниченное время.
+
+    Основной путь - _sample: расстановка равновероятна среди всех
+    корректных. Если за MAX_SAMPLES попыток флот не принят (очень плотный
+    нестандартный флот), корабли ставятся поиском с возвратом - уже без
+    равномерности, зато с ограничением MAX_STEPS * MAX_RESTARTS шагов.
+    """
+    rng = rng or random
+    fleet = sorted(fleet, reverse=True)
+    placements = _sample(fleet, rng)
+    if placements:
+        return placements
+    for _ in range(MAX_RESTARTS):
+        placements = _search(fleet, rng)
+        if placements:
+            return placements
+    if tuple(fleet) == FLEET:
+        return _fallback_fleet(rng)
+    raise ValueError(f"Не удалось расставить флот {fleet}")
@@ -0,0 +1,299 @@
+"""Рейтинг Эло игроков мультиплеера и таблица лидеров.
+
+Рейтинг обновляется инкрементально, когда игра в комнате заканчивается
+(победой или сдачей). Таблица лидеров - дерево Фенвика по корзинам
+рейтинга (шаг 0.1): место игрока и поиск k-го места стоят O(log R),
+где R - число корзин, страница топа - O(N log R).
+
+Рейтинги хранятся в SQLite (режим WAL), общей для всех воркеров машины.
+Законченные игры ставятся в очередь и учитываются фоновым потоком
+пачками, как история матчей: пачка - одна транзакция BEGIN IMMEDIATE,
+поэтому воркеры не затирают обновления друг друга, а обработчик хода не
+ждёт блокировку базы. Ключ учтённой игры отсеивает повторы из разных
+воркеров. Таблица лидеров каждого воркера - копия в памяти:
+строки меняются с растущим номером seq, и перед чтением воркер
+подтягивает только строки новее последнего увиденного номера.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from .movelog import finish_key
+from .workers import BatchedWriter
+
+MAX_RATING = 5000
+STEP = 10  # корзин на одно очко рейтинга
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ratings (
+    player_id TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    games INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ratings_seq ON ratings (seq);
+CREATE TABLE IF NOT EXISTS rated_games (
+    match_key TEXT PRIMARY KEY
+) WITHOUT ROWID;
+'''
+
+
+def expected_score(rating: float, opponent: float) -> float:
+    """Ожидаемый результат игрока против соперника (0..1)"""
+    return 1.0 / (1.0 + 10 ** ((opponent - rating) / 400.0))
+
+
+def elo_update(winner: float, loser: float, k: float = 32) -> tuple:
+    """Новые рейтинги победителя и проигравшего"""
+    delta = k * (1.0 - expected_score(winner, loser))
+    return winner + delta, loser - delta
+
+
+class _Fenwick:
+    """Дерево Фенвика: число игроков в корзинах, префиксные суммы за O(log n)"""
+
+    __slots__ = ('size', 'tree')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index: int, delta: int):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        """Сумма корзин 0..index-1"""
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k: int) -> int:
+        """Корзина, в которой лежит k-й элемент (k с нуля)"""
+        index = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = index + step
+            if nxt <= self.size and self.tree[nxt] <= k:
+                index = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return index
+
+
+class Leaderboard:
+    """Упорядоченный индекс рейтингов: место и топ за O(log n)"""
+
+    def __init__(self, max_rating: int = MAX_RATING):
+        self.buckets = max_rating * STEP + 1
+        self._tree = _Fenwick(self.buckets)
+        # Корзина -> игроки в ней; корзины нумеруются от высшего рейтинга
+        self._members: Dict[int, set] = {}
+        self._bucket_of: Dict[str, int] = {}
+
+    def _bucket(self, rating: float) -> int:
+        value = min(max(int(round(rating * STEP)), 0), self.buckets - 1)
+        return self.buckets - 1 - value
+
+    def update(self, player_id: str, rating: float):
+        """Поставить игрока на место по новому рейтингу"""
+        self.remove(player_id)
+        bucket = self._bucket(rating)
+        self._bucket_of[player_id] = bucket
+        self._members.setdefault(bucket, set()).add(player_id)
+        self._tree.add(bucket, 1)
+
+    def remove(self, player_id: str):
+        bucket = self._bucket_of.pop(player_id, None)
+        if bucket is None:
+            return
+        members = self._members[bucket]
+        members.discard(player_id)
+        if not members:
+            del self._members[bucket]
+        self._tree.add(bucket, -1)
+
+    def rank(self, player_id: str) -> Optional[int]:
+        """Место игрока (с 1; равные рейтинги делят место) или None"""
+        bucket = self._bucket_of.get(player_id)
+        if bucket is None:
+            return None
+        return self._tree.prefix(bucket) + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[tuple]:
+        """Страница таблицы: [(место, player_id)] начиная с места offset + 1"""
+        result = []
+        position = offset
+        end = min(offset + limit, len(self._bucket_of))
+        while position < end:
+            bucket = self._tree.find(position)
+            rank = self._tree.prefix(bucket)
+            members = sorted(self._members[bucket])
+            for player_id in members[position - rank:]:
+                if position >= end:
+                    break
+                result.append((rank + 1, player_id))
+                position += 1
+        return result
+
+    def __len__(self) -> int:
+        return len(self._bucket_of)
+
+
+class RatingService:
+    """Рейтинги игроков мультиплеера в общей базе SQLite"""
+
+    def __init__(self, path: str = '', k: float = 32, initial: float = 1500,
+                 batch_size: int = 64, max_wait: float = 1.0):
+        self.path = path
+        self.k = k
+        self.initial = initial
+        # player_id -> [рейтинг, игр, побед]
+        self.players: Dict[str, list] = {}
+        self.leaderboard = Leaderboard()
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._queue = BatchedWriter(self._write, 'ratings', batch_size, max_wait)
+        self.updates = 0
+        self.duplicates = 0
+        self.batches = 0
+        self.errors = 0
+        self._db = self._open(path)
+        self._sync()
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        # Транзакции открываем сами (BEGIN IMMEDIATE)
+        db = sqlite3.connect(path or ':memory:', timeout=10, check_same_thread=False,
+                             isolation_level=None)
+        if path:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        db.executescript(_SCHEMA)
+        return db
+
+    def record_game(self, game) -> bool:
+        """Поставить законченную игру в очередь на учёт; False - не рейтинговая или уже в очереди"""
+        if game.status != 'finished' or game.winner not in game.players:
+            return False
+        # Сдача до начала боя (на расстановке) рейтинг не меняет
+        if not {'player1', 'player2'} <= set(game.ready_players):
+            return False
+        winner_id = game.players[game.winner]
+        loser_id = game.players['player2' if game.winner == 'player1' else 'player1']
+        if not winner_id or not loser_id or 'AI_BOT' in (winner_id, loser_id):
+            return False
+        key = finish_key(game)
+        return self._queue.add((key, winner_id, loser_id), key)
+
+    def flush(self):
+        """Сразу учесть все игры из очереди"""
+        self._queue.flush()
+
+    def _write(self, results: List[tuple]):
+        """Учесть пачку игр (match_key, победитель, проигравший) одной транзакцией"""
+        with self._lock:
+            db = self._db
+            try:
+                # Блокировка записи на всю транзакцию: рейтинги читаются уже под ней
+                db.execute('BEGIN IMMEDIATE')
+                try:
+                    seq = db.execute('SELECT COALESCE(MAX(seq), 0) FROM ratings').fetchone()[0]
+                    updates = 0
+                    for key, winner_id, loser_id in results:
+                        cursor = db.execute('INSERT OR IGNORE INTO rated_games (match_key) VALUES (?)',
+                                            (key,))
+                        if not cursor.rowcount:
+                            # Игру уже учёл другой воркер
+                            self.duplicates += 1
+                            continue
+                        winner = self._stored(winner_id)
+                        loser = self._stored(loser_id)
+                        winner[0], loser[0] = elo_update(winner[0], loser[0], self.k)
+                        winner[1] += 1
+                        winner[2] += 1
+                        loser[1] += 1
+                        db.executemany(
+                            'INSERT OR REPLACE INTO ratings (player_id, rating, games, wins, seq) '
+                            'VALUES (?, ?, ?, ?, ?)',
+                            [(winner_id, *winner, seq + 1), (loser_id, *loser, seq + 2)])
+                        seq += 2
+                        updates += 1
+                    db.execute('COMMIT')
+                except BaseException:
+                    db.execute('ROLLBACK')
+                    raise
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"[Ratings] Не удалось учесть {len(results)} игр в {self.path or ':memory:'}: {e}")
+                return
+            self.updates += updates
+            self.batches += 1
+            self._sync()
+
+    def _stored(self, player_id: str) -> list:
+        """[рейтинг, игр, побед] игрока из базы (новый игрок - начальный рейтинг)"""
+        row = self._db.execute('SELECT rating, games, wins FROM ratings WHERE player_id = ?',
+                               (player_id,)).fetchone()
+        return list(row) if row else [self.initial, 0, 0]
+
+    def _sync(self):
+        """Подтянуть в память строки, изменённые после последней синхронизации"""
+        rows = self._db.execute('SELECT player_id, rating, games, wins, seq FROM ratings '
+                                'WHERE seq > ? ORDER BY seq', (self._seq,)).fetchall()
+        for player_id, rating, games, wins, seq in rows:
+            self.players[player_id] = [rating, games, wins]
+            self.leaderboard.update(player_id, rating)
+            self._seq = seq
+
+    def get(self, player_id: str) -> Optional[dict]:
+        """Рейтинг и место игрока или None, если он не играл рейтинговых игр"""
+        with self._lock:
+            self._sync()
+            player = self.players.get(player_id)
+            if player is None:
+                return None
+            return self._describe(player_id, player, self.leaderboard.rank(player_id))
+
+    def top(self, limit: int = 20, offset: int = 0) -> dict:
+        """Страница таблицы лидеров"""
+        with self._lock:
+            self._sync()
+            return {
+                'total': len(self.leaderboard),
+                'players': [self._describe(player_id, self.players[player_id], rank)
+                            for rank, player_id in self.leaderboard.top(limit, offset)]
+            }
+
+    @staticmethod
+    def _describe(player_id: str, player: list, rank: int) -> dict:
+        rating, games, wins = player
+        return {
+            'player_id': player_id,
+            'rating': round(rating, 1),
+            'rank': rank,
+            'games': games,
+            'wins': wins,
+            'losses': games - wins
+        }
+
+    def stats(self) -> dict:
+        """Счётчики рейтинга для мониторинга"""
+        return {
+            'players': len(self.players),
+            'pending': self._queue.pending,
+            'updates': self.updates,
+            'duplicates': self.duplicates,
+            'batches': self.batches,
+            'errors': self.errors
+        }
@@ -0,0 +1,127 @@
+"""Многопроцессный прогон партий для сравнения стратегий ИИ.
+
+Партии делятся на шарды по номерам [start, start + count) и играются в
+ProcessPoolExecutor. Каждая партия зависит только от зерна и своего
+номера (simulation.game_rng), а статистика шардов складывается, поэтому
+результат при одном и том же зерне не зависит от числа процессов и
+порядка завершения шардов.
+
+    python -m game_logic.selfplay --games 1000000 --strategy normal --opponent hard --seed 1
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Optional, Tuple
+
+from .ai import STRATEGIES
+from .simulation import SimulationStats, run_games, run_metadata, write_report
+
+# Квантиль нормального распределения для 95% доверительного интервала
+Z_95 = 1.959964
+
+
+def mean_confidence_interval(histogram, z: float = Z_95) -> Optional[Tuple[float, float, float]]:
+    """Среднее и доверительный интервал по гистограмме {значение: частота}"""
+    n = sum(histogram.values())
+    if n == 0:
+        return None
+    mean = sum(value * count for value, count in histogram.items()) / n
+    if n == 1:
+        return mean, mean, mean
+    variance = sum(count * (value - mean) ** 2 for value, count in histogram.items()) / (n - 1)
+    margin = z * math.sqrt(variance / n)
+    return mean, mean - margin, mean + margin
+
+
+def wilson_interval(wins: int, n: int, z: float = Z_95) -> Optional[Tuple[float, float, float]]:
+    """Доля побед и интервал Уилсона"""
+    if n == 0:
+        return None
+    p = wins / n
+    denominator = 1 + z * z / n
+    centre = (p + z * z / (2 * n)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return p, centre - margin, centre + margin
+
+
+def shard_ranges(games: int, shard_size: int):
+    """Разбить номера партий на шарды"""
+    return [(start, min(shard_size, games - start)) for start in range(0, games, shard_size)]
+
+
+def evaluate(strategy_a: str, strategy_b: str, games: int, seed: int,
+             workers: Optional[int] = None, shard_size: int = 1000, profile: bool = False,
+             on_shard: Optional[Callable[[SimulationStats, int, int], None]] = None) -> SimulationStats:
+    """Сыграть games партий на всех ядрах и вернуть объединённую статистику"""
+    merged = SimulationStats(strategy_a, strategy_b)
+    shards = shard_ranges(games, shard_size)
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(run_games, strategy_a, strategy_b, seed, start, count, profile)
+                   for start, count in shards]
+        for done, future in enumerate(as_completed(futures), 1):
+            shard = future.result()
+            merged.merge(shard)
+            if on_shard:
+                on_shard(shard, done, len(shards))
+
+    merged.elapsed = time.perf_counter() - started
+    return merged
+
+
+def summarize(stats: SimulationStats) -> dict:
+    """Средние числа выстрелов до победы, доля побед и их интервалы"""
+    summary = {}
+    for side, strategy in (('a', stats.strategy_a), ('b', stats.strategy_b)):
+        interval = mean_confidence_interval(stats.shots_to_win[side])
+        summary[side] = {
+            'strategy': strategy,
+            'mean_shots_to_win': interval and interval[0],
+            'mean_shots_ci95': interval and [interval[1], interval[2]],
+        }
+    win_rate = wilson_interval(stats.wins['a'], stats.games)
+    summary['win_rate_a'] = win_rate and win_rate[0]
+    summary['win_rate_a_ci95'] = win_rate and [win_rate[1], win_rate[2]]
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Сравнение стратегий ИИ на всех ядрах')
+    parser.add_argument('--games', type=int, default=100000, help='число партий')
+    parser.add_argument('--strategy', default='normal', choices=STRATEGIES)
+    parser.add_argument('--opponent', default=None, choices=STRATEGIES)
+    parser.add_argument('--seed', type=int, default=None, help='зерно для воспроизводимости')
+    parser.add_argument('--workers', type=int, default=None, help='число процессов')
+    parser.add_argument('--shard-size', type=int, default=1000, help='партий в одном шарде')
+    parser.add_argument('--profile', action='store_true', help='замерять время функций')
+    parser.add_argument('--output', default=None, help='путь к JSON-файлу с результатами')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+
+    def progress(shard, done, total):
+        print(f"[SelfPlay] шард {done}/{total}: {shard.games} партий за {shard.elapsed:.1f} с",
+              file=sys.stderr)
+
+    stats = evaluate(args.strategy, args.opponent or args.strategy, args.games, seed,
+                     workers=args.workers, shard_size=args.shard_size,
+                     profile=args.profile, on_shard=progress)
+    summary = summarize(stats)
+    write_report({'meta': run_metadata(seed), 'results': stats.to_dict(), 'summary': summary},
+                 args.output)
+    if summary['win_rate_a'] is not None:
+        low, high = summary['win_rate_a_ci95']
+        print(f"Доля побед A: {summary['win_rate_a']:.4f} [{low:.4f}, {high:.4f}]")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Безголовая симуляция партий ИИ против ИИ и замер производительности.
+
+Запуск из корня проекта:
+
+    python -m game_logic.simulation --games 100000 --opponent hard --output bench.json
+
+Отчёт содержит скорость (партий в секунду), распределение числа
+выстрелов до победы и время, проведённое в generate_shot, record_shot,
+receive_attack и auto_place_all_ships. JSON-файл удобно сравнивать между
+коммитами.
+"""
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from .ai import STRATEGIES, create_strategy
+from .core import Board
+
+MEASURED_FUNCTIONS = ('generate_shot', 'record_shot', 'receive_attack', 'auto_place_all_ships')
+
+# Защита от бесконечной партии при ошибке в стратегии
+MAX_SHOTS_PER_SIDE = 100
+
+
+def game_rng(seed: int, index: int) -> random.Random:
+    """Генератор партии: зависит только от зерна и номера партии"""
+    return random.Random(seed * 1_000_003 + index)
+
+
+class FunctionTimings:
+    """Накопленное время и число вызовов по именам функций"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.total_ns = Counter()
+
+    def measure(self, name: str, func, *args):
+        start = time.perf_counter_ns()
+        result = func(*args)
+        self.total_ns[name] += time.perf_counter_ns() - start
+        self.calls[name] += 1
+        return result
+
+    def merge(self, other: 'FunctionTimings'):
+        self.calls.update(other.calls)
+        self.total_ns.update(other.total_ns)
+
+    def to_dict(self) -> dict:
+        return {
+            name: {
+                'calls': self.calls[name],
+                'total_s': self.total_ns[name] / 1e9,
+                'mean_us': self.total_ns[name] / self.calls[name] / 1e3 if self.calls[name] else 0.0
+            }
+            for name in MEASURED_FUNCTIONS if self.calls[name]
+        }
+
+
+def histogram_summary(histogram: Counter) -> dict:
+    """Среднее, разброс и перцентили по гистограмме {значение: частота}"""
+    count = sum(histogram.values())
+    if not count:
+        return {'count': 0}
+    mean = sum(value * n for value, n in histogram.items()) / count
+    variance = sum(n * (value - mean) ** 2 for value, n in histogram.items()) / count
+    summary = {
+        'count': count,
+        'mean': mean,
+        'stdev': math.sqrt(variance),
+        'min': min(histogram),
+        'max': max(histogram),
+    }
+    values = sorted(histogram)
+    for percentile in (50, 90, 99):
+        threshold = count * percentile / 100
+        seen = 0
+        for value in values:
+            seen += histogram[value]
+            if seen >= threshold:
+                summary[f'p{percentile}'] = value
+                break
+    summary['histogram'] = {str(value): histogram[value] for value in values}
+    return summary
+
+
+class SimulationStats:
+    """Сводная статистика серии партий; серии можно складывать"""
+
+    def __init__(self, strategy_a: str, strategy_b: str):
+        self.strategy_a = strategy_a
+        self.strategy_b = strategy_b
+        self.games = 0
+        self.elapsed = 0.0
+        self.wins = Counter()                               # 'a' / 'b'
+        self.shots_to_win = {'a': Counter(), 'b': Counter()}
+        self.shots_per_game = Counter()
+        self.timings = FunctionTimings()
+
+    def add_game(self, winner: str, winner_shots: int, total_shots: int):
+        self.games += 1
+        self.wins[winner] += 1
+        self.shots_to_win[winner][winner_shots] += 1
+        self.shots_per_game[total_shots] += 1
+
+    def merge(self, other: 'SimulationStats'):
+        self.games += other.games
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.wins.update(other.wins)
+        for side in ('a', 'b'):
+            self.shots_to_win[side].update(other.shots_to_win[side])
+        self.shots_per_game.update(other.shots_per_game)
+        self.timings.merge(other.timings)
+
+    def to_dict(self) -> dict:
+        return {
+            'strategy_a': self.strategy_a,
+            'strategy_b': self.strategy_b,
+            'games': self.games,
+            'elapsed_s': self.elapsed,
+            'games_per_sec': self.games / self.elapsed if self.elapsed else None,
+            'wins': {'a': self.wins['a'], 'b': self.wins['b']},
+            'shots_to_win': {side: histogram_summary(h) for side, h in self.shots_to_win.items()},
+            'shots_per_game': histogram_summary(self.shots_per_game),
+            'timings': self.timings.to_dict()
+        }
+
+
+def play_game(strategy_a: str, strategy_b: str, rng: random.Random,
+              a_starts: bool = True, timings: Optional[FunctionTimings] = None) -> Tuple[str, int, int]:
+    """Сыграть одну партию. Возвращает (победитель 'a'/'b', его выстрелы, всего выстрелов)"""
+    call = timings.measure if timings else (lambda name, func, *args: func(*args))
+
+    boards = {'a': Board(), 'b': Board()}
+    for side in ('a', 'b'):
+        call('auto_place_all_ships', boards[side].auto_place_all_ships, rng)
+    ais = {'a': create_strategy(strategy_a, rng=rng), 'b': create_strategy(strategy_b, rng=rng)}
+    shots = {'a': 0, 'b': 0}
+
+    shooter = 'a' if a_starts else 'b'
+    while True:
+        target = 'b' if shooter == 'a' else 'a'
+        ai = ais[shooter]
+        x, y = call('generate_shot', ai.generate_shot)
+        result = call('receive_attack', boards[target].receive_attack, x, y)
+        call('record_shot', ai.record_shot, x, y, result['result'], result.get('ship_positions'))
+        shots[shooter] += 1
+
+        if result.get('game_over'):
+            return shooter, shots[shooter], shots['a'] + shots['b']
+        if shots[shooter] >= MAX_SHOTS_PER_SIDE:
+            raise RuntimeError(f"Стратегия {ai.__class__.__name__} не закончила партию за {MAX_SHOTS_PER_SIDE} выстрелов")
+        if result['result'] != 'hit':
+            shooter = target
+
+
+def run_games(strategy_a: str, strategy_b: str, seed: int, start: int, count: int,
+              profile: bool = True) -> SimulationStats:
+    """Сыграть партии с номерами [start, start + count)"""
+    stats = SimulationStats(strategy_a, strategy_b)
+    timings = stats.timings if profile else None
+    started = time.perf_counter()
+    for index in range(start, start + count):
+        # Первый ход чередуется, чтобы не давать преимущества одной стороне
+        winner, winner_shots, total = play_game(strategy_a, strategy_b, game_rng(seed, index),
+                                                a_starts=index % 2 == 0, timings=timings)
+        stats.add_game(winner, winner_shots, total)
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def run_metadata(seed: int) -> Dict[str, object]:
+    """Сведения о запуске для сравнения результатов между коммитами"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'seed': seed,
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.time()
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Симуляция партий ИИ против ИИ')
+    parser.add_argument('--games', type=int, default=1000, help='число партий')
+    parser.add_argument('--strategy', default='normal', choices=STRATEGIES,
+                        help='стратегия стороны A')
+    parser.add_argument('--opponent', default=None, choices=STRATEGIES,
+                        help='стратегия стороны B (по умолчанию как у A)')
+    parser.add_argument('--seed', type=int, default=None, help='зерно для воспроизводимости')
+    parser.add_argument('--no-profile', action='store_true',
+                        help='не замерять время отдельных функций')
+    parser.add_argument('--output', default=None, help='путь к JSON-файлу с результатами')
+    return parser
+
+
+def write_report(report: dict, output: Optional[str]):
+    """Сохранить отчёт в файл и напечатать краткую сводку"""
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    results = report['results']
+    print(f"Партий: {results['games']}, {results['games_per_sec'] or 0:.1f} партий/с")
+    for side in ('a', 'b'):
+        summary = results['shots_to_win'][side]
+        if summary['count']:
+            print(f"Сторона {side}: побед {summary['count']}, "
+                  f"выстрелов до победы {summary['mean']:.2f} (p90 {summary['p90']})")
+    for name, timing in results['timings'].items():
+        print(f"{name}: {timing['calls']} вызовов, {timing['mean_us']:.2f} мкс")
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    strategy_b = args.opponent or args.strategy
+    stats = run_games(args.strategy, strategy_b, seed, 0, args.games, profile=not args.no_profile)
+    write_report({'meta': run_metadata(seed), 'results': stats.to_dict()}, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
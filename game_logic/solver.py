@@ -0,0 +1,289 @@
+"""Дебютная книга и решатель эндшпиля для ИИ.
+
+Дебют: первые выстрелы по пустому полю одинаковы во всех партиях, поэтому
+порядок клеток считается один раз при импорте - клетки "шахматной"
+раскраски по убыванию числа положений флота через них. Ярусы книги -
+клетки с одинаковой плотностью (симметричные друг другу), внутри яруса
+выбор случайный.
+
+Эндшпиль: когда свободных клеток и непотопленных кораблей мало, решатель
+перебирает все расстановки оставшихся кораблей, совместные с попаданиями, промахами и
+ореолами потопленных кораблей, и стреляет в клетку, которую накрывает
+больше всего расстановок. Результат кэшируется в общем на процесс
+LRU-кэше по каноническому ключу: состояние поля приводится к
+минимальному из восьми симметричных вариантов, поэтому повёрнутые и
+отражённые позиции разных партий попадают в одну запись.
+"""
+import threading
+from collections import Counter, OrderedDict
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from .bitboard import CELLS, SIZE, SYMMETRIES, FULL_MASK, iter_indices, mask_from_positions
+from .placement import FLEET, PLACEMENTS
+
+# Длина дебюта в выстрелах и размер книги в ярусах
+OPENING_SHOTS = 6
+OPENING_TIERS = 6
+
+# Решатель включается, когда свободных клеток не больше ENDGAME_CELLS,
+# а непотопленных кораблей не больше ENDGAME_SHIPS; перебор дольше
+# MAX_NODES шагов прерывается
+ENDGAME_CELLS = 30
+ENDGAME_SHIPS = 4
+MAX_NODES = 20000
+
+
+def _permutation(transform) -> Tuple[int, ...]:
+    """Куда симметрия переводит каждую клетку"""
+    result = []
+    for idx in range(CELLS):
+        x, y = transform(idx % SIZE, idx // SIZE)
+        result.append(y * SIZE + x)
+    return tuple(result)
+
+
+# Перестановки номеров клеток для каждой симметрии поля
+PERMUTATIONS = tuple(_permutation(transform) for transform in SYMMETRIES)
+
+
+def transform_mask(mask: int, permutation: Sequence[int]) -> int:
+    """Маска после перестановки клеток"""
+    result = 0
+    for idx in iter_indices(mask):
+        result |= 1 << permutation[idx]
+    return result
+
+
+def canonical_key(masks: Sequence[int], fleet: Iterable[int]) -> Tuple[tuple, int]:
+    """Канонический ключ состояния и номер симметрии, которая к нему приводит"""
+    best = None
+    best_symmetry = 0
+    for number, permutation in enumerate(PERMUTATIONS):
+        variant = tuple(transform_mask(mask, permutation) for mask in masks)
+        if best is None or variant < best:
+            best = variant
+            best_symmetry = number
+    return best + (tuple(sorted(fleet, reverse=True)),), best_symmetry
+
+
+# ---------- дебютная книга ----------
+
+def _build_opening_book(tiers: int) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """Ярусы клеток "шахматной" раскраски по убыванию плотности флота"""
+    coverage = Counter()
+    for length in FLEET:
+        for placement in PLACEMENTS[length]:
+            coverage.update(placement.positions)
+    cells = [(x, y) for y in range(SIZE) for x in range(SIZE) if (x + y) % 2 == 0]
+    levels = sorted({coverage[cell] for cell in cells}, reverse=True)[:tiers]
+    return tuple(tuple(cell for cell in cells if coverage[cell] == level) for level in levels)
+
+
+OPENING_BOOK = _build_opening_book(OPENING_TIERS)
+
+
+def opening_shot(excluded, rng) -> Optional[Tuple[int, int]]:
+    """Выстрел из книги: случайная клетка первого яруса, где ещё есть свободные"""
+    for tier in OPENING_BOOK:
+        options = [cell for cell in tier if cell not in excluded]
+        if options:
+            return rng.choice(options)
+    return None
+
+
+# ---------- эндшпиль ----------
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def symmetries_of(masks: Sequence[int]) -> List[Sequence[int]]:
+    """Симметрии поля, которые не меняют ни одну из масок"""
+    return [permutation for permutation in PERMUTATIONS
+            if all(transform_mask(mask, permutation) == mask for mask in masks)]
+
+
+def count_placements(available: int, hits: int, fleet: Sequence[int],
+                     max_nodes: int = MAX_NODES, symmetry: bool = True) -> Optional[Tuple[int, List[int]]]:
+    """Число расстановок флота и сколько из них накрывают каждую клетку.
+
+    available - клетки, куда ещё не стреляли и где может стоять корабль,
+    hits - попадания в непотопленные корабли. Каждая расстановка накрывает
+    все попадания, корабли не касаются друг друга. None - перебор не
+    уложился в max_nodes шагов.
+
+    Если позиция симметрична, а самый длинный корабль один, первый корабль
+    перебирается только по представителям орбит с весом размера орбиты,
+    а покрытие затем усредняется по группе симметрий.
+    """
+    allowed = available | hits
+    lengths = sorted(fleet, reverse=True)
+    candidates = {
+        length: [(p.mask, p.zone) for p in PLACEMENTS[length]
+                 if not p.mask & ~allowed and not p.zone & ~p.mask & hits]
+        for length in set(lengths)
+    }
+    # Сколько палуб ещё можно поставить начиная с i-го корабля
+    capacity = [sum(lengths[i:]) for i in range(len(lengths) + 1)]
+    group = symmetries_of((available, hits)) if symmetry else []
+    # С одинаковыми первыми кораблями порядок перебора ломает симметрию
+    if len(group) < 2 or (len(lengths) > 1 and lengths[0] == lengths[1]):
+        group = []
+    # Положение корабля -> число полных расстановок, в которые оно входит
+    ships = Counter()
+    nodes = 0
+
+    def place(i: int, start: int, occupied: int, blocked: int, weight: int) -> int:
+        """Число полных расстановок, продолжающих данную"""
+        nonlocal nodes
+        if i == len(lengths):
+            return weight if occupied & hits == hits else 0
+        total = 0
+        options = candidates[lengths[i]]
+        # Одинаковые корабли ставим по возрастанию номера положения, без перестановок
+        first = start if i and lengths[i - 1] == lengths[i] else 0
+        for j in range(first, len(options)):
+            mask, zone = options[j]
+            if mask & blocked:
+                continue
+            nodes += 1
+            if nodes > max_nodes:
+                raise _BudgetExceeded
+            if i == 0 and group:
+                orbit = {transform_mask(mask, permutation) for permutation in group}
+                if mask != min(orbit):
+                    continue
+                weight = len(orbit)
+            covered = occupied | mask
+            uncovered = hits & ~covered
+            # Попадание в ореоле чужого корабля уже ничем не накрыть
+            if uncovered & (blocked | zone):
+                continue
+            if bin(uncovered).count('1') > capacity[i + 1]:
+                continue
+            found = place(i + 1, j + 1, covered, blocked | zone, weight)
+            if found:
+                ships[mask] += found
+                total += found
+        return total
+
+    try:
+        total = place(0, 0, 0, 0, 1)
+    except _BudgetExceeded:
+        return None
+    coverage = [0] * CELLS
+    for mask, count in ships.items():
+        for idx in iter_indices(mask):
+            coverage[idx] += count
+    if group:
+        # Каждый представитель учтён с весом орбиты: раскладываем его по орбите
+        coverage = [sum(coverage[permutation[idx]] for permutation in group) // len(group)
+                    for idx in range(CELLS)]
+    return total, coverage
+
+
+class SolverCache:
+    """Ограниченный LRU-кэш решений эндшпиля, общий для всех игр процесса"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """(True, значение) при попадании, (False, None) при промахе"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Счётчики кэша для мониторинга"""
+        lookups = (self.hits + self.misses) or 1
+        return {
+            'entries': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3)
+        }
+
+
+solver_cache = SolverCache()
+
+
+def solve(available: int, hits: int, fleet: Sequence[int], cache: SolverCache = solver_cache,
+          max_nodes: int = MAX_NODES) -> Optional[Tuple[int, List[int]]]:
+    """count_placements через кэш; покрытие возвращается в исходной ориентации поля"""
+    key, symmetry = canonical_key((available, hits), fleet)
+    found, value = cache.get(key)
+    # Неудачный перебор хранится как лимит шагов, в который он не уложился
+    if not found or (isinstance(value, int) and value < max_nodes):
+        canonical = PERMUTATIONS[symmetry]
+        value = count_placements(transform_mask(available, canonical),
+                                 transform_mask(hits, canonical), fleet, max_nodes)
+        if value is not None:
+            cache.put(key, (value[0], tuple(value[1])))
+        else:
+            # Запоминаем, чтобы не повторять тот же перебор каждый ход
+            cache.put(key, max_nodes)
+    if value is None or isinstance(value, int):
+        return None
+    total, coverage = value
+    permutation = PERMUTATIONS[symmetry]
+    return total, [coverage[permutation[idx]] for idx in range(CELLS)]
+
+
+def remaining_fleet(sunk_ships) -> List[int]:
+    """Длины ещё не потопленных кораблей"""
+    remaining = Counter(FLEET)
+    remaining.subtract(len(ship) for ship in sunk_ships)
+    return sorted(remaining.elements(), reverse=True)
+
+
+def endgame_shot(shots, forbidden, hits, sunk_ships, rng) -> Optional[Tuple[int, int]]:
+    """Выстрел решателя или None, если клеток и кораблей ещё много или перебор не удался"""
+    # Дешёвые проверки до построения масок: они отсекают почти все ходы партии
+    if len(FLEET) - len(sunk_ships) > ENDGAME_SHIPS:
+        return None
+    if CELLS - len(shots) - len(forbidden) > ENDGAME_CELLS:
+        return None
+    sunk_cells = {tuple(p) for ship in sunk_ships for p in ship}
+    unresolved = mask_from_positions(p for p in hits if tuple(p) not in sunk_cells)
+    available = FULL_MASK & ~mask_from_positions(shots) & ~mask_from_positions(forbidden)
+    return exact_shot(available, unresolved, remaining_fleet(sunk_ships), rng)
+
+
+def exact_shot(available: int, unresolved: int, fleet: Sequence[int], rng) -> Optional[Tuple[int, int]]:
+    """Выстрел решателя по маскам свободных клеток и попаданий в непотопленные корабли"""
+    if not fleet or len(fleet) > ENDGAME_SHIPS or bin(available).count('1') > ENDGAME_CELLS:
+        return None
+    solution = solve(available, unresolved, fleet)
+    if solution is None or not solution[0]:
+        return None
+    coverage = solution[1]
+    best = max(coverage[idx] for idx in iter_indices(available))
+    if not best:
+        return None
+    options = [idx for idx in iter_indices(available) if coverage[idx] == best]
+    idx = options[rng.randrange(len(options))]
+    return (idx % SIZE, idx // SIZE)
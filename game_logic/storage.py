@@ -0,0 +1,413 @@
+"""Хранилища состояния комнат и одиночных игр.
+
+MemoryBackend - поведение по умолчанию: объекты живут в памяти процесса
+(GameManager.rooms и GameStore), сохранять их некуда. KVBackend держит
+состояние в общем key-value хранилище (Redis), поэтому одну комнату могут
+обслуживать несколько воркеров за балансировщиком.
+
+Раскладка ключей KVBackend для комнаты (для одиночной игры - game:<id>):
+
+    room:<code>            двоичный снимок комнаты (game_logic.codec)
+    room:<code>:version    счётчик записей
+    game:<id>:ai           хеш: уровень ИИ, его состояние (JSON) и версия
+
+Выстрел - одна транзакция MULTI: SETBIT в карту выстрелов внутри снимка,
+SETRANGE изменяемой части заголовка, APPEND байта в журнал ходов и INCR
+версии, без перезаписи кораблей. Любая запись (выстрел или снимок целиком)
+идёт под WATCH ключа версии и проходит, только если версия та же, что была
+при чтении: иначе другой воркер уже изменил объект, и запись отклоняется
+StaleWriteError.
+LocalKV - заглушка Redis в памяти процесса с тем же подмножеством команд,
+её хватает для тестов.
+"""
+import json
+import threading
+import time
+from typing import Optional
+
+from .bitboard import SIZE
+from .codec import (CodecError, FLAGS_OFFSET, bitmap_offset, decode_game, decode_room,
+                    dynamic_header, encode_game, encode_room, move_byte)
+from .core import Game, GameRoom
+
+
+class WatchError(Exception):
+    """LocalKV: ключ под WATCH изменился до EXEC"""
+
+
+try:
+    from redis.exceptions import WatchError as _RedisWatchError
+except ImportError:  # redis нужен только для STATE_BACKEND=redis
+    _RedisWatchError = WatchError
+
+_WATCH_ERRORS = (WatchError, _RedisWatchError)
+
+
+class StaleWriteError(Exception):
+    """Состояние в хранилище изменилось после чтения: запись отклонена"""
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(',', ':'))
+
+
+class MemoryBackend:
+    """Состояние в памяти процесса: объекты изменяются на месте, методы ничего не делают"""
+    shared = False
+
+    def claim_room(self, room_code: str, ttl=None) -> bool:
+        return True
+
+    def save_room(self, room, ttl=None):
+        pass
+
+    def touch_room(self, room_code: str, ttl=None):
+        pass
+
+    def delete_room(self, room_code: str):
+        pass
+
+    def record_room_attack(self, room, target_role: str, x: int, y: int, hit: bool, ttl=None):
+        pass
+
+    def stats(self) -> dict:
+        return {'backend': 'memory'}
+
+
+class KVBackend:
+    """Общее хранилище комнат и игр поверх клиента Redis (или LocalKV)"""
+    shared = True
+
+    def __init__(self, client, prefix: str = 'battleship:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, kind: str, key: str) -> str:
+        return f'{self.prefix}{kind}:{key}'
+
+    @staticmethod
+    def _all_keys(base: str):
+        return [base, f'{base}:version', f'{base}:ai']
+
+    def _expire(self, pipe, base: str, ttl):
+        if ttl:
+            for key in self._all_keys(base):
+                pipe.expire(key, int(ttl))
+
+    # ---------- общие операции ----------
+
+    def _checked_write(self, base: str, owner, write, ttl):
+        """Выполнить write(pipe) одной транзакцией, если версия в хранилище
+        совпадает с owner.kv_version (у нового объекта её нет - без проверки).
+
+        Иначе - StaleWriteError. Новая версия запоминается в owner.kv_version.
+        """
+        version_key = f'{base}:version'
+        expected = getattr(owner, 'kv_version', None)
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(version_key)
+                current = int(pipe.get(version_key) or 0)
+                if expected is not None and current != expected:
+                    raise StaleWriteError(f"{base}: версия {current}, ожидалась {expected}")
+                pipe.multi()
+                pipe.incr(version_key)
+                write(pipe)
+                self._expire(pipe, base, ttl)
+                results = pipe.execute()
+            except _WATCH_ERRORS:
+                raise StaleWriteError(f"{base}: версия изменилась во время записи") from None
+        owner.kv_version = results[0]
+
+    def _save(self, base: str, owner, snapshot: bytes, ttl):
+        """Перезаписать снимок целиком (StaleWriteError - его уже изменил другой воркер)"""
+        self._checked_write(base, owner, lambda pipe: pipe.set(base, snapshot), ttl)
+
+    def _load(self, base: str, decoder, ttl):
+        pipe = self.client.pipeline(transaction=True)
+        pipe.get(base)
+        pipe.get(f'{base}:version')
+        self._expire(pipe, base, ttl)
+        snapshot, version = pipe.execute()[:2]
+        if not snapshot:
+            # Ключа нет или код комнаты только занят
+            return None
+        try:
+            owner = decoder(snapshot)
+        except CodecError as e:
+            print(f"Повреждённый снимок {base}: {e}")
+            return None
+        # Версия, с которой будет сравниваться следующая запись выстрела
+        owner.kv_version = int(version or 0)
+        return owner
+
+    def _record_attack(self, base: str, owner, target_role: str, x: int, y: int, hit: bool, ttl):
+        """Атомарно записать один выстрел, не трогая расстановку кораблей
+        (StaleWriteError - объект уже изменил другой воркер)"""
+        def write(pipe):
+            pipe.setbit(base, bitmap_offset(target_role, hit) * 8 + y * SIZE + x, 1)
+            pipe.setrange(base, FLAGS_OFFSET, dynamic_header(owner))
+            pipe.append(base, bytes((move_byte(target_role, x, y),)))
+        self._checked_write(base, owner, write, ttl)
+
+    # ---------- комнаты ----------
+
+    def claim_room(self, room_code: str, ttl=None) -> bool:
+        """Занять код комнаты во всех воркерах; False - код уже занят"""
+        return bool(self.client.set(self._key('room', room_code), b'', nx=True,
+                                    ex=int(ttl) if ttl else None))
+
+    def save_room(self, room: GameRoom, ttl=None):
+        self._save(self._key('room', room.room_code), room, encode_room(room), ttl)
+
+    def load_room(self, room_code: str, ttl=None) -> Optional[GameRoom]:
+        return self._load(self._key('room', room_code), decode_room, ttl)
+
+    def touch_room(self, room_code: str, ttl=None):
+        pipe = self.client.pipeline(transaction=False)
+        self._expire(pipe, self._key('room', room_code), ttl)
+        pipe.execute()
+
+    def delete_room(self, room_code: str):
+        self.client.delete(*self._all_keys(self._key('room', room_code)))
+
+    def record_room_attack(self, room: GameRoom, target_role: str, x: int, y: int, hit: bool, ttl=None):
+        self._record_attack(self._key('room', room.room_code), room, target_role, x, y, hit, ttl)
+
+    # ---------- одиночные игры ----------
+
+    def save_game(self, game_id: str, game: Game, ttl=None):
+        self._save(self._key('game', game_id), game, encode_game(game), ttl)
+
+    def load_game(self, game_id: str, ttl=None) -> Optional[Game]:
+        return self._load(self._key('game', game_id), decode_game, ttl)
+
+    def delete_game(self, game_id: str):
+        self.client.delete(*self._all_keys(self._key('game', game_id)))
+
+    def record_game_attack(self, game_id: str, game: Game, target_role: str, x: int, y: int, hit: bool, ttl=None):
+        self._record_attack(self._key('game', game_id), game, target_role, x, y, hit, ttl)
+
+    def save_ai(self, game_id: str, difficulty: str, state: dict, ttl=None):
+        """Сохранить состояние ИИ игры, чтобы его мог восстановить любой воркер"""
+        key = f'{self._key("game", game_id)}:ai'
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, mapping={'ai': difficulty, 'ai_state': _dumps(state)})
+        pipe.hincrby(key, 'ai_version', 1)
+        if ttl:
+            pipe.expire(key, int(ttl))
+        pipe.execute()
+
+    def load_ai(self, game_id: str, known_version: Optional[int] = None):
+        """(уровень ИИ, версия, состояние); состояние не читается, если версия не изменилась"""
+        key = f'{self._key("game", game_id)}:ai'
+        difficulty, version = self.client.hmget(key, ['ai', 'ai_version'])
+        if difficulty is None:
+            return None, None, None
+        version = int(version or 0)
+        if version == known_version:
+            return difficulty.decode(), version, None
+        state = self.client.hget(key, 'ai_state')
+        return difficulty.decode(), version, json.loads(state) if state else None
+
+    def stats(self) -> dict:
+        return {'backend': 'kv', 'prefix': self.prefix}
+
+
+class LocalKV:
+    """Заглушка Redis в памяти процесса: подмножество команд, нужных KVBackend.
+
+    Значения возвращаются байтами, как у redis-py без decode_responses.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def _get(self, key, default=None):
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= self.clock():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key, default)
+
+    def _hash(self, key) -> dict:
+        value = self._get(key)
+        if value is None:
+            value = self._data[key] = {}
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, value, nx: bool = False, ex: Optional[int] = None):
+        with self._lock:
+            if nx and self._get(key) is not None:
+                return None
+            self._data[key] = self._bytes(value)
+            self._expires.pop(key, None)
+            if ex:
+                self._expires[key] = self.clock() + ex
+            return True
+
+    def setrange(self, key, offset: int, value) -> int:
+        with self._lock:
+            data = bytearray(self._get(key, b''))
+            value = self._bytes(value)
+            if len(data) < offset + len(value):
+                data.extend(bytes(offset + len(value) - len(data)))
+            data[offset:offset + len(value)] = value
+            self._data[key] = bytes(data)
+            return len(data)
+
+    def append(self, key, value) -> int:
+        with self._lock:
+            data = self._get(key, b'') + self._bytes(value)
+            self._data[key] = data
+            return len(data)
+
+    def incr(self, key) -> int:
+        with self._lock:
+            value = int(self._get(key, b'0')) + 1
+            self._data[key] = self._bytes(value)
+            return value
+
+    def setbit(self, key, offset: int, value: int):
+        with self._lock:
+            data = bytearray(self._get(key, b''))
+            if len(data) <= offset >> 3:
+                data.extend(bytes((offset >> 3) + 1 - len(data)))
+            bit = 0x80 >> (offset & 7)
+            old = int(bool(data[offset >> 3] & bit))
+            if value:
+                data[offset >> 3] |= bit
+            else:
+                data[offset >> 3] &= ~bit
+            self._data[key] = bytes(data)
+            return old
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            items = dict(mapping or {})
+            if field is not None:
+                items[field] = value
+            target = self._hash(key)
+            added = sum(1 for name in items if self._bytes(name) not in target)
+            for name, item in items.items():
+                target[self._bytes(name)] = self._bytes(item)
+            return added
+
+    def hmget(self, key, fields) -> list:
+        with self._lock:
+            target = self._get(key) or {}
+            return [target.get(self._bytes(name)) for name in fields]
+
+    def hget(self, key, field):
+        with self._lock:
+            return (self._get(key) or {}).get(self._bytes(field))
+
+    def hincrby(self, key, field, amount: int = 1) -> int:
+        with self._lock:
+            target = self._hash(key)
+            value = int(target.get(self._bytes(field), b'0')) + amount
+            target[self._bytes(field)] = self._bytes(value)
+            return value
+
+    def delete(self, *keys) -> int:
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._get(key) is not None:
+                    removed += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def expire(self, key, seconds: int) -> bool:
+        with self._lock:
+            if self._get(key) is None:
+                return False
+            self._expires[key] = self.clock() + seconds
+            return True
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(1 for key in keys if self._get(key) is not None)
+
+    def pipeline(self, transaction: bool = True) -> '_LocalPipeline':
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    """Команды копятся и выполняются разом под блокировкой, как MULTI/EXEC.
+
+    После watch() и до multi() команды выполняются сразу, как в redis-py;
+    execute() бросает WatchError, если ключ под WATCH успел измениться.
+    """
+
+    def __init__(self, client: LocalKV):
+        self._client = client
+        self._commands = []
+        self._watched = {}
+        self._immediate = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+        if self._immediate:
+            return method
+
+        def queue(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+        return queue
+
+    def watch(self, *keys):
+        with self._client._lock:
+            for key in keys:
+                self._watched[key] = self._client._get(key)
+        self._immediate = True
+
+    def multi(self):
+        self._immediate = False
+
+    def reset(self):
+        self._commands = []
+        self._watched = {}
+        self._immediate = False
+
+    def execute(self) -> list:
+        with self._client._lock:
+            changed = any(self._client._get(key) != value for key, value in self._watched.items())
+            if not changed:
+                results = [method(*args, **kwargs) for method, args, kwargs in self._commands]
+        self.reset()
+        if changed:
+            raise WatchError('Ключ под WATCH изменился')
+        return results
+
+
+def create_backend(name: str = 'memory', redis_url: Optional[str] = None):
+    """Хранилище по имени из конфигурации: memory, redis или local (LocalKV)"""
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'local':
+        return KVBackend(LocalKV())
+    if name == 'redis':
+        import redis
+        return KVBackend(redis.Redis.from_url(redis_url))
+    raise ValueError(f"Неизвестное хранилище состояния: {name}")
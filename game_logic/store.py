@@ -0,0 +1,278 @@
+"""Хранилище одиночных игр (против ИИ) с вытеснением.
+
+Игра и её ИИ хранятся одной записью и удаляются вместе. Записи лежат в
+OrderedDict в порядке последней активности, поэтому и устаревшие по TTL,
+и самые давно не использованные игры всегда находятся в начале словаря.
+
+С общим хранилищем (backend.shared) игры лежат в нём и истекают по TTL
+ключей, а здесь кэшируются только восстановленные ИИ: каждое изменение
+ИИ сохраняется, поэтому следующий ход может обработать любой воркер.
+"""
+import sys
+import threading
+import time
+import types
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from .ai import restore_ai
+from .moves import MoveError
+from .storage import MemoryBackend, StaleWriteError
+from .workers import BackgroundWorker
+
+# Запас на рост состояния игры после создания (выстрелы, история ИИ)
+_GROWTH_ALLOWANCE = 16 * 1024
+
+# Общие для процесса объекты, которые не относятся к одной игре
+_SHARED_TYPES = (types.ModuleType, type, type(threading.Lock()), type(threading.RLock()),
+                 threading.Condition, threading.Thread)
+
+
+def estimate_size(obj, depth: int = 3) -> int:
+    """Грубая оценка памяти объекта игры или ИИ в байтах (обход на depth уровней).
+
+    Объект с методом memory_size оценивает себя сам: так ИИ не засчитывает
+    себе общие структуры процесса (массивы пакетного движка). Модули,
+    блокировки и потоки - общие и не считаются.
+    """
+    if isinstance(obj, _SHARED_TYPES):
+        return 0
+    memory_size = getattr(obj, 'memory_size', None)
+    if callable(memory_size):
+        return memory_size()
+    size = sys.getsizeof(obj)
+    if depth:
+        if isinstance(obj, dict):
+            children = obj.values()
+        else:
+            children = getattr(obj, '__dict__', {}).values()
+        size += sum(estimate_size(child, depth - 1) for child in children)
+    return size
+
+
+class _Entry:
+    __slots__ = ('game', 'ai', 'last_activity', 'size')
+
+    def __init__(self, game, ai, last_activity: float, size: int):
+        self.game = game
+        self.ai = ai
+        self.last_activity = last_activity
+        self.size = size
+
+
+class _SharedAI:
+    """ИИ игры из общего хранилища: после каждого записанного выстрела состояние сохраняется"""
+
+    def __init__(self, ai, backend, game_id: str, ttl_seconds: float, version: int):
+        self.ai = ai
+        self.backend = backend
+        self.game_id = game_id
+        self.ttl_seconds = ttl_seconds
+        self.version = version
+
+    def generate_shot(self):
+        return self.ai.generate_shot()
+
+    def record_shot(self, x: int, y: int, result: str, sunk_positions=None):
+        self.ai.record_shot(x, y, result, sunk_positions)
+        self.backend.save_ai(self.game_id, self.ai.difficulty, self.ai.export_state(), self.ttl_seconds)
+        self.version += 1
+
+    def close(self):
+        close = getattr(self.ai, 'close', None)
+        if close:
+            close()
+
+
+class GameStore:
+    """Ограниченное хранилище игр с TTL, LRU и лимитом памяти"""
+
+    def __init__(self, max_games: int = 10000, ttl_seconds: float = 1800,
+                 max_memory_bytes: Optional[int] = None, clock=time.time, backend=None,
+                 archive=None, history=None):
+        self.max_games = max_games
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.clock = clock
+        self.memory_bytes = 0
+        self.evictions = Counter()
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.RLock()
+        self.backend = backend or MemoryBackend()
+        # Архив журналов законченных игр (movelog.MoveArchive) или None
+        self.archive = archive
+        # История матчей (history.MatchHistory) или None
+        self.history = history
+        self._shared_ais: 'OrderedDict[str, _SharedAI]' = OrderedDict()
+        self.sweep_seconds = 60.0
+        self._sweeper = BackgroundWorker(self._sweep_loop, 'game-store-sweep')
+
+    def add(self, game_id: str, game, ai=None):
+        """Добавить игру (и её ИИ), вытеснив лишние записи"""
+        if self.backend.shared:
+            self.backend.save_game(game_id, game, self.ttl_seconds)
+            if ai is not None:
+                self.backend.save_ai(game_id, ai.difficulty, ai.export_state(), self.ttl_seconds)
+                self._cache_ai(game_id, _SharedAI(ai, self.backend, game_id, self.ttl_seconds, 1))
+            return
+        size = estimate_size(game) + (estimate_size(ai) if ai is not None else 0) + _GROWTH_ALLOWANCE
+        with self._lock:
+            if game_id in self._entries:
+                self._remove(game_id, None)
+            self._entries[game_id] = _Entry(game, ai, self.clock(), size)
+            self.memory_bytes += size
+            self._evict()
+
+    def get_game(self, game_id: str):
+        """Игра по ID; обращение продлевает её жизнь"""
+        if self.backend.shared:
+            return self.backend.load_game(game_id, self.ttl_seconds)
+        entry = self._touch(game_id)
+        return entry.game if entry else None
+
+    def get_ai(self, game_id: str):
+        """ИИ игры по ID"""
+        if self.backend.shared:
+            return self._load_shared_ai(game_id)
+        entry = self._touch(game_id)
+        return entry.ai if entry else None
+
+    def save(self, game_id: str, game):
+        """Сохранить изменения игры (расстановка, готовность, конец игры)"""
+        if self.backend.shared:
+            self.backend.save_game(game_id, game, self.ttl_seconds)
+        self._archive_finished(game)
+
+    def record_attack(self, game_id: str, game, target_role: str, x: int, y: int, hit: bool):
+        """Сохранить один выстрел по полю target_role и новое состояние игры"""
+        game.record_move(target_role, x, y, 'hit' if hit else 'miss')
+        if self.backend.shared:
+            try:
+                self.backend.record_game_attack(game_id, game, target_role, x, y, hit, self.ttl_seconds)
+            except StaleWriteError:
+                # Ход в этой игре уже записал другой воркер
+                raise MoveError('conflict', 'Игра изменилась во время хода, повторите ход') from None
+        self._archive_finished(game)
+
+    def _archive_finished(self, game):
+        if game.status != 'finished':
+            return
+        if self.archive is not None:
+            self.archive.add(game)
+        if self.history is not None:
+            self.history.add(game)
+
+    def remove(self, game_id: str):
+        """Удалить игру вместе с ИИ"""
+        with self._lock:
+            if self.backend.shared:
+                self.backend.delete_game(game_id)
+                self._drop_shared_ai(game_id)
+                return
+            self._remove(game_id, None)
+
+    def _load_shared_ai(self, game_id: str):
+        """ИИ из общего хранилища; локальная копия используется, пока её версия актуальна"""
+        with self._lock:
+            cached = self._shared_ais.get(game_id)
+            difficulty, version, state = self.backend.load_ai(
+                game_id, cached.version if cached else None)
+            if difficulty is None:
+                self._drop_shared_ai(game_id)
+                return None
+            if state is None:
+                self._shared_ais.move_to_end(game_id)
+                return cached
+            shared = _SharedAI(restore_ai(difficulty, state), self.backend,
+                               game_id, self.ttl_seconds, version)
+            self._cache_ai(game_id, shared)
+            return shared
+
+    def _cache_ai(self, game_id: str, shared: _SharedAI):
+        with self._lock:
+            self._drop_shared_ai(game_id)
+            self._shared_ais[game_id] = shared
+            while len(self._shared_ais) > self.max_games:
+                self._drop_shared_ai(next(iter(self._shared_ais)))
+
+    def _drop_shared_ai(self, game_id: str):
+        shared = self._shared_ais.pop(game_id, None)
+        if shared is not None:
+            shared.close()
+
+    def _touch(self, game_id: str) -> Optional[_Entry]:
+        with self._lock:
+            self._evict_expired()
+            entry = self._entries.get(game_id)
+            if entry is not None:
+                entry.last_activity = self.clock()
+                self._entries.move_to_end(game_id)
+            return entry
+
+    def _remove(self, game_id: str, reason: Optional[str]):
+        entry = self._entries.pop(game_id, None)
+        if entry is None:
+            return
+        self.memory_bytes -= entry.size
+        if reason:
+            self.evictions[reason] += 1
+        # Пакетный ИИ держит слот в общем движке - возвращаем его
+        close = getattr(entry.ai, 'close', None)
+        if close:
+            close()
+
+    def _evict_expired(self):
+        deadline = self.clock() - self.ttl_seconds
+        while self._entries:
+            game_id, entry = next(iter(self._entries.items()))
+            if entry.last_activity > deadline:
+                break
+            self._remove(game_id, 'ttl')
+
+    def _evict(self):
+        self._evict_expired()
+        while len(self._entries) > self.max_games:
+            self._remove(next(iter(self._entries)), 'lru')
+        if self.max_memory_bytes is not None:
+            while self.memory_bytes > self.max_memory_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)), 'memory')
+
+    def sweep(self):
+        """Удалить все игры с истёкшим TTL"""
+        with self._lock:
+            self._evict_expired()
+
+    def start_sweep(self, sweep_seconds: float = None):
+        """Запустить фоновое удаление игр с истёкшим TTL (идемпотентно).
+
+        Без него брошенные игры вытесняются только при обращении к хранилищу.
+        """
+        if sweep_seconds is not None:
+            self.sweep_seconds = sweep_seconds
+        self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Ошибка при удалении устаревших игр: {e}")
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Счётчики хранилища для мониторинга"""
+        return {
+            'backend': self.backend.stats(),
+            'games': len(self._entries),
+            'max_games': self.max_games,
+            'memory_bytes': self.memory_bytes,
+            'max_memory_bytes': self.max_memory_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'evictions': dict(self.evictions)
+        }
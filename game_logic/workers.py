@@ -0,0 +1,116 @@
+"""Фоновые потоки сервисов.
+
+Потоки и их примитивы создаются при первом запуске (start), а не при
+импорте и не в конструкторе: к этому моменту gevent уже мог подменить
+модуль threading, и тогда поток станет гринлетом.
+
+BackgroundWorker - идемпотентный запуск потоков с общим условием
+wakeup. BatchedWriter - очередь записей, которую фоновый поток сбрасывает
+пачками: по batch_size записей или раз в max_wait секунд.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+class BackgroundWorker:
+    """Потоки target(), запускаемые один раз при первом обращении"""
+
+    def __init__(self, target: Callable[[], None], name: str, count: int = 1):
+        self.target = target
+        self.name = name
+        self.count = count
+        # Условие для пробуждения потоков; до запуска - None
+        self.wakeup = None
+        self._threads = []
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._threads)
+
+    def start(self, prepare: Optional[Callable[[], None]] = None):
+        """Запустить потоки (идемпотентно); prepare() выполняется один раз до их старта"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self.wakeup = threading.Condition()
+            if prepare is not None:
+                prepare()
+            names = ([self.name] if self.count == 1
+                     else [f'{self.name}-{number}' for number in range(self.count)])
+            threads = [threading.Thread(target=self.target, name=name, daemon=True)
+                       for name in names]
+            self._threads = threads
+        # Потоки стартуем вне блокировки: под gevent они сразу получают управление
+        for thread in threads:
+            thread.start()
+
+
+class BatchedWriter:
+    """Очередь записей, которые фоновый поток передаёт в write(пачка).
+
+    max_wait <= 0 - запись сразу в вызывающем потоке. Ключи последних
+    recent записей запоминаются, и повтор с тем же ключом отбрасывается.
+    """
+
+    def __init__(self, write: Callable[[list], None], name: str, batch_size: int = 64,
+                 max_wait: float = 1.0, recent: int = 10000):
+        self.write = write
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._recent = OrderedDict()
+        self._recent_size = recent
+        self._recent_lock = threading.Lock()
+        self._pending = []
+        self._worker = BackgroundWorker(self._flush_loop, name)
+
+    def add(self, item, key=None) -> bool:
+        """Поставить запись в очередь; False - запись с этим ключом уже была"""
+        if key is not None:
+            with self._recent_lock:
+                if key in self._recent:
+                    return False
+                self._recent[key] = True
+                if len(self._recent) > self._recent_size:
+                    self._recent.popitem(last=False)
+        if self.max_wait <= 0:
+            self.write([item])
+            return True
+        self._worker.start()
+        with self._worker.wakeup:
+            self._pending.append(item)
+            self._worker.wakeup.notify()
+        return True
+
+    def flush(self):
+        """Сразу записать всё накопленное"""
+        wakeup = self._worker.wakeup
+        if wakeup is None:
+            return
+        with wakeup:
+            batch, self._pending = self._pending, []
+        if batch:
+            self.write(batch)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def _flush_loop(self):
+        wakeup = self._worker.wakeup
+        while True:
+            with wakeup:
+                while not self._pending:
+                    wakeup.wait()
+                # Ждём полную пачку, но не дольше max_wait
+                deadline = time.time() + self.max_wait
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    wakeup.wait(remaining)
+            self.flush()
@@ -0,0 +1,44 @@
+"""Настройки gunicorn для продакшена.
+
+Каждый воркер - один процесс gevent: соединения Socket.IO обслуживаются
+гринлетами, поэтому простаивающий клиент стоит килобайты памяти, а не
+поток ОС. Несколько воркеров требуют общего состояния и шины событий
+(STATE_BACKEND=redis, FANOUT_BUS=redis) и липких сессий на балансировщике.
+"""
+import os
+import resource
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+
+# Одновременных соединений на воркер
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '20000'))
+
+# Веб-сокеты живут долго; пинги Socket.IO держат соединение активным
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '120'))
+graceful_timeout = 30
+keepalive = 75
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Поднять лимит открытых файлов: каждое соединение - дескриптор"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = worker_connections + 1024
+    if hard != resource.RLIM_INFINITY:
+        wanted = min(wanted, hard)
+    if soft != resource.RLIM_INFINITY and soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+        server.log.info(f"RLIMIT_NOFILE: {soft} -> {wanted}")
+
+
+def worker_exit(server, worker):
+    """Дописать накопленные законченные игры перед остановкой воркера"""
+    from api.routes import match_history, move_archive
+    for sink in (match_history, move_archive):
+        if sink is not None:
+            sink.flush()
@@ -31,6 +31,17 @@ let socketReconnectAttempts = 0;
 const MAX_RECONNECT_ATTEMPTS = 5;
 
 let placementPollInterval = null;
+// Опрос сервера - только запасной путь на случай разрыва WebSocket
+const FALLBACK_POLL_MS = 10000;
+// Последняя версия ходов, полученная клиентом (см. applyRoomState);
+// в игре с ИИ - из ответов на атаку и ai_shots
+let roomVersion = null;
+// Выстрелы ИИ приходят событием ai_shots; без него через столько мс - запасной /ai-turn
+const AI_PUSH_TIMEOUT_MS = 5000;
+let aiFallbackTimer = null;
+// ai_shots, пришедшее раньше ответа на атаку (или во время запасного /ai-turn)
+let earlyAIShots = null;
+
 // Функция для остановки опроса расстановки
 function stopPlacementPolling() {
     if (placementPollInterval) {
@@ -59,12 +70,15 @@ function initWebSocket() {
         socketReconnectAttempts = 0;
         addLog('Соединение с сервером установлено');
         
+        watchCurrentGame();
+        
         // Если есть активная комната - переподключаемся
         if (currentRoomCode && playerId) {
             setTimeout(() => {
                 socket.emit('join_room', {
                     room_code: currentRoomCode,
-                    player_id: playerId
+                    player_id: playerId,
+                    last_seq: roomVersion
                 });
             }, 500);
         }
@@ -101,6 +115,18 @@ function initWebSocket() {
         addLog(`Ошибка соединения: ${error.message || 'неизвестная ошибка'}`);
     });
     
+    // Выстрелы ИИ, посчитанные сервером в фоне после нашей атаки
+    socket.on('ai_shots', (data) => {
+        if (data.game_id !== gameId || !isFreshAIShots(data)) return;
+        if (!aiFallbackTimer) {
+            earlyAIShots = data;
+            return;
+        }
+        clearTimeout(aiFallbackTimer);
+        aiFallbackTimer = null;
+        applyAIShots(data);
+    });
+    
     socket.on('room_joined', (data) => {
         console.log('Successfully joined room via WebSocket:', data);
         addLog('Подключено к комнате через WebSocket');
@@ -110,7 +136,12 @@ function initWebSocket() {
         console.log('Another player joined:', data);
         
         // Обновляем список игроков в лобби
-        if (currentRoomCode) {
+        if (data.state && data.state.room) {
+            if (data.state.room.player2_id && !window.secondPlayerNotified) {
+                addLobbyMessage('Второй игрок присоединился к комнате!');
+                window.secondPlayerNotified = true;
+            }
+        } else if (currentRoomCode) {
             fetch(`${API_BASE_URL}/api/multiplayer/room/${currentRoomCode}/state?player_id=${playerId}`)
                 .then(res => res.json())
                 .then(data => {
@@ -243,6 +274,23 @@ function initWebSocket() {
     });
 
     
+    socket.on('room_expired', (data) => {
+        console.log('Room expired:', data);
+        addLog(data.message);
+        alert(data.message);
+        
+        if (lobbyPollInterval) clearInterval(lobbyPollInterval);
+        if (window.gamePollInterval) clearInterval(window.gamePollInterval);
+        if (multiplayerGamePollInterval) clearInterval(multiplayerGamePollInterval);
+        stopPlacementPolling();
+        currentRoomCode = null;
+        
+        document.getElementById('gameSetup').style.display = 'block';
+        document.getElementById('lobbyContainer').style.display = 'none';
+        document.getElementById('placementContainer').style.display = 'none';
+        document.getElementById('gameContainer').style.display = 'none';
+    });
+    
     socket.on('move_rejected', (data) => {
         console.log('Move rejected:', data);
         
@@ -257,6 +305,18 @@ function initWebSocket() {
         }
     });
     
+    // Состояние комнаты целиком или с пропущенными ходами (после переподключения)
+    socket.on('room_state', (data) => {
+        console.log('Room state:', data);
+        applyRoomState(data, data.reason === 'resync');
+    });
+    
+    // Каждое событие комнаты несёт изменение её состояния в поле state
+    ['player_joined', 'player_left', 'player_ready_update', 'placement_started',
+     'player_placement_complete', 'battle_started', 'move_result', 'game_finished'].forEach(event => {
+        socket.on(event, (data) => applyRoomState(data && data.state));
+    });
+    
     // Пинг-понг для поддержания соединения
     setInterval(() => {
         if (socket && socket.connected) {
@@ -265,6 +325,101 @@ function initWebSocket() {
     }, 30000);
 }
 
+function isShown(containerId) {
+    const element = document.getElementById(containerId);
+    return !!element && element.style.display === 'block';
+}
+
+// Попросить сервер дослать ходы после известной версии
+function requestResync() {
+    if (socket && socket.connected && currentRoomCode && playerId) {
+        socket.emit('resync', {
+            room_code: currentRoomCode,
+            player_id: playerId,
+            last_seq: roomVersion
+        });
+    }
+}
+
+// Применить состояние комнаты из WebSocket. Поля игры описаны по ролям,
+// moves - выстрелы после since_version. При resync клиент мог пропустить
+// смену этапа, поэтому переходит в нужный экран сам.
+function applyRoomState(state, resync = false) {
+    if (!state || !state.room || state.room.room_code !== currentRoomCode) return;
+    
+    const room = state.room;
+    const game = state.game;
+    
+    if (isShown('lobbyContainer')) {
+        updatePlayerList(room);
+    }
+    if (isShown('placementContainer')) {
+        updateOpponentPlacementStatus(room);
+    }
+    
+    if (resync) {
+        if (isShown('lobbyContainer') && room.status === 'placement' && room.has_game) {
+            stopLobbyPolling();
+            startMultiplayerGame(state);
+            return;
+        }
+        if ((isShown('lobbyContainer') || isShown('placementContainer')) && room.status === 'active') {
+            stopPlacementPolling();
+            startMultiplayerBattle(state);
+            return;
+        }
+    }
+    
+    if (!game || !isShown('gameContainer')) return;
+    
+    // Между известной версией и присланными ходами есть пропуск
+    if (!game.full && roomVersion !== null && game.since_version > roomVersion) {
+        requestResync();
+        return;
+    }
+    
+    const myHits = [];
+    const opponentHits = [];
+    game.moves.forEach(move => {
+        const hits = move.target === playerRole ? myHits : opponentHits;
+        hits.push({ x: move.x, y: move.y, type: move.result });
+    });
+    updateBoardsFromServer({ my_board_hits: myHits, opponent_board_hits: opponentHits });
+    
+    const opponentRole = playerRole === 'player1' ? 'player2' : 'player1';
+    (game.sunk[opponentRole] || []).forEach(ship => {
+        ship.forEach(pos => {
+            const sunkCell = getCell('opponentBoard', pos[0], pos[1]);
+            if (sunkCell) {
+                sunkCell.classList.add('sunk');
+                sunkCell.textContent = '💀';
+            }
+        });
+    });
+    
+    roomVersion = Math.max(roomVersion || 0, game.version);
+    currentGameState = {
+        status: game.status,
+        current_turn: game.current_turn,
+        winner: game.winner
+    };
+    updateGameHeaders(currentGameState);
+    
+    if (resync && game.status === 'finished') {
+        if (game.winner === playerRole) {
+            showVictory();
+        } else {
+            showDefeat();
+        }
+    } else if (resync && game.status === 'active') {
+        if (game.current_turn === playerRole) {
+            unlockOpponentBoard();
+        } else {
+            lockOpponentBoard();
+        }
+    }
+}
+
 function handleWebSocketMove(data) {
     if (!data || !data.move) return;
     
@@ -405,6 +560,7 @@ async function createMultiplayerRoom() {
         const data = await response.json();
         if (data.success) {
             currentRoomCode = data.room_code;
+            roomVersion = null;
             
             // Подключаемся к комнате через WebSocket
             if (socket && socket.connected) {
@@ -470,6 +626,7 @@ async function joinMultiplayerRoom() {
         const data = await response.json();
         if (data.success) {
             currentRoomCode = roomCodeInput;
+            roomVersion = null;
             
             // Подключаемся к комнате через WebSocket
             if (socket && socket.connected) {
@@ -760,6 +917,8 @@ function startPlacementPolling() {
     
     placementPollInterval = setInterval(async () => {
         if (!currentRoomCode || !playerId) return;
+        // Пока WebSocket подключён, обновления приходят через него
+        if (socket && socket.connected) return;
         
         try {
             const response = await fetch(`${API_BASE_URL}/api/multiplayer/room/${currentRoomCode}/state?player_id=${playerId}`);
@@ -778,7 +937,7 @@ function startPlacementPolling() {
         } catch (error) {
             console.error('Ошибка опроса статуса расстановки:', error);
         }
-    }, 2000);
+    }, FALLBACK_POLL_MS);
 }
 
 // Обновить статус противника в расстановке
@@ -926,6 +1085,8 @@ function startMultiplayerBattlePolling() {
     
     const pollFunction = async () => {
         if (!currentRoomCode || !playerId) return;
+        // Пока WebSocket подключён, ходы приходят через него
+        if (socket && socket.connected) return;
         
         pollCount++;
         if (pollCount % 10 === 0) {
@@ -933,7 +1094,8 @@ function startMultiplayerBattlePolling() {
         }
         
         try {
-            const response = await fetch(`${API_BASE_URL}/api/multiplayer/room/${currentRoomCode}/state?player_id=${playerId}`);
+            const sinceParam = roomVersion === null ? '' : `&since_version=${roomVersion}`;
+            const response = await fetch(`${API_BASE_URL}/api/multiplayer/room/${currentRoomCode}/state?player_id=${playerId}${sinceParam}`);
             
             if (response.status === 429) {
                 console.warn('Rate limit, увеличиваем интервал');
@@ -972,6 +1134,9 @@ function startMultiplayerBattlePolling() {
             // Обновляем состояние игры
             if (data.game) {
                 currentGameState = data.game;
+                if (data.game.version !== undefined) {
+                    roomVersion = data.game.version;
+                }
                 
                 updateGameHeaders(data.game);
                 
@@ -992,8 +1157,7 @@ function startMultiplayerBattlePolling() {
         }
     };
     
-    pollFunction();
-    gamePollInterval = setInterval(pollFunction, 1000);
+    gamePollInterval = setInterval(pollFunction, FALLBACK_POLL_MS);
 }
 
 // Функция для отображения поражения
@@ -1169,6 +1333,7 @@ async function startMultiplayerBattle(gameData) {
     
     // Устанавливаем текущее состояние игры
     currentGameState = gameData.game;
+    roomVersion = gameData.game.version !== undefined ? gameData.game.version : null;
     
     updateGameHeaders(gameData.game);
     
@@ -1227,7 +1392,8 @@ async function handleAttack(x, y) {
             const requestBody = {
                 x: x,
                 y: y,
-                game_id: gameId
+                game_id: gameId,
+                async_ai: !!(socket && socket.connected)
             };
             
             const response = await fetch(endpoint, {
@@ -1246,6 +1412,7 @@ async function handleAttack(x, y) {
             
             const data = await response.json();
             console.log('Response data:', data);
+            if (data.version !== undefined) roomVersion = data.version;
             processAIResponse(data, x, y);
             
         } catch (error) {
@@ -1629,10 +1796,94 @@ function processAIResponse(data, x, y) {
             setTimeout(() => {
                 processAIShots(data.ai_shots);
             }, 1000);
+        } else if (data.ai_pending) {
+            // Ход ИИ считается на сервере и придёт событием ai_shots
+            updateTurnIndicator('AI');
+            addLog('Ход переходит к ИИ...');
+            
+            lockBoardForAI();
+            const early = earlyAIShots;
+            earlyAIShots = null;
+            if (early && early.game_id === gameId && isFreshAIShots(early)) {
+                applyAIShots(early);
+            } else {
+                clearTimeout(aiFallbackTimer);
+                aiFallbackTimer = setTimeout(runAITurnFallback, AI_PUSH_TIMEOUT_MS);
+            }
         }
     }
 }
 
+// Подписаться на события одиночной игры (выстрелы ИИ из фона)
+function watchCurrentGame() {
+    if (socket && socket.connected && gameId && playerId) {
+        socket.emit('watch_game', { game_id: gameId, player_id: playerId });
+    }
+}
+
+// ai_shots новее уже показанных ходов (старые - поздний дубль запасного пути)
+function isFreshAIShots(data) {
+    return roomVersion === null || data.version === undefined || data.version > roomVersion;
+}
+
+// Показать выстрелы из события ai_shots и запомнить их версию
+function applyAIShots(data) {
+    if (data.version !== undefined) roomVersion = data.version;
+    showAIShots(data.ai_shots, data.game_over);
+}
+
+// Показать серию выстрелов ИИ и поражение, если ИИ выиграл
+function showAIShots(aiShots, gameOver) {
+    if (!aiShots || aiShots.length === 0) {
+        updateTurnIndicator('player1');
+        unlockBoardForAI();
+        return;
+    }
+    processAIShots(aiShots);
+    if (gameOver) {
+        setTimeout(() => {
+            addLog('💀 Поражение! ИИ потопил все ваши корабли.');
+            document.getElementById('gameStatus').textContent = 'Поражение';
+            document.getElementById('turnIndicator').textContent = 'Игра завершена';
+            lockBoardForAI();
+        }, aiShots.length * 1000);
+    }
+}
+
+// Событие ai_shots не пришло: доигрываем ход ИИ синхронными запросами
+async function runAITurnFallback() {
+    aiFallbackTimer = null;
+    // Всё, что пришло до таймера, уже устарело
+    earlyAIShots = null;
+    const aiShots = [];
+    let gameOver = false;
+    try {
+        while (true) {
+            const response = await fetch(`${API_BASE_URL}/api/game/${gameId}/ai-turn`, {
+                method: 'POST',
+                headers: { 'X-CSRFToken': csrfToken }
+            });
+            if (!response.ok) break;
+            const data = await response.json();
+            aiShots.push(...(data.ai_shots || []));
+            gameOver = !!data.game_over;
+            if (data.version !== undefined) roomVersion = data.version;
+            if (data.next_turn !== 'ai') break;
+        }
+    } catch (error) {
+        console.error('Ошибка запасного хода ИИ:', error);
+    }
+    // Фоновый ход мог успеть раньше нас: тогда /ai-turn ничего не сделал,
+    // а выстрелы пришли событием ai_shots во время запросов
+    const late = earlyAIShots;
+    earlyAIShots = null;
+    if (aiShots.length === 0 && late && late.game_id === gameId && isFreshAIShots(late)) {
+        applyAIShots(late);
+        return;
+    }
+    showAIShots(aiShots, gameOver);
+}
+
 function processAIShots(aiShots) {
     if (!aiShots || aiShots.length === 0) return;
     
@@ -1799,13 +2050,17 @@ async function startGameAI() {
             },
             body: JSON.stringify({
                 player_id: playerId,
-                vs_ai: true
+                vs_ai: true,
+                difficulty: document.getElementById('aiDifficulty')?.value || 'normal'
             })
         });
         
         const data = await response.json();
         gameId = data.game_id;
+        roomVersion = null;
+        earlyAIShots = null;
         currentGameState = data;
+        watchCurrentGame();
 
         currentGameState.current_turn = 'player1';
         
@@ -1846,6 +2101,7 @@ function restartGame() {
         
         // Сбрасываем переменные
         currentRoomCode = null;
+        roomVersion = null;
         gameType = null;
         playerRole = null;
         isGameHost = false;
@@ -2352,7 +2608,10 @@ async function startGame(vsAI = true) {
         
         const data = await response.json();
         gameId = data.game_id;
+        roomVersion = null;
+        earlyAIShots = null;
         currentGameState = data;
+        watchCurrentGame();
         
         // Показываем интерфейс расстановки
         document.getElementById('gameIdDisplay').textContent = gameId;
@@ -0,0 +1,137 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Board
+from game_logic.ai import BattleshipAI, create_ai
+from game_logic.density_ai import DensityAI
+from game_logic.batch_ai import BatchAIEngine, BatchedAI
+from game_logic.bitboard import dilate, mask_from_positions, positions_from_mask
+from game_logic.solver import OPENING_BOOK
+
+
+def play_until_win(ai, board, limit=100):
+    """Сыграть за ИИ против доски до победы, вернуть число выстрелов"""
+    for shot in range(1, limit + 1):
+        x, y = ai.generate_shot()
+        result = board.receive_attack(x, y)
+        ai.record_shot(x, y, result['result'], result.get('ship_positions'))
+        if result.get('game_over'):
+            return shot
+    return None
+
+
+class TestDensityAI(unittest.TestCase):
+    def test_never_repeats_shots_and_wins(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            board = Board()
+            board.auto_place_all_ships(rng=rng)
+            ai = DensityAI(rng=rng)
+            shots = play_until_win(ai, board)
+            self.assertIsNotNone(shots)
+            self.assertEqual(len(ai.shot_history), shots)
+    
+    def test_targets_neighbours_after_hit(self):
+        ai = DensityAI(rng=random.Random(0))
+        ai.record_shot(5, 5, 'hit')
+        x, y = ai.generate_shot()
+        self.assertEqual(abs(x - 5) + abs(y - 5), 1)
+    
+    def test_avoids_halo_of_sunk_ship(self):
+        ai = DensityAI(rng=random.Random(0))
+        ai.record_shot(0, 0, 'hit', [(0, 0)])
+        self.assertEqual(ai.remaining[1], 1)
+        for _ in range(20):
+            self.assertNotIn(ai.generate_shot(), {(0, 0), (1, 0), (0, 1), (1, 1)})
+
+
+class TestBatchAIEngine(unittest.TestCase):
+    def test_batch_plays_many_games(self):
+        engine = BatchAIEngine(capacity=2, seed=3)
+        boards, ais, shots = [], [], []
+        for seed in range(20):
+            board = Board()
+            board.auto_place_all_ships(rng=random.Random(seed))
+            boards.append(board)
+            ais.append(BatchedAI(engine))
+            shots.append(set())
+        live = list(range(20))
+        while live:
+            moves = engine.compute([ais[i].slot for i in live])
+            for i, (x, y) in zip(list(live), moves):
+                self.assertNotIn((x, y), shots[i])
+                shots[i].add((x, y))
+                result = boards[i].receive_attack(x, y)
+                ais[i].record_shot(x, y, result['result'], result.get('ship_positions'))
+                if result.get('game_over'):
+                    live.remove(i)
+        self.assertEqual(engine.stats()['games'], 20)
+    
+    def test_submit_and_release(self):
+        engine = BatchAIEngine(capacity=1, seed=0)
+        ai = BatchedAI(engine)
+        ai.record_shot(4, 4, 'hit')
+        x, y = ai.generate_shot()
+        self.assertEqual(abs(x - 4) + abs(y - 4), 1)
+        ai.close()
+        self.assertEqual(engine.stats()['games'], 0)
+    
+    def test_exhausted_board(self):
+        engine = BatchAIEngine(capacity=2, seed=0)
+        ai = BatchedAI(engine)
+        # Свободных клеток нет, кроме ореола потопленного корабля в углу
+        ai.record_shot(0, 0, 'hit', [(0, 0)])
+        for y in range(10):
+            for x in range(10):
+                if (x, y) not in {(0, 0), (1, 0), (0, 1), (1, 1)}:
+                    ai.record_shot(x, y, 'miss')
+        for _ in range(10):
+            self.assertIn(engine.compute([ai.slot])[0], {(1, 0), (0, 1), (1, 1)})
+        for cell in [(1, 0), (0, 1), (1, 1)]:
+            ai.record_shot(*cell, 'miss')
+        other = BatchedAI(engine)
+        self.assertEqual(engine.compute([ai.slot, other.slot])[0], None)
+        with self.assertRaises(ValueError):
+            ai.generate_shot()
+
+    def test_opening_book_and_endgame_solver(self):
+        engine = BatchAIEngine(capacity=2, seed=0)
+        for seed in range(5):
+            ai = BatchedAI(engine, rng=random.Random(seed))
+            self.assertIn(ai.generate_shot(), OPENING_BOOK[0])
+            ai.close()
+        
+        ai = BatchedAI(engine, rng=random.Random(0))
+        # Остался однопалубный корабль и три свободные клетки
+        fleet = [[(0, 0), (1, 0), (2, 0), (3, 0)], [(0, 2), (1, 2), (2, 2)], [(0, 4), (1, 4), (2, 4)],
+                 [(0, 6), (1, 6)], [(0, 8), (1, 8)], [(5, 5)]]
+        for ship in fleet:
+            for x, y in ship:
+                ai.record_shot(x, y, 'hit', ship if (x, y) == ship[-1] else None)
+        free = {(9, 9), (9, 0), (6, 9)}
+        excluded = set(positions_from_mask(dilate(mask_from_positions(p for ship in fleet for p in ship))))
+        for y in range(10):
+            for x in range(10):
+                if (x, y) not in free and (x, y) not in excluded:
+                    ai.record_shot(x, y, 'miss')
+        moves = engine.moves
+        self.assertIn(ai.generate_shot(), free)
+        # Ход посчитан решателем, без движка
+        self.assertEqual(engine.moves, moves)
+
+
+class TestCreateAI(unittest.TestCase):
+    def test_difficulties(self):
+        self.assertIsInstance(create_ai(), BattleshipAI)
+        self.assertIsInstance(create_ai('hard'), DensityAI)
+        self.assertIsInstance(create_ai('normal', batched=True), BatchedAI)
+        with self.assertRaises(ValueError):
+            create_ai('impossible')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,105 @@
+import unittest
+import random
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api import routes, websocket
+from api.fanout import LocalBus, RoomFanout
+from game_logic.ai import create_ai
+from game_logic.ai_turns import AITurnPool
+from game_logic.core import Game
+
+
+class TestAITurnPool(unittest.TestCase):
+    def test_turns_run_off_the_caller_thread_once_per_game(self):
+        release = threading.Event()
+        calls = []
+        
+        def run(game_id):
+            release.wait(2)
+            calls.append((game_id, threading.current_thread().name))
+        
+        pool = AITurnPool(run, workers=1)
+        self.assertTrue(pool.submit('game0001'))
+        time.sleep(0.05)
+        # Первая игра уже считается, вторая ждёт в очереди и не дублируется
+        self.assertTrue(pool.submit('game0002'))
+        self.assertFalse(pool.submit('game0002'))
+        release.set()
+        
+        deadline = time.time() + 2
+        while pool.stats()['completed'] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([game_id for game_id, _ in calls], ['game0001', 'game0002'])
+        self.assertTrue(all(name.startswith('ai-turns') for _, name in calls))
+        self.assertEqual(pool.stats()['pending'], 0)
+    
+    def test_failed_turn_is_counted(self):
+        def run(game_id):
+            raise RuntimeError('boom')
+        pool = AITurnPool(run)
+        pool.submit('game0001')
+        deadline = time.time() + 2
+        while not pool.stats()['failed'] and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.stats()['failed'], 1)
+
+    def test_shots_are_computed_on_os_threads(self):
+        pool = AITurnPool(lambda game_id: None, workers=1, os_threads=True)
+        pool.start()
+        callers = []
+        ai = create_ai('hard')
+        generate_shot = ai.generate_shot
+        
+        def traced():
+            callers.append(threading.get_ident())
+            return generate_shot()
+        
+        ai.generate_shot = traced
+        x, y = pool.think(ai)
+        self.assertTrue(0 <= x < 10 and 0 <= y < 10)
+        self.assertNotEqual(callers, [threading.get_ident()])
+        self.assertTrue(pool.stats()['os_threads'])
+
+
+class TestBackgroundAITurn(unittest.TestCase):
+    def setUp(self):
+        self.received = []
+        bus_fanout = RoomFanout(LocalBus(), 0)
+        bus_fanout.attach(lambda room, event, data, skip_sid: self.received.append((room, event, data)))
+        self.addCleanup(setattr, websocket, 'fanout', websocket.fanout)
+        websocket.fanout = bus_fanout
+    
+    def test_ai_shots_are_pushed_to_the_game_channel(self):
+        rng = random.Random(5)
+        game = Game('bgai0001', 'player')
+        game.players['player2'] = 'AI_BOT'
+        for board in game.boards.values():
+            board.auto_place_all_ships(rng)
+        game.status = 'active'
+        game.current_turn = 'player2'
+        routes.game_store.add(game.id, game, create_ai('normal'))
+        self.addCleanup(routes.game_store.remove, game.id)
+        
+        routes.run_ai_turn(game.id)
+        
+        [(room, event, data)] = self.received
+        self.assertEqual((room, event), ('game:bgai0001', 'ai_shots'))
+        shots = data['ai_shots']
+        self.assertEqual(len(shots), game.version)
+        self.assertTrue(all(shot['result'] == 'hit' for shot in shots[:-1]))
+        self.assertEqual(shots[-1]['result'], 'miss')
+        self.assertEqual(data['next_turn'], 'player1')
+        self.assertEqual(data['version'], game.version)
+        
+        # Ход уже сделан - повторный запуск ничего не рассылает
+        routes.run_ai_turn(game.id)
+        self.assertEqual(len(self.received), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -77,5 +77,78 @@ class TestAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIn(b'background', response.data)
 
+class TestRoomStateVersions(unittest.TestCase):
+    def setUp(self):
+        from game_logic.core import game_manager
+        from security.rate_limiter import limiter
+        self.app, _ = create_app()
+        self.app.config['TESTING'] = True
+        self.app.config['WTF_CSRF_ENABLED'] = False
+        self.client = self.app.test_client()
+        limiter.enabled = False
+        self.addCleanup(setattr, limiter, 'enabled', True)
+        
+        self.manager = game_manager
+        self.code = game_manager.create_room('host')
+        game_manager.join_room(self.code, 'guest')
+        self.room = game_manager.get_room(self.code)
+        self.room.set_player_ready('host')
+        self.room.set_player_ready('guest')
+        self.room.game.boards['player2'].place_ship_manual([(0, 0), (1, 0), (2, 0), (3, 0)])
+        self.room.game.status = self.room.status = 'active'
+        self.addCleanup(game_manager.leave_room, self.code, 'host')
+    
+    def state(self, etag=None, **params):
+        params.setdefault('player_id', 'host')
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(f'/api/multiplayer/room/{self.code}/state',
+                               query_string=params, headers=headers)
+    
+    def shoot(self, x, y):
+        result = self.room.game.boards['player2'].receive_attack(x, y)
+        self.manager.record_attack(self.room, 'player2', x, y, result['result'] == 'hit')
+    
+    def test_since_version_returns_only_new_moves(self):
+        self.shoot(0, 0)
+        self.shoot(5, 5)
+        game = json.loads(self.state().data)['game']
+        self.assertEqual(game['version'], 2)
+        self.assertTrue(game['full'])
+        self.assertEqual(len(game['opponent_board_hits']), 2)
+        
+        self.shoot(1, 0)
+        game = json.loads(self.state(since_version=2).data)['game']
+        self.assertFalse(game['full'])
+        self.assertEqual(game['version'], 3)
+        self.assertEqual(game['opponent_board_hits'], [{'x': 1, 'y': 0, 'type': 'hit'}])
+        self.assertEqual(game['my_board_hits'], [])
+    
+    def test_etag_answers_not_modified(self):
+        etag = self.state().headers['ETag'].strip('"')
+        response = self.state(etag=f'"{etag}"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        
+        self.shoot(9, 9)
+        response = self.state(etag=f'"{etag}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'].strip('"'), etag)
+    
+    def test_room_game_commands_take_room_lock(self):
+        commands = self.manager.room_locks.commands
+        for endpoint in ('auto_place', 'ready'):
+            response = self.client.post(f'/api/game/{self.room.game.id}/{endpoint}',
+                                        json={'player_id': 'host'})
+            self.assertEqual(response.status_code, 200)
+        # Обе команды прошли под блокировкой комнаты
+        self.assertEqual(self.manager.room_locks.commands, commands + 2)
+    
+    def test_placement_changes_etag(self):
+        etag = self.state().headers['ETag'].strip('"')
+        self.room.game.boards['player1'].place_ship_manual([(0, 5), (1, 5), (2, 5)])
+        response = self.state(etag=f'"{etag}"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['game']['my_ships_remaining'], 1)
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,87 @@
+import unittest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.codec import (CodecError, FLAGS_OFFSET, bitmap_offset, decode, decode_game,
+                              decode_room, dynamic_header, encode_game, encode_room, move_byte)
+from game_logic.core import Game, GameRoom
+
+
+def make_game(seed=1):
+    rng = random.Random(seed)
+    game = Game('abcd1234', 'player')
+    game.players['player2'] = 'AI_BOT'
+    for board in game.boards.values():
+        board.auto_place_all_ships(rng)
+    for _ in range(30):
+        game.boards['player2'].receive_attack(rng.randrange(10), rng.randrange(10))
+    game.status = 'active'
+    game.ready_players = {'player1', 'player2'}
+    game.last_move = {'player': 'player2', 'x': 3, 'y': 4, 'result': 'hit', 'timestamp': 12.5}
+    return game
+
+
+class TestCodec(unittest.TestCase):
+    def test_game_round_trip(self):
+        game = make_game()
+        data = encode_game(game)
+        self.assertLess(len(data), 160)
+        self.assertEqual(decode_game(data).export_state(), game.export_state())
+        # Декодирование из memoryview и bytearray
+        self.assertEqual(decode(memoryview(bytearray(data))).export_state(), game.export_state())
+
+    def test_room_round_trip_with_and_without_game(self):
+        room = GameRoom('ABC123', 'host')
+        self.assertEqual(decode_room(encode_room(room)).export_state(), room.export_state())
+        room.join('guest')
+        room.player1_ready = room.player2_ready = True
+        room.start_game()
+        room.game.boards['player1'].auto_place_all_ships(random.Random(2))
+        self.assertEqual(decode_room(encode_room(room)).export_state(), room.export_state())
+
+    def test_move_can_be_patched_in_place(self):
+        game = make_game()
+        data = bytearray(encode_game(game))
+        board = game.boards['player1']
+        x, y = board.ships[0].positions[0]
+        board.receive_attack(x, y)
+        game.current_turn = 'player2'
+
+        # То же, что делает SETBIT + SETRANGE в общем хранилище
+        bit = bitmap_offset('player1', True) * 8 + y * 10 + x
+        data[bit >> 3] |= 0x80 >> (bit & 7)
+        header = dynamic_header(game)
+        data[FLAGS_OFFSET:FLAGS_OFFSET + len(header)] = header
+        self.assertEqual(decode_game(data).export_state(), game.export_state())
+
+    def test_move_log_round_trip_and_append(self):
+        game = make_game()
+        board = game.boards['player1']
+        x, y = board.ships[0].positions[0]
+        for target, (sx, sy) in (('player2', (9, 9)), ('player1', (x, y))):
+            result = game.boards[target].receive_attack(sx, sy)
+            game.record_move(target, sx, sy, result['result'])
+        data = encode_game(game)
+        self.assertEqual(decode_game(data).moves, game.moves)
+
+        # Новый ход дописывается одним байтом в конец снимка (APPEND)
+        board.receive_attack(0, 9)
+        game.record_move('player1', 0, 9, 'hit' if board.grid[9][0] == 'X' else 'miss')
+        data += bytes((move_byte('player1', 0, 9),))
+        restored = decode_game(data)
+        self.assertEqual(restored.version, 3)
+        self.assertEqual(restored.moves_since(2), game.moves[2:])
+
+    def test_rejects_unknown_version_and_truncated_data(self):
+        data = encode_game(make_game())
+        with self.assertRaises(CodecError):
+            decode(b'\x09' + data[1:])
+        with self.assertRaises(CodecError):
+            decode(data[:-5])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
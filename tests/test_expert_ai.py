@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pydantic import ValidationError
+
+from api.models import CreateGameRequest
+from game_logic.ai import create_ai, create_strategy
+from game_logic.bitboard import FULL_MASK, mask_from_positions
+from game_logic.core import Board
+from game_logic.expert_ai import ExpertAI
+from game_logic.solver import PERMUTATIONS, count_placements, solver_cache, symmetries_of
+
+
+class TestSymmetryReduction(unittest.TestCase):
+    def test_matches_full_enumeration(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            shots = set()
+            for _ in range(30):
+                cell = rng.randrange(100)
+                # Отражение относительно центра: позиция остаётся симметричной
+                shots.update({cell, PERMUTATIONS[3][cell]})
+            available = FULL_MASK & ~mask_from_positions((c % 10, c // 10) for c in shots)
+            self.assertGreaterEqual(len(symmetries_of((available, 0))), 2)
+            full = count_placements(available, 0, [4, 2, 1], max_nodes=10 ** 6, symmetry=False)
+            reduced = count_placements(available, 0, [4, 2, 1], max_nodes=10 ** 6)
+            self.assertEqual(reduced, full)
+
+    def test_node_budget(self):
+        self.assertIsNone(count_placements(FULL_MASK, 0, [4, 3, 3, 2, 2, 1, 1], max_nodes=1000))
+
+
+class TestExpertAI(unittest.TestCase):
+    def test_simulation_only(self):
+        self.assertIsInstance(create_strategy('expert'), ExpertAI)
+        with self.assertRaises(ValueError):
+            create_ai('expert')
+        with self.assertRaises(ValidationError):
+            CreateGameRequest(player_id='player1', vs_ai=True, difficulty='expert')
+
+    def test_falls_back_when_over_budget(self):
+        ai = ExpertAI(rng=random.Random(0), node_budget=100)
+        # На пустом поле перебор даже не начинается
+        self.assertEqual(ai.give_up_at, ExpertAI.max_cells + 1)
+        ai.give_up_at = 101
+        x, y = ai.generate_shot()
+        self.assertTrue(0 <= x < 10 and 0 <= y < 10)
+        self.assertEqual(ai.exact_moves, 0)
+        # Пока свободных клеток не меньше, точный подсчёт не повторяется
+        self.assertEqual(ai.give_up_at, 100)
+        restored = ExpertAI.from_state(ai.export_state())
+        self.assertEqual(restored.give_up_at, 100)
+        self.assertEqual(restored.node_budget, 100)
+
+    def test_exact_shot_finishes_wounded_ship(self):
+        ai = ExpertAI(rng=random.Random(0))
+        # Все корабли, кроме однопалубного, потоплены; свободны три клетки
+        fleet = [[(0, 0), (1, 0), (2, 0), (3, 0)], [(0, 2), (1, 2), (2, 2)], [(0, 4), (1, 4), (2, 4)],
+                 [(0, 6), (1, 6)], [(0, 8), (1, 8)], [(5, 5)]]
+        for ship in fleet:
+            for x, y in ship:
+                ai.record_shot(x, y, 'hit', ship if (x, y) == ship[-1] else None)
+        free = {(9, 9), (9, 0), (6, 9)}
+        for y in range(10):
+            for x in range(10):
+                if (x, y) not in free and (x, y) not in ai.shot_history and (x, y) not in ai.forbidden_cells:
+                    ai.record_shot(x, y, 'miss')
+        self.assertIn(ai.generate_shot(), free)
+        self.assertEqual(ai.exact_moves, 1)
+
+    def test_wins_games(self):
+        for seed in range(3):
+            rng = random.Random(seed)
+            board = Board()
+            board.auto_place_all_ships(rng=rng)
+            ai = ExpertAI(rng=rng)
+            for shot in range(1, 101):
+                x, y = ai.generate_shot()
+                result = board.receive_attack(x, y)
+                sunk = list(board.ships[result['ship_id']].positions) if result.get('sunk') else None
+                ai.record_shot(x, y, result['result'], sunk)
+                if result.get('game_over'):
+                    break
+            self.assertTrue(result.get('game_over'))
+            self.assertEqual(len(ai.shot_history), shot)
+            self.assertGreater(ai.exact_moves, 0)
+    
+    def test_same_seed_same_game(self):
+        games = []
+        for _ in range(2):
+            solver_cache.clear()
+            rng = random.Random(7)
+            board = Board()
+            board.auto_place_all_ships(rng=rng)
+            ai = ExpertAI(rng=rng)
+            shots = []
+            while True:
+                x, y = ai.generate_shot()
+                result = board.receive_attack(x, y)
+                sunk = list(board.ships[result['ship_id']].positions) if result.get('sunk') else None
+                ai.record_shot(x, y, result['result'], sunk)
+                shots.append((x, y))
+                if result.get('game_over'):
+                    break
+            games.append(shots)
+        # Бюджет в шагах, а не во времени: ход не зависит от скорости машины
+        self.assertEqual(games[0], games[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
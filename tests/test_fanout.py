@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from api import websocket
+from api.fanout import LocalBus, RoomFanout
+from game_logic.core import GameManager, GameRoom
+
+
+class Worker:
+    """Воркер с локальными клиентами: запоминает доставленные события"""
+
+    def __init__(self, bus, max_wait=60):
+        self.received = []
+        self.closed = []
+        self.fanout = RoomFanout(bus, max_wait)
+        self.fanout.attach(lambda room, event, data, skip_sid: self.received.append((room, event, data, skip_sid)),
+                           self.closed.append)
+
+
+class TestRoomFanout(unittest.TestCase):
+    def setUp(self):
+        self.bus = LocalBus()
+        self.worker_a = Worker(self.bus)
+        self.worker_b = Worker(self.bus)
+
+    def test_events_reach_every_worker_in_order(self):
+        self.worker_a.fanout.emit('ROOM1', 'move_result', {'x': 1, 'y': 2}, 'sid-a')
+        self.worker_a.fanout.emit('ROOM1', 'game_finished', {'winner': 'player1'})
+        self.worker_a.fanout.emit('ROOM2', 'player_joined', {'player_id': 'p'})
+        self.assertEqual(self.worker_b.received, [])
+
+        self.worker_a.fanout.flush()
+        expected = [('ROOM1', 'move_result', {'x': 1, 'y': 2}, 'sid-a'),
+                    ('ROOM1', 'game_finished', {'winner': 'player1'}, None),
+                    ('ROOM2', 'player_joined', {'player_id': 'p'}, None)]
+        self.assertEqual(self.worker_a.received, expected)
+        self.assertEqual(self.worker_b.received, expected)
+        # Все события ушли одной публикацией
+        self.assertEqual(self.worker_a.fanout.published, 1)
+
+    def test_close_room_follows_queued_events(self):
+        self.worker_a.fanout.emit('ROOM1', 'room_expired', {})
+        self.worker_a.fanout.close_room('ROOM1')
+        self.worker_a.fanout.flush()
+        self.assertEqual([event for _, event, _, _ in self.worker_b.received], ['room_expired'])
+        self.assertEqual(self.worker_b.closed, ['ROOM1'])
+
+    def test_background_flush(self):
+        fast = Worker(self.bus, max_wait=0.001)
+        fast.fanout.emit('ROOM1', 'battle_started', {})
+        deadline = time.time() + 2
+        while not self.worker_b.received and time.time() < deadline:
+            time.sleep(0.005)
+        self.assertEqual(self.worker_b.received, [('ROOM1', 'battle_started', {}, None)])
+
+    def test_without_batching_publishes_immediately(self):
+        direct = Worker(self.bus, max_wait=0)
+        direct.fanout.emit('ROOM1', 'player_left', {'player_id': 'p'})
+        self.assertEqual(len(self.worker_a.received), 1)
+
+
+class TestRoomStateEvents(unittest.TestCase):
+    def setUp(self):
+        self.room = GameRoom('ROOM01', 'host')
+        self.room.join('guest')
+        self.room.set_player_ready('host')
+        self.room.set_player_ready('guest')
+        self.room.game.boards['player2'].place_ship_manual([(0, 0), (1, 0)])
+        self.room.game.status = self.room.status = 'active'
+        self.manager = GameManager()
+        
+        # События уходят напрямую в список вместо Socket.IO
+        self.worker = Worker(LocalBus(), max_wait=0)
+        self.addCleanup(setattr, websocket, 'fanout', websocket.fanout)
+        websocket.fanout = self.worker.fanout
+    
+    def shoot(self, x, y):
+        result = self.room.game.boards['player2'].receive_attack(x, y)
+        self.manager.record_attack(self.room, 'player2', x, y, result['result'] == 'hit')
+        return result
+    
+    def test_full_state_and_delta(self):
+        self.shoot(0, 0)
+        self.shoot(5, 5)
+        state = websocket.room_state(self.room)
+        self.assertTrue(state['game']['full'])
+        self.assertEqual(len(state['game']['moves']), 2)
+        
+        state = websocket.room_state(self.room, since_version=1)
+        self.assertFalse(state['game']['full'])
+        self.assertEqual(state['game']['moves'], [{'target': 'player2', 'x': 5, 'y': 5, 'result': 'miss'}])
+        # Клиент из прошлой игры получает всё заново
+        self.assertTrue(websocket.room_state(self.room, since_version=10)['game']['full'])
+    
+    def test_move_broadcast_carries_the_new_shot(self):
+        self.shoot(0, 0)
+        result = self.shoot(1, 0)
+        self.room.game.status = 'finished'
+        self.room.game.winner = 'player1'
+        websocket.broadcast_move(self.room, 'host', 'player1', 1, 0, result)
+        
+        events = [(event, data) for _, event, data, _ in self.worker.received]
+        self.assertEqual([event for event, _ in events], ['move_result', 'game_finished'])
+        game = events[0][1]['state']['game']
+        self.assertEqual(game['since_version'], 1)
+        self.assertEqual(game['moves'], [{'target': 'player2', 'x': 1, 'y': 0, 'result': 'hit'}])
+        self.assertEqual(game['ships_remaining']['player2'], 0)
+        self.assertEqual(game['sunk']['player2'], [[[0, 0], [1, 0]]])
+        self.assertEqual(events[1][1]['winner_id'], 'host')
+        self.assertEqual(events[1][1]['state']['game']['moves'], [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,10 +1,14 @@
 import unittest
 import sys
 import os
+import random
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from game_logic.core import Ship, Board, Game
+from game_logic.core import Ship, Board, Game, GameManager, TimerWheel, RoomCodeAllocator
+from game_logic.placement import FLEET, generate_fleet, _fallback_fleet
+from game_logic.layout_pool import FleetLayoutPool
+from game_logic.bitboard import dilate, mask_from_positions, positions_from_mask
 
 class TestShip(unittest.TestCase):
     def test_ship_creation(self):
@@ -54,6 +58,107 @@ class TestBoard(unittest.TestCase):
         result = self.board.receive_attack(10, 10)
         self.assertEqual(result['result'], 'invalid')
 
+    def test_touching_ships_rejected(self):
+        self.assertTrue(self.board.place_ship_manual([(2, 2), (3, 2)])[0])
+        success, message = self.board.place_ship_manual([(4, 3)])
+        self.assertFalse(success)
+        self.assertEqual(message, "Корабли не должны соприкасаться")
+        success, message = self.board.place_ship_manual([(3, 2)])
+        self.assertEqual(message, "Клетка уже занята")
+    
+    def test_game_over_and_grid_view(self):
+        self.board.place_ship_manual([(0, 0), (1, 0)])
+        self.board.place_ship_manual([(5, 5)])
+        self.assertEqual(self.board.grid[0][1], 'S')
+        self.assertNotIn('game_over', self.board.receive_attack(0, 0))
+        self.assertEqual(self.board.receive_attack(9, 9)['result'], 'miss')
+        result = self.board.receive_attack(1, 0)
+        self.assertTrue(result['sunk'])
+        self.assertEqual(result['ship_positions'], [(0, 0), (1, 0)])
+        self.assertNotIn('game_over', result)
+        self.assertTrue(self.board.receive_attack(5, 5)['game_over'])
+        self.assertEqual(self.board.grid[0][0], 'X')
+        self.assertEqual(self.board.grid[9][9], 'O')
+        self.assertTrue(self.board.is_attacked(9, 9))
+        self.assertFalse(self.board.is_attacked(8, 9))
+    
+    def test_remaining_counters(self):
+        self.board.place_ship_manual([(0, 0), (0, 1)])
+        self.board.place_ship_manual([(5, 5)])
+        self.assertEqual((self.board.ships_remaining, self.board.hull_remaining), (2, 3))
+        self.board.receive_attack(0, 0)
+        self.board.receive_attack(0, 0)
+        self.assertEqual((self.board.ships_remaining, self.board.hull_remaining), (2, 2))
+        result = self.board.receive_attack(5, 5)
+        self.assertEqual(result['ship_id'], 1)
+        self.assertEqual((self.board.ships_remaining, self.board.hull_remaining), (1, 1))
+    
+    def test_auto_place_respects_rules(self):
+        self.board.auto_place_all_ships()
+        self.assertEqual(sorted(s.length for s in self.board.ships), [1, 1, 2, 2, 3, 3, 4])
+        occupied = set()
+        for ship in self.board.ships:
+            for x, y in ship.positions:
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        self.assertNotIn((x + dx, y + dy), occupied)
+            occupied.update(ship.positions)
+
+class TestBitboard(unittest.TestCase):
+    def test_dilate_does_not_wrap_rows(self):
+        halo = dilate(mask_from_positions([(9, 0)]))
+        self.assertEqual(sorted(positions_from_mask(halo)), [(8, 0), (8, 1), (9, 0), (9, 1)])
+
+class TestPlacement(unittest.TestCase):
+    def test_generated_fleets_are_valid(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            placements = generate_fleet(rng=rng)
+            self.assertEqual(sorted(p.length for p in placements), sorted(FLEET))
+            board = Board()
+            for placement in placements:
+                self.assertTrue(board.place_ship_manual(list(placement.positions))[0])
+    
+    def test_generation_is_reproducible(self):
+        first = [p.mask for p in generate_fleet(rng=random.Random(42))]
+        second = [p.mask for p in generate_fleet(rng=random.Random(42))]
+        self.assertEqual(first, second)
+    
+    def test_whole_fleet_is_uniform(self):
+        # Среди всех корректных флотов четырёхпалубник касается края поля
+        # примерно в 57% случаев; при равновероятном выборе каждого корабля
+        # по отдельности было бы 60 из 140 положений, около 43%
+        rng = random.Random(5)
+        on_edge = 0
+        for _ in range(2000):
+            ship = next(p for p in generate_fleet(rng=rng) if p.length == 4)
+            on_edge += any(x in (0, 9) or y in (0, 9) for x, y in ship.positions)
+        self.assertGreater(on_edge / 2000, 0.52)
+        self.assertLess(on_edge / 2000, 0.62)
+    
+    def test_fallback_layout_is_valid(self):
+        for seed in range(8):
+            board = Board()
+            for placement in _fallback_fleet(random.Random(seed)):
+                self.assertTrue(board.place_ship_manual(list(placement.positions))[0])
+
+class TestFleetLayoutPool(unittest.TestCase):
+    def test_encode_decode_roundtrip(self):
+        pool = FleetLayoutPool(size=4, low_water=1)
+        placements = generate_fleet(rng=random.Random(1))
+        data = pool.encode(placements)
+        self.assertEqual(len(data), len(FLEET))
+        self.assertEqual([p.mask for p in pool.decode(data)], [p.mask for p in placements])
+    
+    def test_take_counts_hits(self):
+        pool = FleetLayoutPool(size=4, low_water=1)
+        pool.fill()
+        board = Board()
+        board.place_fleet(pool.take())
+        self.assertEqual(board.ships_remaining, len(FLEET))
+        self.assertEqual(pool.stats()['hits'], 1)
+        self.assertEqual(pool.stats()['misses'], 0)
+
 class TestGame(unittest.TestCase):
     def test_game_creation(self):
         game = Game("test123", "player1")
@@ -75,5 +180,77 @@ class TestGame(unittest.TestCase):
         result = game.join_game("player3")
         self.assertFalse(result)
 
+class TestRoomExpiry(unittest.TestCase):
+    def test_timer_wheel_fires_only_due_keys(self):
+        wheel = TimerWheel(tick_seconds=1.0, slots=8, clock=lambda: 100.0)
+        wheel.schedule('a', 102.5)
+        wheel.schedule('b', 105.0)
+        self.assertEqual(wheel.advance(102.0), [])
+        self.assertEqual(wheel.advance(103.0), ['a'])
+        self.assertEqual(wheel.advance(200.0), ['b'])
+    
+    def test_idle_rooms_expire_and_active_rooms_survive(self):
+        manager = GameManager(room_timeout=10)
+        expired = []
+        manager.add_expiry_listener(lambda code, room: expired.append(code))
+        idle = manager.create_room('host1')
+        busy = manager.create_room('host2')
+        now = manager.rooms[idle].last_activity
+        manager.rooms[busy].last_activity = now + 8
+        
+        self.assertEqual(manager.expire_inactive_rooms(now + 5), [])
+        self.assertEqual(manager.expire_inactive_rooms(now + 12), [idle])
+        self.assertEqual(expired, [idle])
+        self.assertIn(busy, manager.rooms)
+        self.assertEqual(manager.expire_inactive_rooms(now + 20), [busy])
+        self.assertEqual(manager.expired_rooms, 2)
+
+
+class TestPlayerIndex(unittest.TestCase):
+    def test_roles_follow_join_leave_and_expiry(self):
+        manager = GameManager(room_timeout=10)
+        code = manager.create_room('host')
+        self.assertTrue(manager.join_room(code, 'guest'))
+        self.assertEqual(manager.get_player_role(code, 'host'), 'player1')
+        self.assertEqual(manager.get_player_role(code, 'guest'), 'player2')
+        self.assertIsNone(manager.get_player_role(code, 'stranger'))
+        self.assertEqual(manager.get_room_for_player('guest'), code)
+        
+        manager.leave_room(code, 'guest')
+        self.assertIsNone(manager.get_player_role(code, 'guest'))
+        self.assertIsNone(manager.get_room_for_player('guest'))
+        
+        manager.expire_inactive_rooms(manager.rooms[code].last_activity + 20)
+        self.assertEqual(manager.player_rooms, {})
+        self.assertNotIn(code, manager.room_codes)
+    
+    def test_cleanup_tolerates_rooms_created_meanwhile(self):
+        manager = GameManager(room_timeout=10)
+        stale = manager.create_room('host')
+        room = manager.rooms[stale]
+        room.last_activity -= 60
+        check = room.cleanup_if_inactive
+        
+        def create_meanwhile(timeout):
+            # Другой поток создаёт комнату посреди обхода
+            manager.create_room('late')
+            return check(timeout)
+        
+        room.cleanup_if_inactive = create_meanwhile
+        manager.cleanup_inactive_rooms()
+        self.assertNotIn(stale, manager.rooms)
+        self.assertIsNone(manager.get_room_for_player('host'))
+        self.assertIsNotNone(manager.get_room_for_player('late'))
+    
+    def test_room_codes_are_unique(self):
+        allocator = RoomCodeAllocator()
+        codes = {allocator.allocate() for _ in range(2000)}
+        self.assertEqual(len(codes), 2000)
+        self.assertTrue(all(len(code) == 6 for code in codes))
+        code = codes.pop()
+        allocator.release(code)
+        self.assertNotIn(code, allocator.used)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
\ No newline at end of file
@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Game, GameManager
+from game_logic.history import MatchHistory
+from game_logic.store import GameStore
+
+
+def finished_game(game_id, player1='host', player2='guest', winner='player1'):
+    game = Game(game_id, player1)
+    game.players['player2'] = player2
+    game.boards['player2'].place_ship_manual([(0, 0), (1, 0)])
+    for x, y in ((0, 0), (5, 5), (1, 0)):
+        result = game.boards['player2'].receive_attack(x, y)
+        game.record_move('player2', x, y, result['result'])
+    game.status = 'finished'
+    game.winner = winner
+    return game
+
+
+class TestMatchHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.history = MatchHistory(os.path.join(self.directory, 'history.db'), max_wait=60)
+    
+    def test_batched_write_and_pages(self):
+        for number in range(5):
+            self.history.add(finished_game(f'game{number}', winner='player2' if number == 4 else 'player1'))
+        # Повторное окончание той же игры не записывается
+        self.assertFalse(self.history.add(finished_game('game0')))
+        self.history.add(finished_game('game9', player1='other', player2='AI_BOT'))
+        self.assertEqual(self.history.player_matches('host')['matches'], [])
+        
+        self.history.flush()
+        self.assertEqual(self.history.stats()['batches'], 1)
+        page = self.history.player_matches('host', limit=2)
+        self.assertEqual([match['game_id'] for match in page['matches']], ['game4', 'game3'])
+        self.assertEqual(page['matches'][0]['result'], 'loss')
+        self.assertEqual(page['matches'][1]['shots'], {'player1': 3, 'player2': 0})
+        
+        page = self.history.player_matches('host', limit=2, before=page['next_before'])
+        self.assertEqual([match['game_id'] for match in page['matches']], ['game2', 'game1'])
+        page = self.history.player_matches('host', limit=2, before=page['next_before'])
+        self.assertEqual([match['game_id'] for match in page['matches']], ['game0'])
+        self.assertIsNone(page['next_before'])
+        
+        matches = self.history.player_matches('guest')['matches']
+        self.assertEqual([match['result'] for match in matches], ['win', 'loss', 'loss', 'loss', 'loss'])
+        self.assertEqual(self.history.player_matches('AI_BOT')['matches'], [])
+        self.assertEqual(self.history.player_matches('other')['matches'][0]['mode'], 'ai')
+    
+    def test_match_with_moves(self):
+        self.history = MatchHistory(os.path.join(self.directory, 'history.db'), max_wait=0)
+        self.history.add(finished_game('game0'))
+        match_id = self.history.player_matches('host')['matches'][0]['id']
+        match = self.history.get_match(match_id)
+        self.assertEqual(match['moves'][1], {'target': 'player2', 'x': 5, 'y': 5, 'result': 'miss'})
+        self.assertIsNone(self.history.get_match(match_id + 1))
+    
+    def test_managers_queue_finished_games(self):
+        self.history = MatchHistory(os.path.join(self.directory, 'history.db'), max_wait=0)
+        store = GameStore(history=self.history)
+        game = finished_game('single01', player2='AI_BOT')
+        game.status = 'active'
+        store.save('single01', game)
+        self.assertEqual(self.history.stats()['written'], 0)
+        game.status = 'finished'
+        store.save('single01', game)
+        
+        manager = GameManager(history=self.history)
+        code = manager.create_room('host')
+        room = manager.get_room(code)
+        room.game = finished_game(f'multi_{code}')
+        manager.save_room(room)
+        self.assertEqual([match['game_id'] for match in self.history.player_matches('host')['matches']],
+                         [f'multi_{code}', 'single01'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Board, Game
+from game_logic.movelog import MoveArchive, MoveLog, read_archive
+
+
+def finished_game(game_id='abcd1234'):
+    game = Game(game_id, 'host')
+    game.players['player2'] = 'guest'
+    game.boards['player2'].place_ship_manual([(0, 0), (1, 0)])
+    for x, y in ((0, 0), (5, 5), (1, 0)):
+        result = game.boards['player2'].receive_attack(x, y)
+        game.record_move('player2', x, y, result['result'])
+    game.status = 'finished'
+    game.winner = 'player1'
+    return game
+
+
+class TestMoveLog(unittest.TestCase):
+    def test_append_and_since(self):
+        log = MoveLog()
+        self.assertEqual(log.append('player2', 3, 4, 'miss'), 1)
+        self.assertEqual(log.append('player1', 9, 9, 'hit'), 2)
+        self.assertEqual(log.last_seq, 2)
+        self.assertEqual(log.since(1), [('player1', 9, 9, 'hit')])
+        self.assertEqual(log.since(0), list(log))
+        self.assertEqual(log.since(5), [])
+        # 2 байта на ход
+        self.assertEqual(len(log.to_bytes()), 4)
+        self.assertEqual(MoveLog.from_bytes(log.to_bytes()), log)
+    
+    def test_replay_restores_boards(self):
+        game = finished_game()
+        board = Board()
+        board.place_ship_manual([(0, 0), (1, 0)])
+        self.assertEqual(game.moves.replay({'player2': board}, stop=2), 2)
+        self.assertEqual(board.grid[0][0], 'X')
+        self.assertEqual(board.grid[0][1], 'S')
+        game.moves.replay({'player2': board}, start=2)
+        self.assertEqual(board.ships_remaining, 0)
+
+
+class TestMoveArchive(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.movelog')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+    
+    def test_batched_write_and_read(self):
+        archive = MoveArchive(self.path, batch_size=10, max_wait=60)
+        self.assertTrue(archive.add(finished_game('game0001')))
+        self.assertTrue(archive.add(finished_game('game0002')))
+        # Повторное окончание той же игры не пишется дважды
+        self.assertFalse(archive.add(finished_game('game0001')))
+        self.assertEqual(list(read_archive(self.path)), [])
+        
+        archive.flush()
+        records = list(read_archive(self.path))
+        self.assertEqual([record['game_id'] for record in records], ['game0001', 'game0002'])
+        self.assertEqual(records[0]['players'], {'player1': 'host', 'player2': 'guest'})
+        self.assertEqual(records[0]['winner'], 'player1')
+        self.assertEqual(records[0]['moves'], finished_game().moves)
+        self.assertEqual(archive.stats()['batches'], 1)
+    
+    def test_truncated_tail_is_skipped(self):
+        archive = MoveArchive(self.path, max_wait=0)
+        archive.add(finished_game('game0001'))
+        archive.add(finished_game('game0002'))
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual([record['game_id'] for record in read_archive(self.path)], ['game0001'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
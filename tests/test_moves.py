@@ -0,0 +1,96 @@
+import unittest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Game, GameManager
+from game_logic.moves import MoveError, apply_move, apply_moves, play_ai_turns
+
+
+def active_game():
+    game = Game('abcd1234', 'host')
+    game.players['player2'] = 'guest'
+    game.boards['player1'].place_ship_manual([(9, 9)])
+    game.boards['player2'].place_ship_manual([(0, 0), (1, 0)])
+    game.boards['player2'].place_ship_manual([(5, 5)])
+    game.status = 'active'
+    return game
+
+
+class ScriptedAI:
+    """ИИ, стреляющий по заданному списку клеток"""
+    
+    def __init__(self, shots):
+        self.shots = list(shots)
+        self.recorded = []
+    
+    def generate_shot(self):
+        return self.shots.pop(0)
+    
+    def record_shot(self, x, y, result, sunk_positions=None):
+        self.recorded.append((x, y, result, sunk_positions))
+
+
+class TestApplyMove(unittest.TestCase):
+    def test_turns_sinking_and_recording(self):
+        game = active_game()
+        recorded = []
+        record = lambda *shot: recorded.append(shot)
+        
+        move = apply_move(game, 'player1', 0, 0, record)
+        self.assertEqual((move.result, move.sunk, move.next_turn), ('hit', False, 'player1'))
+        move = apply_move(game, 'player1', 1, 0, record)
+        self.assertEqual(move.sunk_positions, [(0, 0), (1, 0)])
+        move = apply_move(game, 'player1', 3, 3, record)
+        self.assertEqual((move.result, move.next_turn, game.current_turn), ('miss', 'player2', 'player2'))
+        self.assertEqual(recorded, [('player2', 0, 0, True), ('player2', 1, 0, True), ('player2', 3, 3, False)])
+    
+    def test_rejected_moves(self):
+        game = active_game()
+        apply_move(game, 'player1', 3, 3)
+        for attacker, x, y, reason in (('player1', 4, 4, 'not_your_turn'),
+                                       ('player2', 10, 0, 'invalid')):
+            with self.assertRaises(MoveError) as context:
+                apply_move(game, attacker, x, y)
+            self.assertEqual(context.exception.reason, reason)
+        apply_move(game, 'player2', 0, 0)
+        with self.assertRaises(MoveError) as context:
+            apply_move(game, 'player1', 3, 3)
+        self.assertEqual(context.exception.reason, 'already_attacked')
+        self.assertEqual(game.current_turn, 'player1')
+    
+    def test_batch_stops_at_game_over(self):
+        game = active_game()
+        results, error = apply_moves(game, [('player1', 0, 0), ('player1', 1, 0),
+                                            ('player1', 5, 5), ('player1', 6, 6)])
+        self.assertEqual(len(results), 3)
+        self.assertTrue(results[-1].game_over)
+        self.assertEqual(results[-1].to_dict()['winner'], 'player1')
+        self.assertEqual((game.status, game.winner), ('finished', 'player1'))
+        self.assertEqual(error.reason, 'not_active')
+    
+    def test_ai_records_only_its_own_shots_once(self):
+        game = active_game()
+        apply_move(game, 'player1', 3, 3)
+        ai = ScriptedAI([(9, 9), (0, 0)])
+        results = play_ai_turns(game, ai)
+        self.assertEqual([result.result for result in results], ['hit'])
+        self.assertTrue(results[0].game_over)
+        self.assertEqual(ai.recorded, [(9, 9, 'hit', [(9, 9)])])
+    
+    def test_room_move_finishes_room(self):
+        manager = GameManager()
+        code = manager.create_room('host')
+        room = manager.get_room(code)
+        room.game = active_game()
+        for x, y in ((0, 0), (1, 0), (5, 5)):
+            move, room = manager.apply_move(room, 'player1', x, y)
+        self.assertTrue(move.game_over)
+        self.assertEqual(room.status, 'finished')
+        self.assertEqual(room.game.last_move['x'], 5)
+        self.assertEqual(move.version, 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
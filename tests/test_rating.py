@@ -0,0 +1,132 @@
+import unittest
+import random
+import sys
+import os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Game, GameManager
+from game_logic.rating import Leaderboard, RatingService, elo_update
+
+
+def finished_game(winner_id, loser_id, game_id='multi_ROOM01_a1b2c3', moves=1, started=True):
+    game = Game(game_id, winner_id)
+    game.players['player2'] = loser_id
+    if started:
+        game.ready_players = {'player1', 'player2'}
+    for number in range(moves):
+        game.record_move('player2', number % 10, number // 10, 'miss')
+    game.status = 'finished'
+    game.winner = 'player1'
+    return game
+
+
+class TestLeaderboard(unittest.TestCase):
+    def test_rank_and_top_match_sorting(self):
+        rng = random.Random(3)
+        board = Leaderboard()
+        ratings = {}
+        for _ in range(500):
+            player_id = f'p{rng.randrange(200)}'
+            ratings[player_id] = round(rng.uniform(1000, 2000), 1)
+            board.update(player_id, ratings[player_id])
+        
+        ordered = sorted(ratings, key=lambda player_id: (-ratings[player_id], player_id))
+        for player_id in ordered:
+            higher = sum(1 for rating in ratings.values() if rating > ratings[player_id])
+            self.assertEqual(board.rank(player_id), higher + 1)
+        self.assertEqual([player_id for _, player_id in board.top(50, 30)], ordered[30:80])
+        self.assertEqual(len(board.top(50, len(ordered) - 10)), 10)
+        
+        board.remove(ordered[0])
+        self.assertIsNone(board.rank(ordered[0]))
+        self.assertEqual(board.rank(ordered[1]), 1)
+
+
+class TestRatingService(unittest.TestCase):
+    def test_elo_update(self):
+        winner, loser = elo_update(1500, 1500, 32)
+        self.assertAlmostEqual(winner, 1516)
+        self.assertAlmostEqual(loser, 1484)
+        # Победа над слабым приносит меньше
+        self.assertLess(elo_update(1800, 1400)[0] - 1800, 16)
+    
+    def test_finished_rooms_update_ratings_once(self):
+        ratings = RatingService(max_wait=0)
+        manager = GameManager(ratings=ratings)
+        code = manager.create_room('alice')
+        room = manager.get_room(code)
+        room.game = finished_game('alice', 'bob')
+        manager.save_room(room)
+        manager.save_room(room)
+        room.game = finished_game('bob', 'carol', moves=2)
+        manager.save_room(room)
+        # Игры с ИИ не рейтинговые
+        self.assertFalse(ratings.record_game(finished_game('alice', 'AI_BOT', 'single01')))
+        
+        self.assertEqual(ratings.get('alice'), {'player_id': 'alice', 'rating': 1516.0, 'rank': 1,
+                                                'games': 1, 'wins': 1, 'losses': 0})
+        self.assertEqual(ratings.get('bob')['games'], 2)
+        self.assertEqual([player['player_id'] for player in ratings.top()['players']],
+                         ['alice', 'bob', 'carol'])
+        self.assertIsNone(ratings.get('dave'))
+    
+    def test_surrender_during_placement_is_not_rated(self):
+        ratings = RatingService(max_wait=0)
+        self.assertFalse(ratings.record_game(finished_game('alice', 'bob', moves=0, started=False)))
+        self.assertIsNone(ratings.get('alice'))
+    
+    def test_repeated_games_in_one_room_are_rated(self):
+        ratings = RatingService(max_wait=0)
+        manager = GameManager(ratings=ratings)
+        code = manager.create_room('alice')
+        manager.join_room(code, 'bob')
+        room = manager.get_room(code)
+        for _ in range(2):
+            room.player1_ready = room.player2_ready = True
+            room.start_game()
+            # Сдача сразу после начала боя: ходов нет
+            room.game.ready_players = {'player1', 'player2'}
+            room.game.status = 'finished'
+            room.game.winner = 'player1'
+            manager.save_room(room)
+        self.assertEqual(ratings.get('alice')['wins'], 2)
+    
+    def test_workers_share_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'ratings.db')
+        first = RatingService(path, max_wait=0)
+        second = RatingService(path, max_wait=0)
+        game = finished_game('alice', 'bob')
+        self.assertTrue(first.record_game(game))
+        # Та же игра из другого воркера не учитывается повторно
+        second.record_game(game)
+        self.assertEqual(second.stats()['duplicates'], 1)
+        self.assertTrue(second.record_game(finished_game('bob', 'alice', 'multi_ROOM01_d4e5f6')))
+        self.assertEqual(first.get('alice')['games'], 2)
+        self.assertEqual(first.top(), second.top())
+        self.assertEqual(RatingService(path).get('bob'), second.get('bob'))
+    
+    def test_games_are_rated_in_batches_off_the_request_path(self):
+        ratings = RatingService(batch_size=10, max_wait=60)
+        manager = GameManager(ratings=ratings)
+        code = manager.create_room('alice')
+        room = manager.get_room(code)
+        room.game = finished_game('alice', 'bob')
+        manager.save_room(room)
+        self.assertTrue(ratings.record_game(finished_game('carol', 'dave', 'multi_ROOM02_a1b2c3')))
+        # Повтор из того же воркера отсеивается ещё в очереди
+        self.assertFalse(ratings.record_game(finished_game('carol', 'dave', 'multi_ROOM02_a1b2c3')))
+        self.assertIsNone(ratings.get('alice'))
+        self.assertEqual(ratings.stats()['pending'], 2)
+        
+        ratings.flush()
+        self.assertEqual(ratings.get('alice')['wins'], 1)
+        self.assertEqual(ratings.get('dave')['rating'], 1484.0)
+        self.assertEqual(ratings.stats()['batches'], 1)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
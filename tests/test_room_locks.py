@@ -0,0 +1,75 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import RoomLocks
+
+
+class TestRoomLocks(unittest.TestCase):
+    def run_commands(self, locks, room_codes, work=0.002):
+        active = {}
+        overlaps = {'same_room': 0, 'max_parallel': 0}
+        guard = threading.Lock()
+        
+        def command(room_code):
+            with locks.hold(room_code):
+                with guard:
+                    active[room_code] = active.get(room_code, 0) + 1
+                    if active[room_code] > 1:
+                        overlaps['same_room'] += 1
+                    overlaps['max_parallel'] = max(overlaps['max_parallel'], sum(active.values()))
+                time.sleep(work)
+                with guard:
+                    active[room_code] -= 1
+        
+        threads = [threading.Thread(target=command, args=(code,)) for code in room_codes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return overlaps
+    
+    def test_commands_of_one_room_do_not_overlap(self):
+        locks = RoomLocks()
+        overlaps = self.run_commands(locks, ['ROOM01'] * 20)
+        self.assertEqual(overlaps['same_room'], 0)
+        stats = locks.stats()
+        self.assertEqual(stats['commands'], 20)
+        self.assertGreater(stats['contended'], 0)
+        self.assertGreater(stats['max_queue_depth'], 0)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreaterEqual(stats['max_latency_ms'], 2)
+    
+    def test_different_rooms_run_in_parallel(self):
+        locks = RoomLocks(shards=64)
+        codes = [f'ROOM{number:02d}' for number in range(64)]
+        shards = {hash(code) % 64 for code in codes}
+        overlaps = self.run_commands(locks, codes, work=0.05)
+        self.assertEqual(overlaps['same_room'], 0)
+        self.assertGreater(overlaps['max_parallel'], 1)
+        self.assertLessEqual(overlaps['max_parallel'], len(shards))
+    
+    def test_lock_is_reentrant_and_released_on_error(self):
+        locks = RoomLocks()
+        with self.assertRaises(ValueError):
+            with locks.hold('ROOM01'):
+                with locks.hold('ROOM01'):
+                    raise ValueError
+        done = []
+        
+        def command():
+            with locks.hold('ROOM01'):
+                done.append(True)
+        
+        thread = threading.Thread(target=command)
+        thread.start()
+        thread.join(1)
+        self.assertEqual(len(done), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,66 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.simulation import run_games, histogram_summary, main
+from game_logic.selfplay import evaluate, shard_ranges, summarize, wilson_interval
+from collections import Counter
+
+
+class TestSimulation(unittest.TestCase):
+    def test_same_seed_same_results(self):
+        first = run_games('normal', 'hard', seed=5, start=0, count=10, profile=False)
+        second = run_games('normal', 'hard', seed=5, start=0, count=10, profile=False)
+        self.assertEqual(first.shots_per_game, second.shots_per_game)
+        self.assertEqual(first.wins, second.wins)
+        self.assertEqual(first.games, 10)
+    
+    def test_profile_collects_timings(self):
+        stats = run_games('normal', 'normal', seed=1, start=0, count=3)
+        timings = stats.to_dict()['timings']
+        self.assertEqual(timings['auto_place_all_ships']['calls'], 6)
+        self.assertEqual(timings['generate_shot']['calls'], timings['receive_attack']['calls'])
+    
+    def test_histogram_summary(self):
+        summary = histogram_summary(Counter({40: 1, 50: 2, 60: 1}))
+        self.assertEqual(summary['mean'], 50)
+        self.assertEqual(summary['p50'], 50)
+        self.assertEqual(summary['max'], 60)
+    
+    def test_cli_writes_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.json')
+            main(['--games', '4', '--seed', '2', '--output', path])
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(report['meta']['seed'], 2)
+        self.assertEqual(report['results']['games'], 4)
+
+
+class TestSelfPlay(unittest.TestCase):
+    def test_sharded_run_matches_single_process(self):
+        single = run_games('normal', 'hard', seed=9, start=0, count=12, profile=False)
+        sharded = evaluate('normal', 'hard', games=12, seed=9, workers=2, shard_size=5)
+        self.assertEqual(sharded.games, 12)
+        self.assertEqual(sharded.wins, single.wins)
+        self.assertEqual(sharded.shots_to_win, single.shots_to_win)
+        summary = summarize(sharded)
+        low, high = summary['a']['mean_shots_ci95']
+        self.assertLessEqual(low, summary['a']['mean_shots_to_win'])
+    
+    def test_shard_ranges_cover_all_games(self):
+        self.assertEqual(shard_ranges(12, 5), [(0, 5), (5, 5), (10, 2)])
+    
+    def test_wilson_interval(self):
+        p, low, high = wilson_interval(50, 100)
+        self.assertEqual(p, 0.5)
+        self.assertAlmostEqual(low + high, 1.0)
+        self.assertLess(low, 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,113 @@
+import unittest
+import sys
+import os
+import random
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.ai import BattleshipAI
+from game_logic.bitboard import FULL_MASK, mask_from_positions, positions_from_mask
+from game_logic.core import Board
+from game_logic.solver import (
+    OPENING_BOOK, PERMUTATIONS, SolverCache, canonical_key, count_placements,
+    endgame_shot, remaining_fleet, solve, transform_mask
+)
+
+
+def play_until_win(ai, board, limit=100):
+    """Сыграть за ИИ против доски до победы, вернуть число выстрелов"""
+    for shot in range(1, limit + 1):
+        x, y = ai.generate_shot()
+        result = board.receive_attack(x, y)
+        sunk = list(board.ships[result['ship_id']].positions) if result.get('sunk') else None
+        ai.record_shot(x, y, result['result'], sunk)
+        if result.get('game_over'):
+            return shot
+    return None
+
+
+class TestCountPlacements(unittest.TestCase):
+    def test_single_cells(self):
+        available = mask_from_positions([(0, 0), (5, 5), (9, 9)])
+        total, coverage = count_placements(available, 0, [1])
+        self.assertEqual(total, 3)
+        self.assertEqual(sum(coverage), 3)
+        # Два однопалубных не могут стоять рядом
+        total, _ = count_placements(mask_from_positions([(0, 0), (1, 0), (5, 5)]), 0, [1, 1])
+        self.assertEqual(total, 2)
+
+    def test_placements_cover_hits(self):
+        available = mask_from_positions([(3, 4), (5, 4), (4, 3), (4, 5)])
+        hits = mask_from_positions([(4, 4)])
+        total, coverage = count_placements(available, hits, [2])
+        self.assertEqual(total, 4)
+        self.assertEqual(coverage[4 * 10 + 4], 4)
+        self.assertEqual(coverage[4 * 10 + 5], 1)
+
+    def test_budget(self):
+        self.assertIsNone(count_placements(FULL_MASK, 0, [4, 3, 3, 2, 2, 1, 1], max_nodes=100))
+
+
+class TestSymmetry(unittest.TestCase):
+    def test_rotated_states_share_key(self):
+        available = mask_from_positions([(0, 0), (1, 0), (2, 0), (7, 3)])
+        hits = mask_from_positions([(1, 1)])
+        key, _ = canonical_key((available, hits), [2, 1])
+        for permutation in PERMUTATIONS:
+            rotated = (transform_mask(available, permutation), transform_mask(hits, permutation))
+            self.assertEqual(canonical_key(rotated, [1, 2])[0], key)
+
+    def test_solve_maps_coverage_back(self):
+        available = mask_from_positions([(0, 0), (1, 0), (2, 0), (0, 2), (0, 3), (6, 6)])
+        cache = SolverCache()
+        for permutation in PERMUTATIONS:
+            rotated = transform_mask(available, permutation)
+            direct = count_placements(rotated, 0, [2, 1])
+            self.assertEqual(solve(rotated, 0, [2, 1], cache=cache), (direct[0], direct[1]))
+        # Все восемь вариантов - одна запись кэша
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.hits, 7)
+
+
+class TestSolverCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = SolverCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), (True, 1))
+        cache.put('c', 3)
+        self.assertEqual(cache.get('b'), (False, None))
+        self.assertEqual(cache.get('a'), (True, 1))
+        self.assertEqual(cache.evictions, 1)
+
+
+class TestBattleshipAISolver(unittest.TestCase):
+    def test_first_shot_from_opening_book(self):
+        for seed in range(5):
+            self.assertIn(BattleshipAI(rng=random.Random(seed)).generate_shot(), OPENING_BOOK[0])
+
+    def test_endgame_only_with_few_cells(self):
+        self.assertIsNone(endgame_shot(set(), set(), [], [], random.Random(0)))
+        # Остался один однопалубный корабль и три свободные клетки
+        free = [(9, 9), (0, 9), (9, 0)]
+        shots = set(positions_from_mask(FULL_MASK & ~mask_from_positions(free)))
+        sunk = [[(0, 0), (1, 0), (2, 0), (3, 0)], [(0, 2), (1, 2), (2, 2)], [(0, 4), (1, 4), (2, 4)],
+                [(0, 6), (1, 6)], [(0, 8), (1, 8)], [(5, 5)]]
+        self.assertEqual(remaining_fleet(sunk), [1])
+        self.assertIn(endgame_shot(shots, set(), [], sunk, random.Random(0)), free)
+        # Кораблей осталось больше ENDGAME_SHIPS - решатель не запускается
+        self.assertIsNone(endgame_shot(shots, set(), [], sunk[:1], random.Random(0)))
+
+    def test_wins_games(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            board = Board()
+            board.auto_place_all_ships(rng=rng)
+            ai = BattleshipAI(rng=rng)
+            shots = play_until_win(ai, board)
+            self.assertIsNotNone(shots)
+            self.assertEqual(len(ai.shot_history), shots)
+
+
+if __name__ == '__main__':
+    unittest.main()
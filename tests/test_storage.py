@@ -0,0 +1,197 @@
+import unittest
+import random
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.ai import create_ai
+from game_logic.core import Board, Game, GameManager
+from game_logic.moves import MoveError
+from game_logic.storage import KVBackend, LocalKV, StaleWriteError
+from game_logic.store import GameStore
+
+
+def play_shots(board, count, rng):
+    for _ in range(count):
+        board.receive_attack(rng.randrange(10), rng.randrange(10))
+
+
+class TestStateRoundTrip(unittest.TestCase):
+    def test_board_state_round_trip(self):
+        rng = random.Random(3)
+        board = Board()
+        board.auto_place_all_ships(rng)
+        play_shots(board, 40, rng)
+
+        restored = Board.from_state(board.export_state())
+        self.assertEqual(restored.export_state(), board.export_state())
+        self.assertEqual(restored.grid, board.grid)
+        self.assertEqual(restored.ships_remaining, board.ships_remaining)
+        self.assertEqual(restored.hull_remaining, board.hull_remaining)
+
+    def test_normal_ai_state_round_trip(self):
+        rng = random.Random(5)
+        board = Board()
+        board.auto_place_all_ships(rng)
+        ai = create_ai('normal', rng=rng)
+        for _ in range(30):
+            x, y = ai.generate_shot()
+            result = board.receive_attack(x, y)
+            ai.record_shot(x, y, result['result'], result.get('ship_positions'))
+
+        restored = type(ai).from_state(ai.export_state())
+        self.assertEqual(restored.export_state(), ai.export_state())
+
+
+class TestSharedBackend(unittest.TestCase):
+    def setUp(self):
+        # Два менеджера над одним хранилищем - как два воркера за балансировщиком
+        self.backend = KVBackend(LocalKV())
+        self.worker_a = GameManager(backend=self.backend)
+        self.worker_b = GameManager(backend=self.backend)
+
+    def start_battle(self):
+        code = self.worker_a.create_room('host')
+        self.assertTrue(self.worker_b.join_room(code, 'guest'))
+        room = self.worker_a.get_room(code)
+        room.set_player_ready('host')
+        room.set_player_ready('guest')
+        for role in ('player1', 'player2'):
+            room.game.boards[role].auto_place_all_ships(random.Random(role))
+        room.game.status = room.status = 'active'
+        self.worker_a.save_room(room)
+        return code
+
+    def test_room_is_visible_to_other_worker(self):
+        code = self.start_battle()
+        room = self.worker_b.get_room(code)
+        self.assertEqual(room.player2_id, 'guest')
+        self.assertEqual(room.status, 'active')
+        self.assertEqual(self.worker_b.get_player_role(code, 'host'), 'player1')
+        self.assertEqual(len(room.game.boards['player1'].ships), 7)
+
+    def test_attack_is_recorded_without_rewriting_ships(self):
+        code = self.start_battle()
+        room = self.worker_a.get_room(code)
+        board = room.game.boards['player2']
+        x, y = board.ships[0].positions[0]
+        board.receive_attack(x, y)
+        room.game.current_turn = 'player2'
+        self.worker_a.record_attack(room, 'player2', x, y, True)
+
+        other = self.worker_b.get_room(code).game
+        self.assertTrue(other.boards['player2'].is_attacked(x, y))
+        self.assertEqual(other.boards['player2'].hull_remaining, board.hull_remaining)
+        self.assertEqual(other.current_turn, 'player2')
+        self.assertEqual(other.boards['player2'].export_state(), board.export_state())
+
+    def miss_cells(self, room, count):
+        ships = {cell for ship in room.game.boards['player2'].ships for cell in ship.positions}
+        return [(x, y) for y in range(10) for x in range(10) if (x, y) not in ships][:count]
+
+    def test_stale_snapshot_cannot_record_a_second_move(self):
+        code = self.start_battle()
+        room_a = self.worker_a.get_room(code)
+        room_b = self.worker_b.get_room(code)
+        (ax, ay), (bx, by) = self.miss_cells(room_a, 2)
+        self.worker_a.apply_move(room_a, 'player1', ax, ay)
+        # У второго воркера снимок до хода: после перечитывания ход уже не его
+        with self.assertRaises(MoveError) as raised:
+            self.worker_b.apply_move(room_b, 'player1', bx, by)
+        self.assertEqual(raised.exception.reason, 'not_your_turn')
+        game = self.worker_a.get_room(code).game
+        self.assertEqual(len(game.moves), 1)
+        self.assertEqual(game.current_turn, 'player2')
+        self.assertFalse(game.boards['player2'].is_attacked(bx, by))
+
+    def test_concurrent_moves_on_one_snapshot(self):
+        code = self.start_battle()
+        rooms = [self.worker_a.get_room(code), self.worker_b.get_room(code)]
+        cells = self.miss_cells(rooms[0], 2)
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def move(worker, room, cell):
+            barrier.wait()
+            try:
+                worker.apply_move(room, 'player1', *cell)
+                outcomes.append('ok')
+            except MoveError as e:
+                outcomes.append(e.reason)
+
+        threads = [threading.Thread(target=move, args=args)
+                   for args in zip((self.worker_a, self.worker_b), rooms, cells)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(outcomes), ['not_your_turn', 'ok'])
+        game = self.worker_a.get_room(code).game
+        self.assertEqual(len(game.moves), 1)
+        self.assertEqual(game.current_turn, 'player2')
+
+    def test_record_checks_version(self):
+        code = self.start_battle()
+        room = self.worker_a.get_room(code)
+        self.worker_b.save_room(self.worker_b.get_room(code))
+        with self.assertRaises(StaleWriteError):
+            self.backend.record_room_attack(room, 'player2', 0, 0, False)
+
+    def test_stale_snapshot_cannot_overwrite_moves(self):
+        code = self.start_battle()
+        room_a = self.worker_a.get_room(code)
+        room_b = self.worker_b.get_room(code)
+        (x, y), = self.miss_cells(room_a, 1)
+        self.worker_a.apply_move(room_a, 'player1', x, y)
+        # Готовность, сдача или расстановка со старым снимком не затирает ход
+        room_b.game.status = 'finished'
+        with self.assertRaises(StaleWriteError):
+            self.worker_b.save_room(room_b)
+        game = self.worker_a.get_room(code).game
+        self.assertEqual(game.status, 'active')
+        self.assertTrue(game.boards['player2'].is_attacked(x, y))
+    
+    def test_deleted_room_disappears_everywhere(self):
+        code = self.start_battle()
+        self.worker_b.get_room(code)
+        self.worker_a.leave_room(code, 'host')
+        self.assertIsNone(self.worker_b.get_room(code))
+        self.assertIsNone(self.worker_b.get_player_role(code, 'guest'))
+
+
+class TestSharedGameStore(unittest.TestCase):
+    def test_ai_state_survives_switching_workers(self):
+        backend = KVBackend(LocalKV())
+        store_a = GameStore(backend=backend)
+        store_b = GameStore(backend=backend)
+        rng = random.Random(11)
+
+        game = Game('g1', 'player')
+        for board in game.boards.values():
+            board.auto_place_all_ships(rng)
+        store_a.add('g1', game, create_ai('hard', rng=rng))
+
+        # Ходы ИИ по очереди обрабатывают разные воркеры
+        for store in (store_a, store_b) * 10:
+            game = store.get_game('g1')
+            ai = store.get_ai('g1')
+            x, y = ai.generate_shot()
+            result = game.boards['player1'].receive_attack(x, y)
+            ai.record_shot(x, y, result['result'], result.get('ship_positions'))
+            store.record_attack('g1', game, 'player1', x, y, result['result'] == 'hit')
+
+        game = store_a.get_game('g1')
+        ai = store_a.get_ai('g1')
+        shots = game.boards['player1']._hit_mask | game.boards['player1']._miss_mask
+        self.assertEqual(bin(shots).count('1'), 20)
+        self.assertEqual(len(ai.ai.shot_history), 20)
+
+        store_b.remove('g1')
+        self.assertIsNone(store_a.get_game('g1'))
+        self.assertIsNone(store_a.get_ai('g1'))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
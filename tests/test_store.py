@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.core import Game
+from game_logic.batch_ai import BatchAIEngine, BatchedAI
+from game_logic.density_ai import DensityAI
+from game_logic.store import GameStore, estimate_size
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class ClosableAI:
+    def __init__(self):
+        self.closed = False
+    
+    def close(self):
+        self.closed = True
+
+
+class TestGameStore(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+    
+    def test_ttl_eviction_removes_game_and_ai(self):
+        store = GameStore(ttl_seconds=60, clock=self.clock)
+        ai = ClosableAI()
+        store.add('game0001', Game('game0001', 'p1'), ai)
+        self.clock.now += 30
+        self.assertIsNotNone(store.get_game('game0001'))
+        self.clock.now += 59
+        self.assertIs(store.get_ai('game0001'), ai)
+        self.clock.now += 61
+        self.assertIsNone(store.get_game('game0001'))
+        self.assertTrue(ai.closed)
+        self.assertEqual(store.stats()['evictions'], {'ttl': 1})
+    
+    def test_idle_games_are_swept_without_access(self):
+        store = GameStore(ttl_seconds=60, clock=self.clock)
+        ai = ClosableAI()
+        store.add('game0001', Game('game0001', 'p1'), ai)
+        store.start_sweep(0.01)
+        self.clock.now += 61
+        deadline = time.time() + 2
+        while len(store) and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(store), 0)
+        self.assertTrue(ai.closed)
+        self.assertEqual(store.evictions['ttl'], 1)
+    
+    def test_lru_eviction(self):
+        store = GameStore(max_games=2, clock=self.clock)
+        for game_id in ('a', 'b'):
+            store.add(game_id, Game(game_id, 'p1'))
+        store.get_game('a')
+        store.add('c', Game('c', 'p1'))
+        self.assertIn('a', store)
+        self.assertNotIn('b', store)
+        self.assertEqual(store.stats()['evictions'], {'lru': 1})
+    
+    def test_memory_cap(self):
+        store = GameStore(max_memory_bytes=1, clock=self.clock)
+        store.add('a', Game('a', 'p1'))
+        store.add('b', Game('b', 'p1'))
+        self.assertEqual(len(store), 1)
+        self.assertIn('b', store)
+        self.assertEqual(store.stats()['evictions'], {'memory': 1})
+    
+    def test_batched_ai_size_excludes_shared_engine(self):
+        engine = BatchAIEngine(capacity=1024)
+        ai = BatchedAI(engine)
+        ai.record_shot(3, 4, 'miss')
+        game_size = estimate_size(Game('game0001', 'p1'))
+        # Общие массивы движка (сотни КБ) не засчитываются одной игре
+        self.assertLess(estimate_size(ai), 4 * 1024)
+        self.assertLess(estimate_size(ai), estimate_size(DensityAI()))
+        self.assertGreater(estimate_size(ai), engine.slot_size())
+        self.assertLess(game_size + estimate_size(ai), 64 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,60 @@
+import unittest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from game_logic.workers import BackgroundWorker, BatchedWriter
+
+
+class TestBackgroundWorker(unittest.TestCase):
+    def test_starts_once(self):
+        started = threading.Semaphore(0)
+        prepared = []
+
+        def target():
+            started.release()
+
+        worker = BackgroundWorker(target, 'test-worker', count=2)
+        self.assertFalse(worker.started)
+        worker.start(lambda: prepared.append(True))
+        worker.start(lambda: prepared.append(True))
+        self.assertTrue(started.acquire(timeout=2))
+        self.assertTrue(started.acquire(timeout=2))
+        self.assertFalse(started.acquire(timeout=0.05))
+        self.assertEqual(prepared, [True])
+        self.assertIsNotNone(worker.wakeup)
+
+
+class TestBatchedWriter(unittest.TestCase):
+    def test_full_batch_is_written_by_the_worker(self):
+        batches = []
+        writer = BatchedWriter(batches.append, 'test-writer', batch_size=3, max_wait=60)
+        self.assertTrue(writer.add('a', key=1))
+        # Повтор с тем же ключом отбрасывается
+        self.assertFalse(writer.add('a', key=1))
+        writer.add('b')
+        writer.add('c')
+        deadline = time.time() + 2
+        while not batches and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(batches, [['a', 'b', 'c']])
+        self.assertEqual(writer.pending, 0)
+
+    def test_flush_and_synchronous_mode(self):
+        batches = []
+        writer = BatchedWriter(batches.append, 'test-writer', max_wait=60)
+        writer.add('a')
+        self.assertEqual(writer.pending, 1)
+        writer.flush()
+        self.assertEqual(batches, [['a']])
+
+        direct = BatchedWriter(batches.append, 'test-writer', max_wait=0)
+        direct.add('b')
+        self.assertEqual(batches, [['a'], ['b']])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,8 @@
+"""Точка входа для gunicorn: gunicorn -c gunicorn.conf.py wsgi:app
+
+Воркер GeventWebSocketWorker сам вызывает monkey.patch_all до загрузки
+приложения, app.py при ASYNC_MODE=gevent делает то же самое.
+"""
+from app import create_app
+
+app, socketio = create_app()